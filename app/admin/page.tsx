@@ -25,6 +25,13 @@ interface URLData {
   verified: boolean
 }
 
+type DatasetTable = "malicious_urls" | "valid_urls"
+
+interface URLPage {
+  items: URLData[]
+  nextCursor: number | null
+}
+
 interface Report {
   id: number
   url: string
@@ -83,19 +90,19 @@ const BackendStatus = () => (
   </div>
 )
 
-// Pagination component
+// Pagination component; pages are fetched by cursor, so only the next page is known to exist
 const Pagination = ({ 
   currentPage, 
-  totalPages, 
+  hasNext, 
   onPageChange 
 }: { 
   currentPage: number
-  totalPages: number
+  hasNext: boolean
   onPageChange: (page: number) => void 
 }) => (
   <div className="flex items-center justify-between px-2 py-3">
     <div className="text-sm text-gray-400">
-      Page {currentPage} of {totalPages}
+      Page {currentPage}
     </div>
     <div className="flex items-center space-x-2">
       <Button
@@ -111,7 +118,7 @@ const Pagination = ({
         variant="ghost"
         size="sm"
         onClick={() => onPageChange(currentPage + 1)}
-        disabled={currentPage === totalPages}
+        disabled={!hasNext}
         className="text-gray-300 hover:bg-gray-700"
       >
         <ChevronRight className="h-4 w-4" />
@@ -125,7 +132,8 @@ export default function AdminPage() {
   const [username, setUsername] = useState("")
   const [password, setPassword] = useState("")
   const [stats, setStats] = useState<AdminStats | null>(null)
-  const [datasets, setDatasets] = useState<{ malicious_urls: URLData[]; valid_urls: URLData[] } | null>(null)
+  const [datasets, setDatasets] = useState<Partial<Record<DatasetTable, URLPage>> | null>(null)
+  const [datasetsVersion, setDatasetsVersion] = useState(0)
   const [reports, setReports] = useState<Report[]>([])
   const [loading, setLoading] = useState(false)
   const [newUrl, setNewUrl] = useState("")
@@ -136,6 +144,11 @@ export default function AdminPage() {
   // Pagination states
   const [maliciousPage, setMaliciousPage] = useState(1)
   const [validPage, setValidPage] = useState(1)
+  // Cursor for each loaded page of a table; page n is fetched with entry n - 1
+  const [pageCursors, setPageCursors] = useState<Record<DatasetTable, (number | null)[]>>({
+    malicious_urls: [null],
+    valid_urls: [null],
+  })
   const itemsPerPage = 50
 
   useEffect(() => {
@@ -201,6 +214,7 @@ export default function AdminPage() {
     setValidSearch("")
     setMaliciousPage(1)
     setValidPage(1)
+    setPageCursors({ malicious_urls: [null], valid_urls: [null] })
   }
 
   const loadAdminData = async (authToken: string) => {
@@ -222,22 +236,8 @@ export default function AdminPage() {
         console.warn("Stats endpoint unavailable:", error)
       }
 
-      // Load datasets with error handling
-      try {
-        const datasetsResponse = await fetch("http://localhost:8000/admin/datasets", {
-          headers: {
-            Authorization: `Bearer ${authToken}`,
-          },
-        })
-        if (datasetsResponse.ok) {
-          const datasetsData = await datasetsResponse.json()
-          setDatasets(datasetsData)
-        } else {
-          console.warn("Failed to load datasets")
-        }
-      } catch (error) {
-        console.warn("Datasets endpoint unavailable:", error)
-      }
+      // Reload the visible dataset pages
+      setDatasetsVersion((version) => version + 1)
 
       // Load reports with error handling
       try {
@@ -261,6 +261,89 @@ export default function AdminPage() {
     }
   }
 
+  const datasetParams = (table: DatasetTable, search: string) => {
+    const params = new URLSearchParams({ table })
+    if (search) params.set("q", search)
+    return params
+  }
+
+  const loadDatasetPage = async (authToken: string, table: DatasetTable, page: number, search: string) => {
+    const params = datasetParams(table, search)
+    params.set("limit", String(itemsPerPage))
+    const cursor = pageCursors[table][page - 1]
+    if (cursor !== null && cursor !== undefined) params.set("cursor", String(cursor))
+
+    try {
+      const response = await fetch(`http://localhost:8000/admin/datasets?${params}`, {
+        headers: {
+          Authorization: `Bearer ${authToken}`,
+        },
+      })
+      if (response.ok) {
+        const data = await response.json()
+        setDatasets((current) => ({ ...current, [table]: { items: data.items, nextCursor: data.next_cursor } }))
+        setPageCursors((current) => {
+          const cursors = current[table].slice(0, page)
+          cursors[page] = data.next_cursor
+          return { ...current, [table]: cursors }
+        })
+      } else {
+        console.warn("Failed to load datasets")
+      }
+    } catch (error) {
+      console.warn("Datasets endpoint unavailable:", error)
+    }
+  }
+
+  const exportDataset = async (table: DatasetTable, search: string) => {
+    if (!token) return
+
+    const params = datasetParams(table, search)
+    params.set("format", "csv")
+    try {
+      const response = await fetch(`http://localhost:8000/admin/datasets?${params}`, {
+        headers: {
+          Authorization: `Bearer ${token}`,
+        },
+      })
+      if (response.ok) {
+        const link = document.createElement("a")
+        link.href = URL.createObjectURL(await response.blob())
+        link.download = `${table}.csv`
+        link.click()
+        URL.revokeObjectURL(link.href)
+      }
+    } catch (error) {
+      console.error("Error exporting dataset:", error)
+    }
+  }
+
+  const handleAllReports = async (action: string) => {
+    if (!token || reports.length === 0) return
+
+    try {
+      const response = await fetch("http://localhost:8000/admin/handle-reports", {
+        method: "POST",
+        headers: {
+          "Content-Type": "application/json",
+          Authorization: `Bearer ${token}`,
+        },
+        body: JSON.stringify({
+          report_ids: reports.map((report) => report.id),
+          action: action,
+        }),
+      })
+
+      if (response.ok) {
+        const data = await response.json()
+        loadAdminData(token)
+        alert(data.message)
+      }
+    } catch (error) {
+      console.error("Error handling reports:", error)
+    }
+  }
+
   const addUrl = async () => {
     if (!newUrl || !token) return
 
@@ -334,12 +417,12 @@ export default function AdminPage() {
     }
   }
 
-  const retrainModel = async () => {
+  const retrainModel = async (full = false) => {
     if (!token) return
 
     setLoading(true)
     try {
-      const response = await fetch("http://localhost:8000/admin/retrain-model", {
+      const response = await fetch(`http://localhost:8000/admin/retrain-model${full ? "?full=true" : ""}`, {
         method: "POST",
         headers: {
           Authorization: `Bearer ${token}`,
@@ -347,8 +430,24 @@ export default function AdminPage() {
       })
 
       if (response.ok) {
-        const data = await response.json()
-        alert(`Model retrained successfully! New accuracy: ${(data.accuracy * 100).toFixed(2)}%`)
+        // Retraining runs in the background; poll the job until it finishes
+        let job = await response.json()
+        while (job.status === "queued" || job.status === "running") {
+          await new Promise((resolve) => setTimeout(resolve, 2000))
+          const jobResponse = await fetch(`http://localhost:8000/admin/retrain-jobs/${job.job_id}`, {
+            headers: {
+              Authorization: `Bearer ${token}`,
+            },
+          })
+          if (!jobResponse.ok) break
+          job = await jobResponse.json()
+        }
+
+        if (job.status === "completed") {
+          alert(`Model retrained successfully! New accuracy: ${(job.accuracy * 100).toFixed(2)}%`)
+        } else {
+          alert(`Model retraining failed: ${job.error || "unknown error"}`)
+        }
       }
     } catch (error) {
       console.error("Error retraining model:", error)
@@ -358,30 +457,9 @@ export default function AdminPage() {
     }
   }
 
-  // Filter functions for search
-  const filteredMaliciousUrls = datasets?.malicious_urls.filter(url =>
-    url.url.toLowerCase().includes(maliciousSearch.toLowerCase()) ||
-    url.source.toLowerCase().includes(maliciousSearch.toLowerCase())
-  ) || []
-
-  const filteredValidUrls = datasets?.valid_urls.filter(url =>
-    url.url.toLowerCase().includes(validSearch.toLowerCase()) ||
-    url.source.toLowerCase().includes(validSearch.toLowerCase())
-  ) || []
-
-  // Pagination calculations
-  const totalMaliciousPages = Math.ceil(filteredMaliciousUrls.length / itemsPerPage)
-  const totalValidPages = Math.ceil(filteredValidUrls.length / itemsPerPage)
-  
-  const paginatedMaliciousUrls = filteredMaliciousUrls.slice(
-    (maliciousPage - 1) * itemsPerPage,
-    maliciousPage * itemsPerPage
-  )
-  
-  const paginatedValidUrls = filteredValidUrls.slice(
-    (validPage - 1) * itemsPerPage,
-    validPage * itemsPerPage
-  )
+  // Pages are searched and paginated on the server
+  const paginatedMaliciousUrls = datasets?.malicious_urls?.items || []
+  const paginatedValidUrls = datasets?.valid_urls?.items || []
 
   // Reset page when search changes
   useEffect(() => {
@@ -392,6 +470,19 @@ export default function AdminPage() {
     setValidPage(1)
   }, [validSearch])
 
+  // Fetch the visible page, debounced while typing a search
+  useEffect(() => {
+    if (!token) return
+    const timer = setTimeout(() => loadDatasetPage(token, "malicious_urls", maliciousPage, maliciousSearch), 300)
+    return () => clearTimeout(timer)
+  }, [token, maliciousPage, maliciousSearch, datasetsVersion])
+
+  useEffect(() => {
+    if (!token) return
+    const timer = setTimeout(() => loadDatasetPage(token, "valid_urls", validPage, validSearch), 300)
+    return () => clearTimeout(timer)
+  }, [token, validPage, validSearch, datasetsVersion])
+
   if (!token) {
     return (
       <div className="min-h-screen bg-gradient-to-br from-gray-900 to-gray-800 flex items-center justify-center">
@@ -556,7 +647,7 @@ export default function AdminPage() {
                   <CardHeader>
                     <CardTitle className="flex items-center text-red-400 mb-4">
                       <AlertTriangle className="h-5 w-5 mr-2" />
-                      Malicious URLs ({filteredMaliciousUrls.length} total)
+                      Malicious URLs ({stats?.malicious_count ?? 0} total)
                     </CardTitle>
                     <div className="relative">
                       <Search className="absolute left-3 top-1/2 transform -translate-y-1/2 h-4 w-4 text-gray-400" />
@@ -595,13 +686,19 @@ export default function AdminPage() {
                         </TableBody>
                       </Table>
                     </div>
-                    {totalMaliciousPages > 1 && (
-                      <Pagination
-                        currentPage={maliciousPage}
-                        totalPages={totalMaliciousPages}
-                        onPageChange={setMaliciousPage}
-                      />
-                    )}
+                    <Pagination
+                      currentPage={maliciousPage}
+                      hasNext={datasets.malicious_urls?.nextCursor != null}
+                      onPageChange={setMaliciousPage}
+                    />
+                    <Button
+                      variant="outline"
+                      size="sm"
+                      onClick={() => exportDataset("malicious_urls", maliciousSearch)}
+                      className="w-full border-gray-600 text-gray-300 hover:bg-gray-700"
+                    >
+                      Export CSV
+                    </Button>
                   </CardContent>
                 </Card>
 
@@ -610,7 +707,7 @@ export default function AdminPage() {
                   <CardHeader>
                     <CardTitle className="flex items-center text-green-400 mb-4">
                       <CheckCircle className="h-5 w-5 mr-2" />
-                      Valid URLs ({filteredValidUrls.length} total)
+                      Valid URLs ({stats?.valid_count ?? 0} total)
                     </CardTitle>
                     <div className="relative">
                       <Search className="absolute left-3 top-1/2 transform -translate-y-1/2 h-4 w-4 text-gray-400" />
@@ -649,13 +746,19 @@ export default function AdminPage() {
                         </TableBody>
                       </Table>
                     </div>
-                    {totalValidPages > 1 && (
-                      <Pagination
-                        currentPage={validPage}
-                        totalPages={totalValidPages}
-                        onPageChange={setValidPage}
-                      />
-                    )}
+                    <Pagination
+                      currentPage={validPage}
+                      hasNext={datasets.valid_urls?.nextCursor != null}
+                      onPageChange={setValidPage}
+                    />
+                    <Button
+                      variant="outline"
+                      size="sm"
+                      onClick={() => exportDataset("valid_urls", validSearch)}
+                      className="w-full border-gray-600 text-gray-300 hover:bg-gray-700"
+                    >
+                      Export CSV
+                    </Button>
                   </CardContent>
                 </Card>
               </div>
@@ -672,6 +775,16 @@ export default function AdminPage() {
                 <CardDescription className="text-gray-400">Review and approve/reject user-submitted reports</CardDescription>
               </CardHeader>
               <CardContent>
+                {reports.length > 0 && (
+                  <div className="flex justify-end space-x-2 mb-4">
+                    <Button size="sm" onClick={() => handleAllReports("approve")} className="bg-green-600 hover:bg-green-700">
+                      Approve All ({reports.length})
+                    </Button>
+                    <Button size="sm" variant="outline" onClick={() => handleAllReports("reject")} className="border-gray-600 text-gray-300 hover:bg-gray-700">
+                      Reject All ({reports.length})
+                    </Button>
+                  </div>
+                )}
                 {reports.length === 0 ? (
                   <p className="text-gray-500 text-center py-8">No pending reports</p>
                 ) : (
@@ -727,13 +840,21 @@ export default function AdminPage() {
               <CardContent className="space-y-4">
                 <Alert className="bg-gray-700 border-gray-600">
                   <AlertDescription className="text-gray-300">
-                    Retraining the model will use all current URLs in the database to create a new model. This process
-                    may take a few minutes.
+                    Retraining updates the model with URLs added since it was last trained. A full rebuild uses all
+                    current URLs in the database to create a new model and may take a few minutes.
                   </AlertDescription>
                 </Alert>
-                <Button onClick={retrainModel} disabled={loading} className="w-full bg-blue-600 hover:bg-blue-700">
+                <Button onClick={() => retrainModel()} disabled={loading} className="w-full bg-blue-600 hover:bg-blue-700">
                   {loading ? "Retraining Model..." : "Retrain Model"}
                 </Button>
+                <Button
+                  onClick={() => retrainModel(true)}
+                  disabled={loading}
+                  variant="outline"
+                  className="w-full border-gray-600 text-gray-300 hover:bg-gray-700"
+                >
+                  Full Rebuild
+                </Button>
               </CardContent>
             </Card>
           </TabsContent>
@@ -0,0 +1,124 @@
+import functools
+import os
+import threading
+import time
+import weakref
+from collections import OrderedDict
+
+
+class TTLCache:
+    """Thread-safe, size-bounded LRU cache with per-entry expiry"""
+
+    def __init__(self, max_entries=10000, ttl=300, purge_interval=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data = OrderedDict()  # key -> (value, expires_at)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self._purger = None
+        self._purge_interval = None
+        self._stop_purger = threading.Event()
+        if purge_interval:
+            self.start_purger(purge_interval)
+            # Threads do not survive fork, e.g. gunicorn workers forked from a preloaded app
+            if hasattr(os, 'register_at_fork'):
+                os.register_at_fork(after_in_child=functools.partial(_restart_purger, weakref.ref(self)))
+
+    def get(self, key, default=None):
+        """Return the cached value, refreshing its LRU position"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return default
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, ttl=None):
+        """Store a value, evicting the least recently used entries when full"""
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        """Remove a key, returning True if it was present"""
+        with self._lock:
+            return self._data.pop(key, None) is not None
+
+    def clear(self):
+        """Drop every entry"""
+        with self._lock:
+            self._data.clear()
+
+    def purge_expired(self):
+        """Remove all expired entries, returning how many were dropped"""
+        now = time.monotonic()
+        with self._lock:
+            expired = [key for key, (_, expires_at) in self._data.items() if expires_at <= now]
+            for key in expired:
+                del self._data[key]
+            self.expirations += len(expired)
+        return len(expired)
+
+    def start_purger(self, interval=60):
+        """Purge expired entries periodically on a daemon thread"""
+        if self._purger is not None and self._purger.is_alive():
+            return
+
+        def run():
+            while not self._stop_purger.wait(interval):
+                self.purge_expired()
+
+        self._purge_interval = interval
+        self._stop_purger.clear()
+        self._purger = threading.Thread(target=run, name='ttl-cache-purger', daemon=True)
+        self._purger.start()
+
+    def stop_purger(self):
+        """Stop the background purge thread"""
+        self._stop_purger.set()
+        self._purge_interval = None
+        if self._purger is not None:
+            self._purger.join(timeout=1)
+            self._purger = None
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        """Report size and hit/miss counters"""
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._data),
+            'max_entries': self.max_entries,
+            'ttl': self.ttl,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+            'evictions': self.evictions,
+            'expirations': self.expirations
+        }
+
+
+def _restart_purger(cache_ref):
+    """Restart a cache's purge thread in a forked child"""
+    cache = cache_ref()
+    if cache is not None and cache._purge_interval:
+        cache._lock = threading.Lock()
+        cache.start_purger(cache._purge_interval)
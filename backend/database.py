@@ -1,8 +1,344 @@
 import psycopg2
-from psycopg2.extras import RealDictCursor
+from psycopg2 import pool as pg_pool
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE, TRANSACTION_STATUS_UNKNOWN
+from psycopg2.extras import RealDictCursor, execute_values
 import os
+import time
+import uuid
+import queue
+import atexit
+import logging
+import threading
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import contextmanager
 
+# Rows per round trip for streaming server-side cursors
+STREAM_FETCH_SIZE = int(os.getenv('DB_STREAM_FETCH_SIZE', 10000))
+
+# Tables and columns stream_urls may select; they are interpolated into SQL
+URL_TABLES = frozenset(['malicious_urls', 'valid_urls'])
+URL_COLUMNS = frozenset(['id', 'url', 'source', 'date_added', 'verified'])
+URL_PAGE_COLUMNS = ('id', 'url', 'source', 'date_added', 'verified')
+
+# Report status set by each moderation action
+REPORT_STATUSES = {'approve': 'approved', 'reject': 'rejected'}
+
+class PoolTimeout(pg_pool.PoolError):
+    """Raised when no pooled connection becomes available in time"""
+
+class _TrackedConnectionPool(pg_pool.ThreadedConnectionPool):
+    """ThreadedConnectionPool that reports each connection it opens"""
+    
+    def __init__(self, minconn, maxconn, on_connect, **config):
+        self._on_connect = on_connect  # set first: the base class opens minconn connections
+        super().__init__(minconn, maxconn, **config)
+    
+    def _connect(self, key=None):
+        conn = super()._connect(key)
+        self._on_connect(conn)
+        return conn
+
+class ConnectionPool:
+    """Thread-safe PostgreSQL connection pool with health checks and bounded checkout wait
+    
+    Once closed it hands out no connections; ones still checked out are
+    closed when they are returned.
+    """
+    
+    def __init__(self, config, minconn=1, maxconn=10, timeout=5.0, ping_after=30.0):
+        self.config = config
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.ping_after = ping_after  # Idle seconds after which a connection is pinged on checkout
+        self._pool = None
+        self._closed = False
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(maxconn)
+        self._last_used = {}
+        self.in_use = 0
+        self.checkouts = 0
+        self.waits = 0
+        self.timeouts = 0
+        self.discarded = 0
+        self.total_wait = 0.0
+    
+    def _get_pool(self):
+        # Created lazily so importing the backend does not require a reachable database
+        if self._pool is None:
+            with self._lock:
+                if self._closed:
+                    raise pg_pool.PoolError("connection pool is closed")
+                if self._pool is None:
+                    self._pool = _TrackedConnectionPool(self.minconn, self.maxconn, self._mark_used, **self.config)
+        return self._pool
+    
+    def _mark_used(self, conn):
+        self._last_used[id(conn)] = time.monotonic()
+    
+    def _is_healthy(self, conn):
+        if conn.closed or conn.get_transaction_status() == TRANSACTION_STATUS_UNKNOWN:
+            return False
+        if time.monotonic() - self._last_used.get(id(conn), float('-inf')) > self.ping_after:
+            try:
+                with conn.cursor() as cursor:
+                    cursor.execute("SELECT 1")
+                conn.rollback()
+            except psycopg2.Error:
+                return False
+        return True
+    
+    def getconn(self):
+        """Check out a healthy connection, waiting at most `timeout` seconds for a free slot"""
+        started = time.monotonic()
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.waits += 1
+            if not self._slots.acquire(timeout=self.timeout):
+                with self._lock:
+                    self.timeouts += 1
+                raise PoolTimeout(f"No database connection available within {self.timeout}s")
+        
+        try:
+            pool = self._get_pool()
+            conn = pool.getconn()
+            while not self._is_healthy(conn):
+                self._discard(conn)
+                pool.putconn(conn, close=True)
+                conn = pool.getconn()
+        except Exception:
+            self._slots.release()
+            raise
+        
+        with self._lock:
+            self.in_use += 1
+            self.checkouts += 1
+            self.total_wait += time.monotonic() - started
+        return conn
+    
+    def putconn(self, conn):
+        """Return a connection, discarding it if it is broken"""
+        close = bool(conn.closed)
+        if not close and conn.get_transaction_status() != TRANSACTION_STATUS_IDLE:
+            try:
+                conn.rollback()
+            except psycopg2.Error:
+                close = True
+        
+        pool = self._pool
+        if pool is None:
+            # Returned after closeall(): close it rather than start a new pool
+            close = True
+        
+        if close:
+            self._discard(conn)
+        else:
+            self._mark_used(conn)
+        
+        try:
+            if pool is None:
+                conn.close()
+            else:
+                pool.putconn(conn, close=close)
+                if conn.closed:
+                    # Closed by the pool as surplus to minconn
+                    self._last_used.pop(id(conn), None)
+        except pg_pool.PoolError:
+            # closeall() ran while it was being returned
+            conn.close()
+        finally:
+            with self._lock:
+                self.in_use -= 1
+            self._slots.release()
+    
+    def _discard(self, conn):
+        with self._lock:
+            self.discarded += 1
+        self._last_used.pop(id(conn), None)
+    
+    def closeall(self):
+        with self._lock:
+            self._closed = True
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.closeall()
+            self._last_used.clear()
+    
+    def stats(self):
+        """Report pool utilization"""
+        idle = len(self._pool._pool) if self._pool is not None else 0
+        return {
+            'min_size': self.minconn,
+            'max_size': self.maxconn,
+            'in_use': self.in_use,
+            'idle': idle,
+            'utilization': round(self.in_use / self.maxconn, 4),
+            'checkouts': self.checkouts,
+            'waits': self.waits,
+            'timeouts': self.timeouts,
+            'discarded': self.discarded,
+            'avg_wait_ms': round(self.total_wait / self.checkouts * 1000, 3) if self.checkouts else 0.0
+        }
+
+logger = logging.getLogger(__name__)
+
+class WriteBehindLogger:
+    """Bounded in-process queue that writes log rows to PostgreSQL in multi-row batches"""
+    
+    TABLES = {
+        'blocked_urls_log': ('url', 'reason', 'user_agent'),
+        'admin_logs': ('action', 'details'),
+    }
+    
+    def __init__(self, database, max_queue=10000, batch_size=500, flush_interval=1.0, block_timeout=0.0):
+        self.database = database
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.block_timeout = block_timeout  # 0 drops immediately when full, >0 applies backpressure
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.enqueued = 0
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.flushes = 0
+    
+    def submit(self, table, row):
+        """Queue a row for insertion, returning False if it had to be dropped"""
+        self._ensure_started()
+        try:
+            if self.block_timeout > 0:
+                self._queue.put((table, row), timeout=self.block_timeout)
+            else:
+                self._queue.put_nowait((table, row))
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+            return False
+        with self._lock:
+            self.enqueued += 1
+        return True
+    
+    def _ensure_started(self):
+        if self._thread is None or not self._thread.is_alive():
+            with self._lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._stop.clear()
+                    self._thread = threading.Thread(target=self._run, name='db-write-behind', daemon=True)
+                    self._thread.start()
+    
+    def _run(self):
+        while not self._stop.is_set():
+            batch = []
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            if batch:
+                self._write(batch)
+    
+    def _drain(self):
+        batch = []
+        while True:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                return batch
+    
+    def _write(self, batch):
+        grouped = {}
+        for table, row in batch:
+            grouped.setdefault(table, []).append(row)
+        
+        with self._flush_lock:
+            try:
+                with self.database.get_connection() as conn:
+                    cursor = conn.cursor()
+                    for table, rows in grouped.items():
+                        columns = ', '.join(self.TABLES[table])
+                        execute_values(
+                            cursor,
+                            f"INSERT INTO {table} ({columns}) VALUES %s",
+                            rows,
+                            page_size=self.batch_size
+                        )
+                    conn.commit()
+                written = len(batch)
+            except psycopg2.DataError as e:
+                # One bad row should not lose the whole batch
+                logger.warning(f"Batch log insert rejected ({e}); retrying row by row")
+                written = self._write_rows(grouped)
+            except Exception as e:
+                logger.error(f"Failed to flush {len(batch)} log rows: {e}")
+                written = 0
+            
+            with self._lock:
+                self.written += written
+                self.failed += len(batch) - written
+                self.flushes += 1
+    
+    def _write_rows(self, grouped):
+        """Insert rows one at a time, returning how many made it in
+        
+        Losing the connection part way counts the rest as failed instead of
+        raising, so the writer thread keeps running.
+        """
+        written = 0
+        try:
+            with self.database.get_connection() as conn:
+                cursor = conn.cursor()
+                for table, rows in grouped.items():
+                    columns = self.TABLES[table]
+                    sql = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join(['%s'] * len(columns))})"
+                    for row in rows:
+                        try:
+                            cursor.execute(sql, row)
+                            conn.commit()
+                            written += 1
+                        except psycopg2.Error as e:
+                            # A dead connection fails the rollback too, ending the loop
+                            conn.rollback()
+                            logger.error(f"Failed to log row into {table}: {e}")
+        except Exception as e:
+            logger.error(f"Row-by-row log insert stopped after {written} rows: {e}")
+        return written
+    
+    def flush(self):
+        """Write everything currently queued"""
+        batch = self._drain()
+        for start in range(0, len(batch), self.batch_size):
+            self._write(batch[start:start + self.batch_size])
+    
+    def close(self, timeout=5.0):
+        """Stop the background writer and flush the remaining backlog"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=timeout)
+            self._thread = None
+        self.flush()
+    
+    def stats(self):
+        """Report backlog and write counters"""
+        return {
+            'backlog': self._queue.qsize(),
+            'max_queue': self._queue.maxsize,
+            'enqueued': self.enqueued,
+            'written': self.written,
+            'dropped': self.dropped,
+            'failed': self.failed,
+            'flushes': self.flushes
+        }
+
 class Database:
     def __init__(self):
         self.config = {
@@ -12,20 +348,44 @@ class Database:
             'database': os.getenv('DB_NAME', 'safeguard_db'),
             'port': os.getenv('DB_PORT', 5432)
         }
+        self.pool = ConnectionPool(
+            self.config,
+            minconn=int(os.getenv('DB_POOL_MIN', 1)),
+            maxconn=int(os.getenv('DB_POOL_MAX', 10)),
+            timeout=float(os.getenv('DB_POOL_TIMEOUT', 5)),
+            ping_after=float(os.getenv('DB_POOL_PING_AFTER', 30))
+        )
+        self.log_writer = WriteBehindLogger(
+            self,
+            max_queue=int(os.getenv('DB_LOG_QUEUE_SIZE', 10000)),
+            batch_size=int(os.getenv('DB_LOG_BATCH_SIZE', 500)),
+            flush_interval=float(os.getenv('DB_LOG_FLUSH_INTERVAL', 1.0)),
+            block_timeout=float(os.getenv('DB_LOG_BLOCK_TIMEOUT', 0))
+        )
+        atexit.register(self.log_writer.close)
     
     @contextmanager
     def get_connection(self):
-        conn = None
+        conn = self.pool.getconn()
         try:
-            conn = psycopg2.connect(**self.config)
             yield conn
         except Exception as e:
-            if conn:
-                conn.rollback()
+            try:
+                if not conn.closed:
+                    conn.rollback()
+            except psycopg2.Error:
+                pass
             raise e
         finally:
-            if conn:
-                conn.close()
+            self.pool.putconn(conn)
+    
+    def pool_stats(self):
+        """Get connection pool utilization"""
+        return self.pool.stats()
+    
+    def log_queue_stats(self):
+        """Get write-behind log queue backlog"""
+        return self.log_writer.stats()
     
     def get_malicious_urls(self):
         """Get all malicious URLs"""
@@ -41,6 +401,110 @@ class Database:
             cursor.execute("SELECT * FROM valid_urls ORDER BY date_added DESC")
             return cursor.fetchall()
     
+    def get_urls_page(self, table, limit=50, before_id=None, **filters):
+        """One page of a URL table, newest id first, with keyset pagination
+        
+        Pass the last id of a page as `before_id` to get the next one. Returns
+        (rows, next_before_id), where next_before_id is None on the last page.
+        """
+        columns = self._check_url_query(table, URL_PAGE_COLUMNS)
+        where, params = self._url_filters(before_id=before_id, **filters)
+        with self.get_connection() as conn:
+            cursor = conn.cursor(cursor_factory=RealDictCursor)
+            cursor.execute(
+                f"SELECT {columns} FROM {table}{where} ORDER BY id DESC LIMIT %s",
+                (*params, limit + 1)
+            )
+            rows = cursor.fetchall()
+        if len(rows) > limit:
+            rows = rows[:limit]
+            return rows, rows[-1]['id']
+        return rows, None
+    
+    def stream_urls(self, table, columns=('url',), fetch_size=None, ordered=False, **filters):
+        """Yield lists of row tuples from a URL table through a named server-side cursor
+        
+        Only `columns` are selected, rows can be narrowed with the filters of
+        _url_filters, and at most `fetch_size` rows are held client-side at a
+        time. With ordered=True rows come newest id first, like get_urls_page.
+        The pooled connection is held until the generator is exhausted or closed.
+        """
+        fetch_size = fetch_size or STREAM_FETCH_SIZE
+        where, params = self._url_filters(**filters)
+        query = f"SELECT {self._check_url_query(table, columns)} FROM {table}{where}"
+        if ordered:
+            query += " ORDER BY id DESC"
+        
+        with self.get_connection() as conn:
+            cursor = conn.cursor(name=f"stream_{table}_{uuid.uuid4().hex[:8]}")
+            cursor.itersize = fetch_size
+            try:
+                cursor.execute(query, params)
+                while True:
+                    rows = cursor.fetchmany(fetch_size)
+                    if not rows:
+                        break
+                    yield rows
+            finally:
+                # End the read transaction, which also drops the server-side cursor
+                if not conn.closed:
+                    conn.rollback()
+    
+    @staticmethod
+    def _check_url_query(table, columns):
+        """Validate a URL table and column list, which are interpolated into SQL"""
+        if table not in URL_TABLES:
+            raise ValueError(f"Unknown URL table: {table}")
+        unknown = set(columns) - URL_COLUMNS
+        if unknown:
+            raise ValueError(f"Unknown columns: {', '.join(sorted(unknown))}")
+        return ', '.join(columns)
+    
+    @staticmethod
+    def _url_filters(since=None, until=None, source=None, search=None, before_id=None):
+        """WHERE clause and parameters for URL table filters
+        
+        since/until bound date_added (exclusive/inclusive), search matches a
+        URL substring and before_id continues keyset pagination.
+        """
+        conditions, params = [], []
+        if since is not None:
+            conditions.append("date_added > %s")
+            params.append(since)
+        if until is not None:
+            conditions.append("date_added <= %s")
+            params.append(until)
+        if source is not None:
+            conditions.append("source = %s")
+            params.append(source)
+        if search:
+            conditions.append("url ILIKE %s")
+            params.append('%' + search.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%')
+        if before_id is not None:
+            conditions.append("id < %s")
+            params.append(before_id)
+        where = " WHERE " + " AND ".join(conditions) if conditions else ""
+        return where, tuple(params)
+    
+    def get_training_urls(self, table, since=None):
+        """The URLs of a table to train on, optionally only those added after `since`, and their newest date_added
+        
+        Only counts them here: the URLs come back as a TrainingURLs handle that
+        streams them when the training code iterates it.
+        """
+        self._check_url_query(table, ('date_added',))
+        where, params = self._url_filters(since=since)
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f"SELECT COUNT(*), MAX(date_added) FROM {table}{where}", params)
+            count, newest = cursor.fetchone()
+        return TrainingURLs(table, since=since, until=newest, count=count), newest
+    
+    def stream_training_urls(self, table, since=None, until=None):
+        """Yield lists of URL strings added in (since, until], one fetch at a time"""
+        for rows in self.stream_urls(table, ('url',), since=since, until=until):
+            yield [url for url, in rows]
+    
     def add_malicious_url(self, url, source='manual'):
         """Add a malicious URL"""
         with self.get_connection() as conn:
@@ -90,6 +554,63 @@ class Database:
             )
             return cursor.fetchall()
     
+    def get_report(self, report_id):
+        """Get one user report by id"""
+        with self.get_connection() as conn:
+            cursor = conn.cursor(cursor_factory=RealDictCursor)
+            cursor.execute("SELECT * FROM user_reports WHERE id = %s", (report_id,))
+            return cursor.fetchone()
+    
+    def resolve_reports(self, report_ids, action):
+        """Approve or reject pending reports in one transaction, returning the reports handled
+        
+        Approving moves each reported URL to the dataset the report says it
+        belongs in. Ids that are unknown or no longer pending are skipped; the
+        pending rows are locked so concurrent moderators cannot resolve a
+        report twice.
+        """
+        if action not in REPORT_STATUSES:
+            raise ValueError(f"Unknown report action: {action}")
+        
+        with self.get_connection() as conn:
+            cursor = conn.cursor(cursor_factory=RealDictCursor)
+            cursor.execute(
+                """
+                SELECT id, url, report_type FROM user_reports
+                WHERE id = ANY(%s) AND status = 'pending'
+                ORDER BY id
+                FOR UPDATE
+                """,
+                (list(report_ids),)
+            )
+            reports = cursor.fetchall()
+            if not reports:
+                conn.rollback()
+                return []
+            
+            if action == 'approve':
+                # A false positive belongs in valid_urls, a false negative in malicious_urls
+                for report_type, source_table, target_table in (
+                    ('false_positive', 'malicious_urls', 'valid_urls'),
+                    ('false_negative', 'valid_urls', 'malicious_urls'),
+                ):
+                    urls = list({r['url'] for r in reports if r['report_type'] == report_type})
+                    if not urls:
+                        continue
+                    cursor.execute(f"DELETE FROM {source_table} WHERE url = ANY(%s)", (urls,))
+                    execute_values(
+                        cursor,
+                        f"INSERT INTO {target_table} (url, source) VALUES %s ON CONFLICT (url) DO NOTHING",
+                        [(url, 'user_report') for url in urls]
+                    )
+            
+            cursor.execute(
+                "UPDATE user_reports SET status = %s, admin_action = CURRENT_TIMESTAMP WHERE id = ANY(%s)",
+                (REPORT_STATUSES[action], [r['id'] for r in reports])
+            )
+            conn.commit()
+            return reports
+    
     def update_report_status(self, report_id, status):
         """Update report status"""
         with self.get_connection() as conn:
@@ -101,24 +622,35 @@ class Database:
             conn.commit()
     
     def log_admin_action(self, action, details=None):
-        """Log admin action"""
+        """Log admin action (queued, written in batches)"""
+        return self.log_writer.submit('admin_logs', (action, details))
+    
+    def log_blocked_url(self, url, reason, user_agent=None):
+        """Log blocked URL for analytics (queued, written in batches)"""
+        return self.log_writer.submit('blocked_urls_log', (url, reason, user_agent))
+    
+    def log_model_training(self, version, accuracy, dataset_size, model_path, data_cutoff):
+        """Record a training run; `data_cutoff` is the newest date_added it trained on"""
         with self.get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute(
-                "INSERT INTO admin_logs (action, details) VALUES (%s, %s)",
-                (action, details)
+                """
+                INSERT INTO model_logs (version, accuracy, dataset_size, model_path, data_cutoff)
+                VALUES (%s, %s, %s, %s, %s)
+                """,
+                (version, accuracy, dataset_size, model_path, data_cutoff)
             )
             conn.commit()
     
-    def log_blocked_url(self, url, reason, user_agent=None):
-        """Log blocked URL for analytics"""
+    def get_model_data_cutoff(self, version):
+        """Newest date_added the given model version was trained on, if recorded"""
         with self.get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute(
-                "INSERT INTO blocked_urls_log (url, reason, user_agent) VALUES (%s, %s, %s)",
-                (url, reason, user_agent)
+                "SELECT MAX(data_cutoff) FROM model_logs WHERE version = %s",
+                (version,)
             )
-            conn.commit()
+            return cursor.fetchone()[0]
     
     def get_admin_user(self, username):
         """Get admin user by username"""
@@ -155,5 +687,54 @@ class Database:
             
             return stats
 
-# Global database instance
+class TrainingURLs:
+    """The URLs of one table that a training run reads, streamed when iterated
+    
+    The handle is cheap to pickle: a trainer in a spawned process streams
+    the rows itself through a server-side cursor instead of receiving them
+    from the API process. Rows are bounded by `until`, the newest date_added
+    when they were counted, so a run reads the rows its cutoff covers.
+    """
+    
+    def __init__(self, table, since=None, until=None, count=0):
+        self.table = table
+        self.since = since
+        self.until = until
+        self.count = count
+    
+    def __len__(self):
+        """Rows counted when the run started; iteration skips any deleted since"""
+        return self.count
+    
+    def __iter__(self):
+        if not self.count:
+            return
+        for urls in db.stream_training_urls(self.table, since=self.since, until=self.until):
+            yield from urls
+
+class AsyncDatabase:
+    """Executor-backed async facade over Database for use in async handlers"""
+    
+    def __init__(self, database, max_workers=None):
+        self._db = database
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers or int(os.getenv('DB_EXECUTOR_WORKERS', 16)),
+            thread_name_prefix='db'
+        )
+    
+    def __getattr__(self, name):
+        attr = getattr(self._db, name)
+        if not callable(attr):
+            return attr
+        
+        async def call(*args, **kwargs):
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, functools.partial(attr, *args, **kwargs))
+        
+        call.__name__ = name
+        call.__doc__ = attr.__doc__
+        return call
+
+# Global database instances
 db = Database()
+adb = AsyncDatabase(db)
@@ -1,5 +1,9 @@
-import requests
+import asyncio
 import hashlib
+import heapq
+import itertools
+import logging
+import threading
 import urllib.parse
 from typing import Dict, List
 import os
@@ -7,100 +11,357 @@ import time
 import json
 from datetime import datetime, timedelta
 
+import http_clients
+from cache import TTLCache
+from rate_limit import TokenBucket
+from resilience import CircuitBreaker, CircuitOpen, raise_for_outage
+from safe_browsing_local import SafeBrowsingLocalDB
+
+logger = logging.getLogger(__name__)
+
+# 'lookup' asks threatMatches:find about every uncached URL; 'update' matches
+# URLs against a local copy of the lists synced through the Update API
+GSB_MODE = os.getenv('GSB_MODE', 'lookup').lower()
+GSB_API_BASE = os.getenv('GSB_API_BASE', 'https://safebrowsing.googleapis.com/v4')
+GSB_THREAT_LISTS = os.getenv('GSB_THREAT_LISTS', 'MALWARE,SOCIAL_ENGINEERING,UNWANTED_SOFTWARE').split(',')
+GSB_LOCAL_DB_DIR = os.getenv('GSB_LOCAL_DB_DIR', 'data/safe_browsing')
+GSB_UPDATE_INTERVAL = int(os.getenv('GSB_UPDATE_INTERVAL', 1800))
+# Seconds before a slow Safe Browsing lookup gets a second, identical request; 0 turns hedging off
+GSB_HEDGE_DELAY = float(os.getenv('GSB_HEDGE_DELAY', 0))
+# Concurrent async lookups are sent together: the first waits up to GSB_BATCH_WINDOW
+# seconds for company, and a batch goes out at once when it reaches GSB_BATCH_SIZE URLs
+GSB_BATCH_WINDOW = float(os.getenv('GSB_BATCH_WINDOW', 0.005))
+GSB_BATCH_SIZE = min(int(os.getenv('GSB_BATCH_SIZE', 500)), 500)  # threatMatches:find takes at most 500 entries
+# Requests in flight at once; later ones wait their turn before the connect and read timeouts start
+GSB_MAX_CONCURRENCY = int(os.getenv('GSB_MAX_CONCURRENCY', http_clients.FEED_HTTP_POOL_SIZE))
+
+# Per-feed circuit breakers: after FEED_BREAKER_FAILURES failed or slow calls
+# in a row a feed is skipped for FEED_BREAKER_RESET seconds, then probed
+FEED_BREAKER_FAILURES = int(os.getenv('FEED_BREAKER_FAILURES', 5))
+FEED_BREAKER_RESET = float(os.getenv('FEED_BREAKER_RESET', 30))
+FEED_BREAKER_SLOW_CALL = float(os.getenv('FEED_BREAKER_SLOW_CALL', 0)) or None  # seconds; 0 means only failures count
+
+def feed_breaker(name: str, **kwargs) -> CircuitBreaker:
+    """A circuit breaker configured from the FEED_BREAKER_* settings"""
+    return CircuitBreaker(
+        name,
+        failure_threshold=FEED_BREAKER_FAILURES,
+        reset_timeout=FEED_BREAKER_RESET,
+        slow_call=FEED_BREAKER_SLOW_CALL,
+        **kwargs
+    )
+
+def unavailable_result(source: str) -> Dict:
+    """Result for a feed skipped because its circuit is open"""
+    return {
+        'is_threat': False,
+        'threat_type': None,
+        'source': source,
+        'status': 'unavailable',
+        'message': f'{source} is failing; skipped until it recovers',
+        'confidence': 0.0
+    }
+
+class LookupBatcher:
+    """Coalesce concurrent lookups into one request per batch
+    
+    Callers arriving within `window` seconds of the first pending one share
+    a call to `send(urls)`, which returns a result per URL; a batch is sent
+    as soon as it holds `max_size` URLs. Repeat URLs in a window share one
+    entry. The request runs in its own task, so a caller giving up at its
+    deadline does not cancel it for the others.
+    """
+    
+    def __init__(self, send, window=0.005, max_size=500):
+        self.send = send  # async (urls) -> {url: result}
+        self.window = window
+        self.max_size = max_size
+        self._pending = {}  # url -> future shared by its callers
+        self._timer = None
+        self._tasks = set()
+        self.batches = 0
+        self.urls = 0
+        self.largest = 0
+    
+    async def lookup(self, url: str):
+        future = self._pending.get(url)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = loop.create_future()
+            # Retrieve the outcome even if every caller gave up waiting
+            future.add_done_callback(lambda f: f.cancelled() or f.exception())
+            self._pending[url] = future
+            if len(self._pending) >= self.max_size:
+                self._flush()
+            elif self._timer is None:
+                self._timer = loop.call_later(self.window, self._flush)
+        return await asyncio.shield(future)
+    
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, {}
+        if batch:
+            self.batches += 1
+            self.urls += len(batch)
+            self.largest = max(self.largest, len(batch))
+            task = asyncio.ensure_future(self._send(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+    
+    async def _send(self, batch):
+        try:
+            results = await self.send(list(batch))
+        except Exception as e:
+            for future in batch.values():
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for url, future in batch.items():
+            if not future.done():
+                future.set_result(results[url])
+    
+    def stats(self) -> Dict:
+        return {
+            'window_ms': round(self.window * 1000, 1),
+            'max_size': self.max_size,
+            'pending': len(self._pending),
+            'requests': self.batches,
+            'urls': self.urls,
+            'largest': self.largest,
+            'avg_urls_per_request': round(self.urls / self.batches, 1) if self.batches else 0.0
+        }
+
 class GoogleSafeBrowsingAPI:
     """Enhanced Google Safe Browsing API integration"""
     
     def __init__(self):
         self.api_key = os.getenv('GOOGLE_SAFE_BROWSING_API_KEY', 'demo_key')
-        self.base_url = "https://safebrowsing.googleapis.com/v4/threatMatches:find"
-        self.cache = {}  # Simple cache for API responses
+        self.base_url = f"{GSB_API_BASE}/threatMatches:find"
         self.cache_duration = 300  # 5 minutes cache
+        self.cache = TTLCache(
+            max_entries=int(os.getenv('GSB_CACHE_SIZE', 100000)),
+            ttl=self.cache_duration,
+            purge_interval=int(os.getenv('FEED_CACHE_PURGE_INTERVAL', 60))
+        )
+        # Lookups are idempotent, so slow ones may be hedged
+        self.breaker = feed_breaker('google_safe_browsing', hedge_delay=GSB_HEDGE_DELAY or None)
+        self.batcher = LookupBatcher(
+            self._lookup_batch, window=GSB_BATCH_WINDOW, max_size=GSB_BATCH_SIZE
+        ) if GSB_BATCH_WINDOW > 0 else None
+        self._slots = None  # (event loop, semaphore) bounding requests in flight
+        self.local_db = None
+        if GSB_MODE == 'update' and self.api_key != 'demo_key':
+            self.local_db = SafeBrowsingLocalDB(
+                self.api_key, GSB_API_BASE, GSB_LOCAL_DB_DIR, GSB_THREAT_LISTS,
+                update_interval=GSB_UPDATE_INTERVAL,
+                cache_size=int(os.getenv('GSB_CACHE_SIZE', 100000)),
+                breaker=self.breaker
+            )
+    
+    @property
+    def mode(self) -> str:
+        if self.api_key == 'demo_key':
+            return 'simulated'
+        return 'update' if self.local_db is not None else 'lookup'
+    
+    def start(self):
+        """Start syncing the local hash-prefix lists in update mode"""
+        if self.local_db is not None:
+            self.local_db.start()
         
     def check_url(self, url: str) -> Dict:
         """Check URL against Google Safe Browsing database with caching"""
         
         # Check cache first
-        cache_key = hashlib.md5(url.encode()).hexdigest()
-        if cache_key in self.cache:
-            cached_result, timestamp = self.cache[cache_key]
-            if time.time() - timestamp < self.cache_duration:
-                return cached_result
+        cached = self._get_cached(url)
+        if cached is not None:
+            return cached
         
         # For demo purposes with real API structure
         if self.api_key == 'demo_key':
             result = self._simulate_safe_browsing_check(url)
+        elif self.local_db is not None and self.local_db.ready:
+            try:
+                result = self.local_db.check_url(url)
+            except CircuitOpen:
+                result = unavailable_result('Google Safe Browsing')
         else:
+            # Also covers update mode until the first sync completes
             result = self._real_api_check(url)
         
         # Cache the result
-        self.cache[cache_key] = (result, time.time())
+        self._store(url, result)
         return result
     
-    def _real_api_check(self, url: str) -> Dict:
-        """Make actual API call to Google Safe Browsing"""
-        try:
-            payload = {
-                "client": {
-                    "clientId": "safeguard-extension",
-                    "clientVersion": "1.0.0"
-                },
-                "threatInfo": {
-                    "threatTypes": [
-                        "MALWARE",
-                        "SOCIAL_ENGINEERING", 
-                        "UNWANTED_SOFTWARE",
-                        "POTENTIALLY_HARMFUL_APPLICATION",
-                        "THREAT_TYPE_UNSPECIFIED"
-                    ],
-                    "platformTypes": ["ANY_PLATFORM", "WINDOWS", "LINUX", "OSX"],
-                    "threatEntryTypes": ["URL"],
-                    "threatEntries": [{"url": url}]
-                }
+    async def check_url_async(self, url: str) -> Dict:
+        """Non-blocking variant of check_url for use on the event loop"""
+        
+        cached = self._get_cached(url)
+        if cached is not None:
+            return cached
+        
+        if self.api_key == 'demo_key':
+            result = self._simulate_safe_browsing_check(url)
+        elif self.local_db is not None and self.local_db.ready:
+            try:
+                result = await self.local_db.check_url_async(url, http_clients.get_async_client())
+            except CircuitOpen:
+                result = unavailable_result('Google Safe Browsing')
+        else:
+            result = await self._real_api_check_async(url)
+        
+        self._store(url, result)
+        return result
+    
+    def _get_cached(self, url: str):
+        """Return a fresh cached result for the URL, if any"""
+        return self.cache.get(hashlib.md5(url.encode()).hexdigest())
+    
+    def _store(self, url: str, result: Dict):
+        """Cache a lookup result; failed or skipped lookups are retried next time instead"""
+        if 'error' in result or 'status' in result:
+            return
+        self.cache.set(hashlib.md5(url.encode()).hexdigest(), result)
+    
+    async def aclose(self):
+        """Stop the local list sync; the shared HTTP pools are closed by http_clients.aclose"""
+        if self.local_db is not None:
+            self.local_db.stop()
+    
+    def _build_payload(self, urls: List[str]) -> Dict:
+        """Build a threatMatches:find request body"""
+        return {
+            "client": {
+                "clientId": "safeguard-extension",
+                "clientVersion": "1.0.0"
+            },
+            "threatInfo": {
+                "threatTypes": [
+                    "MALWARE",
+                    "SOCIAL_ENGINEERING", 
+                    "UNWANTED_SOFTWARE",
+                    "POTENTIALLY_HARMFUL_APPLICATION",
+                    "THREAT_TYPE_UNSPECIFIED"
+                ],
+                "platformTypes": ["ANY_PLATFORM", "WINDOWS", "LINUX", "OSX"],
+                "threatEntryTypes": ["URL"],
+                "threatEntries": [{"url": url} for url in urls]
             }
-            
-            response = requests.post(
-                f"{self.base_url}?key={self.api_key}",
-                json=payload,
-                timeout=10
-            )
-            
-            if response.status_code == 200:
-                result = response.json()
-                if 'matches' in result and result['matches']:
-                    threat_type = result['matches'][0]['threatType']
-                    platform_type = result['matches'][0].get('platformType', 'ANY_PLATFORM')
-                    return {
-                        'is_threat': True,
-                        'threat_type': threat_type,
-                        'platform_type': platform_type,
-                        'source': 'Google Safe Browsing',
-                        'confidence': 0.95
-                    }
-                else:
-                    return {
-                        'is_threat': False,
-                        'threat_type': None,
-                        'source': 'Google Safe Browsing',
-                        'confidence': 0.9
-                    }
-            else:
-                return {
-                    'is_threat': False,
-                    'threat_type': None,
-                    'source': 'Google Safe Browsing',
-                    'error': f"API Error: {response.status_code}",
-                    'confidence': 0.0
-                }
-                
-        except Exception as e:
+        }
+    
+    def _parse_response(self, status_code: int, body) -> Dict:
+        """Turn a threatMatches:find response into a lookup result"""
+        if status_code == 200:
+            return self._match_result(body().get('matches'))
+        else:
             return {
                 'is_threat': False,
                 'threat_type': None,
                 'source': 'Google Safe Browsing',
-                'error': str(e),
+                'error': f"API Error: {status_code}",
                 'confidence': 0.0
             }
     
+    def _match_result(self, matches) -> Dict:
+        """Lookup result for one URL given its threat matches"""
+        if matches:
+            return {
+                'is_threat': True,
+                'threat_type': matches[0]['threatType'],
+                'platform_type': matches[0].get('platformType', 'ANY_PLATFORM'),
+                'source': 'Google Safe Browsing',
+                'confidence': 0.95
+            }
+        return {
+            'is_threat': False,
+            'threat_type': None,
+            'source': 'Google Safe Browsing',
+            'confidence': 0.9
+        }
+    
+    def _error_result(self, error: Exception) -> Dict:
+        return {
+            'is_threat': False,
+            'threat_type': None,
+            'source': 'Google Safe Browsing',
+            'error': str(error),
+            'confidence': 0.0
+        }
+    
+    def _post_lookup(self, url: str):
+        return raise_for_outage(http_clients.get_session().post(
+            self.base_url,
+            params={'key': self.api_key},
+            json=self._build_payload([url]),
+            timeout=http_clients.TIMEOUT
+        ))
+    
+    async def _post_lookup_async(self, urls: List[str]):
+        return raise_for_outage(await http_clients.get_async_client().post(
+            self.base_url,
+            params={'key': self.api_key},
+            json=self._build_payload(urls)
+        ))
+    
+    def _request_slots(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        if self._slots is None or self._slots[0] is not loop:
+            self._slots = (loop, asyncio.Semaphore(GSB_MAX_CONCURRENCY))
+        return self._slots[1]
+    
+    async def _lookup_batch(self, urls: List[str]) -> Dict:
+        """Look up several URLs in one threatMatches:find call, returning each URL's result
+        
+        At most GSB_MAX_CONCURRENCY requests are in flight. Time spent queueing for a slot
+        is not part of the call the circuit breaker judges, and a caller that gives up
+        before getting one sends nothing.
+        """
+        slots = self._request_slots()
+        await slots.acquire()
+        request = asyncio.ensure_future(self.breaker.call_async(self._post_lookup_async, urls))
+        request.add_done_callback(lambda done: (slots.release(), done.cancelled() or done.exception()))
+        # A caller giving up leaves the request running; its slot frees up when it ends
+        try:
+            response = await asyncio.shield(request)
+        except asyncio.CancelledError:
+            if not request.done():
+                self.breaker.record_abandoned()
+            raise
+        if response.status_code != 200:
+            return {url: self._parse_response(response.status_code, response.json) for url in urls}
+        matches = {}
+        for match in response.json().get('matches', []):
+            matches.setdefault(match.get('threat', {}).get('url'), []).append(match)
+        return {url: self._match_result(matches.get(url)) for url in urls}
+    
+    def _real_api_check(self, url: str) -> Dict:
+        """Make actual API call to Google Safe Browsing"""
+        try:
+            response = self.breaker.call(self._post_lookup, url)
+            return self._parse_response(response.status_code, response.json)
+        
+        except CircuitOpen:
+            return unavailable_result('Google Safe Browsing')
+        except Exception as e:
+            return self._error_result(e)
+    
+    async def _real_api_check_async(self, url: str) -> Dict:
+        """Make actual API call to Google Safe Browsing without blocking the event loop
+        
+        Concurrent calls are batched into shared requests unless GSB_BATCH_WINDOW is 0.
+        """
+        try:
+            if self.batcher is not None:
+                return await self.batcher.lookup(url)
+            return (await self._lookup_batch([url]))[url]
+        
+        except CircuitOpen:
+            return unavailable_result('Google Safe Browsing')
+        except Exception as e:
+            return self._error_result(e)
+    
     def _simulate_safe_browsing_check(self, url: str) -> Dict:
         """Enhanced simulation with more realistic patterns"""
         
@@ -174,118 +435,360 @@ class GoogleSafeBrowsingAPI:
             'confidence': 0.9
         }
 
+# Scan priorities, most urgent first: requests a user is waiting on
+# (immediate_scan / real_time), other single lookups, then batch work
+SCAN_PRIORITIES = {'interactive': 0, 'normal': 1, 'batch': 2}
+
+class VirusTotalThrottled(Exception):
+    """VirusTotal answered 204/429: the API key is over its request quota"""
+
+class ScanJob:
+    """One URL moving through the VirusTotal scan queue"""
+    
+    def __init__(self, url: str, priority: str = 'normal'):
+        self.url = url
+        self.priority = priority
+        self.scan_id = None  # set once /url/scan accepts the submission
+        self.attempts = 0    # submissions and report polls made so far
+        self.created_at = datetime.utcnow()
+        self.ready = False   # waiting in the ready queue for a request token
+
+class VirusTotalScanQueue:
+    """Background VirusTotal scans, so no request waits for a scan to finish
+    
+    Each queued URL is submitted to /url/scan and its report is then polled
+    with exponential backoff until the scan completes. Finished reports are
+    stored in the API's cache, so later lookups of the URL pick them up. One
+    job exists per URL at a time; a repeat submission joins it, raising its
+    priority if needed. A single daemon thread runs the jobs and is started
+    on first use, so forked workers each get their own.
+    
+    Every call to VirusTotal takes a token from a shared bucket sized to the
+    API key's quota. Steps that are due wait in a priority queue for a token,
+    so interactive lookups go ahead of background and batch work. A 204/429
+    answer pauses the bucket rather than retrying. Batch scans are turned
+    away while the backlog would take longer than max_backlog_wait to drain.
+    Calls go through the API's circuit breaker; while it is open, jobs wait
+    in the queue without using up their attempts.
+    """
+    
+    def __init__(self, api, bucket, max_pending=1000, poll_initial=15.0, poll_max_delay=120.0,
+                 poll_attempts=8, throttle_pause=60.0, max_backlog_wait=600.0, on_result=None):
+        self.api = api
+        self.bucket = bucket
+        self.max_pending = max_pending
+        self.poll_initial = poll_initial
+        self.poll_max_delay = poll_max_delay
+        self.poll_attempts = poll_attempts
+        self.throttle_pause = throttle_pause
+        self.max_backlog_wait = max_backlog_wait
+        self.on_result = on_result  # called with (url, result) when a scan completes
+        self.jobs = {}              # url -> ScanJob
+        self._due = []              # heap of (due time, sequence, job) for steps not yet due
+        self._ready = []            # heap of (priority, sequence, job) for steps waiting on a token
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+        self._thread = None
+        self._stopped = False
+        self.completed = 0
+        self.abandoned = 0
+        self.coalesced = 0
+        self.rejected = 0
+    
+    def submit(self, url: str, priority: str = 'normal'):
+        """Queue a scan of the URL, returning its job (an existing one if already queued) or None if turned away"""
+        with self._condition:
+            job = self.jobs.get(url)
+            if job is not None:
+                self.coalesced += 1
+                if SCAN_PRIORITIES[priority] < SCAN_PRIORITIES[job.priority]:
+                    job.priority = priority
+                    if job.ready:
+                        # The entry under the old priority is skipped when popped
+                        self._push_ready(job)
+                return job
+            if len(self.jobs) >= self.max_pending or (
+                priority == 'batch' and self._backlog_wait() > self.max_backlog_wait
+            ):
+                self.rejected += 1
+                return None
+            job = ScanJob(url, priority)
+            self.jobs[url] = job
+            self._push_ready(job)
+            if self._thread is None or not self._thread.is_alive():
+                self._stopped = False
+                self._thread = threading.Thread(target=self._run, name="virustotal-scans", daemon=True)
+                self._thread.start()
+            return job
+    
+    def stop(self):
+        with self._condition:
+            self._stopped = True
+            self._condition.notify_all()
+    
+    def stats(self) -> Dict:
+        with self._condition:
+            ready = [job for job in self.jobs.values() if job.ready]
+            return {
+                'pending': len(self.jobs),
+                'submitted': sum(1 for job in self.jobs.values() if job.scan_id is not None),
+                'waiting_for_quota': {
+                    name: sum(1 for job in ready if job.priority == name) for name in SCAN_PRIORITIES
+                },
+                'backlog_seconds': round(self._backlog_wait(), 1),
+                'completed': self.completed,
+                'abandoned': self.abandoned,
+                'coalesced': self.coalesced,
+                'rejected': self.rejected,
+                'quota': self.bucket.stats()
+            }
+    
+    def _backlog_wait(self) -> float:
+        """Rough seconds of quota the queued jobs need; each takes a submission and at least one poll"""
+        calls = sum(1 if job.scan_id is not None else 2 for job in self.jobs.values())
+        return calls / self.bucket.rate
+    
+    def _push_ready(self, job):
+        """Queue the job's next step for a token; caller holds the condition"""
+        job.ready = True
+        heapq.heappush(self._ready, (SCAN_PRIORITIES[job.priority], next(self._sequence), job))
+        self._condition.notify()
+    
+    def _schedule(self, job, delay: float):
+        """Queue the job's next step after a delay; caller holds the condition"""
+        heapq.heappush(self._due, (time.monotonic() + delay, next(self._sequence), job))
+        self._condition.notify()
+    
+    def _next_job(self):
+        """Wait until a step is due and a token is free, then return its job; None once stopped"""
+        with self._condition:
+            while not self._stopped:
+                now = time.monotonic()
+                while self._due and self._due[0][0] <= now:
+                    self._push_ready(heapq.heappop(self._due)[2])
+                # Drop entries left behind by a priority change
+                while self._ready and (
+                    not self._ready[0][2].ready or self._ready[0][0] != SCAN_PRIORITIES[self._ready[0][2].priority]
+                ):
+                    heapq.heappop(self._ready)
+                
+                wait = None
+                if self._ready:
+                    # Hold on to tokens while the circuit is open
+                    wait = self.api.breaker.retry_after() or self.bucket.acquire()
+                    if wait == 0:
+                        job = heapq.heappop(self._ready)[2]
+                        job.ready = False
+                        return job
+                if self._due:
+                    wait = min(wait or float('inf'), self._due[0][0] - now)
+                self._condition.wait(wait)
+            return None
+    
+    def _run(self):
+        while True:
+            job = self._next_job()
+            if job is None:
+                return
+            
+            result = None
+            throttled = False
+            try:
+                result = self.api.breaker.call(self._step, job)
+            except VirusTotalThrottled:
+                throttled = True
+            except CircuitOpen:
+                # Another call claimed the half-open probe; try again once it reports back
+                with self._condition:
+                    self._push_ready(job)
+                continue
+            except Exception as e:
+                logger.warning(f"VirusTotal scan of {job.url} failed: {e}")
+            
+            with self._condition:
+                if throttled:
+                    # Not the job's fault: retry it once the quota recovers
+                    job.attempts -= 1
+                    self.bucket.pause(self.throttle_pause)
+                    self._push_ready(job)
+                elif result is not None:
+                    del self.jobs[job.url]
+                    self.completed += 1
+                elif job.attempts >= self.poll_attempts:
+                    del self.jobs[job.url]
+                    self.abandoned += 1
+                else:
+                    self._schedule(job, min(self.poll_max_delay, self.poll_initial * 2 ** (job.attempts - 1)))
+            
+            if result is not None:
+                self.api._store(job.url, result)
+                if self.on_result is not None:
+                    self.on_result(job.url, result)
+    
+    def _step(self, job):
+        """Submit the scan or poll for its report, returning the finished result or None"""
+        job.attempts += 1
+        if job.scan_id is None:
+            response = http_clients.get_session().post(
+                f"{self.api.base_url}/scan",
+                data={'apikey': self.api.api_key, 'url': job.url},
+                timeout=http_clients.TIMEOUT
+            )
+            if response.status_code in (204, 429):
+                raise VirusTotalThrottled()
+            raise_for_outage(response)
+            if response.status_code == 200:
+                job.scan_id = response.json().get('scan_id') or job.url
+            return None
+        
+        response = http_clients.get_session().get(
+            f"{self.api.base_url}/report",
+            params={'apikey': self.api.api_key, 'resource': job.scan_id},
+            timeout=http_clients.TIMEOUT
+        )
+        if response.status_code in (204, 429):
+            raise VirusTotalThrottled()
+        raise_for_outage(response)
+        if response.status_code != 200:
+            return None
+        body = response.json()
+        # response_code -2 means still queued for analysis, 0 not known yet
+        if body.get('response_code') != 1:
+            return None
+        return self.api._parse_report(200, lambda: body)
+
 class VirusTotalAPI:
     """VirusTotal API integration for enhanced threat detection"""
     
     def __init__(self):
         self.api_key = os.getenv('VIRUSTOTAL_API_KEY', 'demo_key')
         self.base_url = "https://www.virustotal.com/vtapi/v2/url"
-        self.cache = {}
         self.cache_duration = 600  # 10 minutes cache
+        self.cache = TTLCache(
+            max_entries=int(os.getenv('VIRUSTOTAL_CACHE_SIZE', 100000)),
+            ttl=self.cache_duration,
+            purge_interval=int(os.getenv('FEED_CACHE_PURGE_INTERVAL', 60))
+        )
+        # The public API allows 4 requests a minute; the quota is per process
+        self.scans = VirusTotalScanQueue(
+            self,
+            TokenBucket(
+                float(os.getenv('VIRUSTOTAL_RATE_PER_MINUTE', 4)),
+                int(os.getenv('VIRUSTOTAL_BURST', 0)) or None
+            ),
+            max_pending=int(os.getenv('VIRUSTOTAL_MAX_PENDING_SCANS', 1000)),
+            poll_initial=float(os.getenv('VIRUSTOTAL_POLL_INITIAL', 15)),
+            poll_max_delay=float(os.getenv('VIRUSTOTAL_POLL_MAX_DELAY', 120)),
+            poll_attempts=int(os.getenv('VIRUSTOTAL_POLL_ATTEMPTS', 8)),
+            throttle_pause=float(os.getenv('VIRUSTOTAL_THROTTLE_PAUSE', 60)),
+            max_backlog_wait=float(os.getenv('VIRUSTOTAL_MAX_BACKLOG_WAIT', 600))
+        )
+        # A quota answer means VirusTotal is up; the bucket handles those.
+        # Scans are not hedged: a second request would spend quota.
+        self.breaker = feed_breaker('virustotal', ignore=(VirusTotalThrottled,))
         
-    def check_url(self, url: str) -> Dict:
-        """Check URL against VirusTotal database"""
+    def check_url(self, url: str, priority: str = 'normal') -> Dict:
+        """Check URL against VirusTotal database
+        
+        An uncached URL is queued for a background scan at the given
+        priority ('interactive', 'normal' or 'batch') and reported as
+        pending; the finished report is cached for later lookups.
+        """
         
         # Check cache first
-        cache_key = hashlib.md5(url.encode()).hexdigest()
-        if cache_key in self.cache:
-            cached_result, timestamp = self.cache[cache_key]
-            if time.time() - timestamp < self.cache_duration:
-                return cached_result
+        cached = self._get_cached(url)
+        if cached is not None:
+            return cached
         
-        if self.api_key == 'demo_key':
-            result = self._simulate_virustotal_check(url)
-        else:
-            result = self._real_api_check(url)
+        if self.api_key != 'demo_key':
+            if self.breaker.retry_after() > 0:
+                # VirusTotal is failing: don't queue work it can't do
+                return unavailable_result('VirusTotal')
+            return self._queue_scan(url, priority)
+        
+        result = self._simulate_virustotal_check(url)
         
         # Cache the result
-        self.cache[cache_key] = (result, time.time())
+        self._store(url, result)
         return result
     
-    def _real_api_check(self, url: str) -> Dict:
-        """Make actual API call to VirusTotal"""
-        try:
-            # First, submit URL for scanning
-            scan_params = {
-                'apikey': self.api_key,
-                'url': url
-            }
-            
-            scan_response = requests.post(
-                f"{self.base_url}/scan",
-                data=scan_params,
-                timeout=10
-            )
-            
-            if scan_response.status_code != 200:
-                return {
-                    'is_threat': False,
-                    'source': 'VirusTotal',
-                    'error': f"Scan API Error: {scan_response.status_code}",
-                    'confidence': 0.0
-                }
-            
-            # Wait a moment for scan to process
-            time.sleep(2)
-            
-            # Get scan report
-            report_params = {
-                'apikey': self.api_key,
-                'resource': url
+    async def check_url_async(self, url: str, priority: str = 'normal') -> Dict:
+        """check_url for use on the event loop; it never waits on the network"""
+        return self.check_url(url, priority)
+    
+    def _get_cached(self, url: str):
+        """Return a fresh cached result for the URL, if any"""
+        return self.cache.get(hashlib.md5(url.encode()).hexdigest())
+    
+    def _store(self, url: str, result: Dict):
+        """Cache a lookup result"""
+        self.cache.set(hashlib.md5(url.encode()).hexdigest(), result)
+    
+    async def aclose(self):
+        """Stop the background scan queue"""
+        self.scans.stop()
+    
+    def _queue_scan(self, url: str, priority: str) -> Dict:
+        """Queue a background scan and return a pending result"""
+        job = self.scans.submit(url, priority)
+        if job is None:
+            # Over quota: answer without VirusTotal rather than queue more calls
+            return {
+                'is_threat': False,
+                'source': 'VirusTotal',
+                'status': 'skipped',
+                'message': 'VirusTotal quota exhausted; URL not scanned',
+                'confidence': 0.0
             }
+        return {
+            'is_threat': False,
+            'source': 'VirusTotal',
+            'status': 'pending',
+            'message': 'Scan queued; the report will be used once it is ready',
+            'queued_at': job.created_at.isoformat(),
+            'confidence': 0.0
+        }
+    
+    def _parse_report(self, status_code: int, body) -> Dict:
+        """Turn a URL report response into a lookup result"""
+        if status_code == 200:
+            result = body()
             
-            report_response = requests.get(
-                f"{self.base_url}/report",
-                params=report_params,
-                timeout=10
-            )
-            
-            if report_response.status_code == 200:
-                result = report_response.json()
+            if result.get('response_code') == 1:  # URL found in database
+                positives = result.get('positives', 0)
+                total = result.get('total', 0)
                 
-                if result.get('response_code') == 1:  # URL found in database
-                    positives = result.get('positives', 0)
-                    total = result.get('total', 0)
-                    
-                    if positives > 0:
-                        threat_ratio = positives / total if total > 0 else 0
-                        return {
-                            'is_threat': True,
-                            'positives': positives,
-                            'total': total,
-                            'threat_ratio': threat_ratio,
-                            'scan_date': result.get('scan_date'),
-                            'source': 'VirusTotal',
-                            'confidence': min(0.95, 0.5 + (threat_ratio * 0.5))
-                        }
-                    else:
-                        return {
-                            'is_threat': False,
-                            'positives': 0,
-                            'total': total,
-                            'source': 'VirusTotal',
-                            'confidence': 0.85
-                        }
+                if positives > 0:
+                    threat_ratio = positives / total if total > 0 else 0
+                    return {
+                        'is_threat': True,
+                        'positives': positives,
+                        'total': total,
+                        'threat_ratio': threat_ratio,
+                        'scan_date': result.get('scan_date'),
+                        'source': 'VirusTotal',
+                        'confidence': min(0.95, 0.5 + (threat_ratio * 0.5))
+                    }
                 else:
                     return {
                         'is_threat': False,
+                        'positives': 0,
+                        'total': total,
                         'source': 'VirusTotal',
-                        'message': 'URL not found in database',
-                        'confidence': 0.5
+                        'confidence': 0.85
                     }
             else:
                 return {
                     'is_threat': False,
                     'source': 'VirusTotal',
-                    'error': f"Report API Error: {report_response.status_code}",
-                    'confidence': 0.0
+                    'message': 'URL not found in database',
+                    'confidence': 0.5
                 }
-                
-        except Exception as e:
+        else:
             return {
                 'is_threat': False,
                 'source': 'VirusTotal',
-                'error': str(e),
+                'error': f"Report API Error: {status_code}",
                 'confidence': 0.0
             }
     
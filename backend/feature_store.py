@@ -0,0 +1,141 @@
+import glob
+import hashlib
+import os
+import time
+import uuid
+from contextlib import contextmanager
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+
+def url_keys(urls):
+    """64-bit BLAKE2b key per URL"""
+    digests = b''.join(hashlib.blake2b(url.encode('utf-8'), digest_size=8).digest() for url in urls)
+    return np.frombuffer(digests, dtype='<u8')
+
+
+class FeatureStore:
+    """Columnar on-disk cache of extracted feature rows
+
+    Rows are keyed by URL hash and stored per label in append-only .npz
+    shards (a key column plus a float32 feature matrix) under a directory
+    named after the feature schema, so changing the extractor starts a fresh
+    store. Each call to blocks() extracts only URLs the store has not seen
+    and appends them as one shard. Rows for URLs that left the table are
+    dropped (complete=True), and many shards merged, by compacting into one.
+    """
+
+    def __init__(self, root, schema, n_features, extract_matrix, max_shards=32):
+        self.path = os.path.join(root, f'schema-{schema}')
+        self.n_features = n_features
+        self.extract_matrix = extract_matrix  # callable(urls) -> float32 matrix, one row per URL
+        self.max_shards = max_shards
+
+    def blocks(self, label, chunks, complete=False):
+        """Feature rows for URLs given in chunks, one matrix per chunk in order
+
+        Only URLs the store has not seen are extracted and stored. Each chunk
+        is dropped once its rows are built, so a chunked stream of URLs is
+        never held in full. Set complete=True when the chunks hold every URL
+        of the label, so rows for removed URLs can be dropped.
+        """
+        with self._locked(label):
+            stored_keys, stored_X, shard_count = self._load(label)
+
+            blocks, seen_keys, new_keys, new_X = [], [], [], []
+            for urls in chunks:
+                keys = url_keys(urls)
+                positions = np.searchsorted(stored_keys, keys)
+                found = positions < len(stored_keys)
+                found[found] = stored_keys[positions[found]] == keys[found]
+                missing = np.flatnonzero(~found)
+
+                X = np.empty((len(urls), self.n_features), dtype=np.float32)
+                X[found] = stored_X[positions[found]]
+                if len(missing):
+                    X[missing] = self.extract_matrix([urls[i] for i in missing])
+                    new_keys.append(keys[missing])
+                    new_X.append(X[missing])
+                blocks.append(X)
+                if complete:
+                    seen_keys.append(keys)
+
+            rows = sum(len(X) for X in blocks)
+            extracted = sum(len(keys) for keys in new_keys)
+            new_keys, first = np.unique(
+                np.concatenate(new_keys) if new_keys else np.empty(0, dtype='<u8'), return_index=True
+            )
+            new_X = np.concatenate(new_X)[first] if len(new_keys) else np.empty((0, self.n_features), dtype=np.float32)
+            if complete:
+                live = np.isin(stored_keys, np.concatenate(seen_keys) if seen_keys else np.empty(0, dtype='<u8'))
+            else:
+                live = np.ones(len(stored_keys), dtype=bool)
+            if not live.all() or shard_count + bool(len(new_keys)) > self.max_shards:
+                # Rewrite the store as one shard without the removed rows
+                self._replace_shards(
+                    label,
+                    np.concatenate([stored_keys[live], new_keys]),
+                    np.concatenate([stored_X[live], new_X])
+                )
+            elif len(new_keys):
+                self._write_shard(label, new_keys, new_X)
+
+        print(f"Feature store ({label}): reused {rows - extracted} rows, extracted {extracted}")
+        return blocks
+
+    def _label_dir(self, label):
+        return os.path.join(self.path, label)
+
+    def _shard_paths(self, label):
+        return sorted(glob.glob(os.path.join(self._label_dir(label), 'shard-*.npz')))
+
+    def _load(self, label):
+        """Stored keys (sorted, unique), their rows and the shard count"""
+        keys, blocks = [], []
+        paths = self._shard_paths(label)
+        for path in paths:
+            with np.load(path) as shard:
+                keys.append(shard['keys'])
+                blocks.append(shard['X'])
+        if not keys:
+            return np.empty(0, dtype='<u8'), np.empty((0, self.n_features), dtype=np.float32), 0
+
+        # A shard left behind by an interrupted compaction only duplicates rows
+        keys, first = np.unique(np.concatenate(keys), return_index=True)
+        return keys, np.concatenate(blocks)[first], len(paths)
+
+    def _write_shard(self, label, keys, X):
+        """Write a new shard atomically"""
+        directory = self._label_dir(label)
+        os.makedirs(directory, exist_ok=True)
+        # Zero-padded nanosecond timestamps keep shards in write order
+        name = f"shard-{time.time_ns():020d}-{uuid.uuid4().hex[:8]}.npz"
+        staging_path = os.path.join(directory, f'.{name}.tmp')
+        with open(staging_path, 'wb') as f:
+            np.savez(f, keys=keys, X=X)
+        os.replace(staging_path, os.path.join(directory, name))
+
+    def _replace_shards(self, label, keys, X):
+        old_paths = self._shard_paths(label)
+        self._write_shard(label, keys, X)
+        for path in old_paths:
+            os.remove(path)
+
+    @contextmanager
+    def _locked(self, label):
+        """Serialize writers of a label across processes where flock is available"""
+        os.makedirs(self._label_dir(label), exist_ok=True)
+        if fcntl is None:
+            yield
+            return
+        with open(os.path.join(self._label_dir(label), '.lock'), 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
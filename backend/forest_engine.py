@@ -0,0 +1,103 @@
+import numpy as np
+
+
+class CompiledForest:
+    """Flattened tree ensemble for fast inference
+
+    Every tree of a fitted RandomForestClassifier is copied into shared,
+    contiguous node arrays. Rows walk all trees at once, one level per step,
+    and the averaged leaf distributions give both the probabilities and the
+    label from a single pass, without sklearn's per-call validation.
+
+    The per-level gathers touch rows x trees nodes at a time, so this wins
+    for single URLs and small batches; sklearn's compiled traversal is
+    faster for large matrices.
+    """
+
+    def __init__(self, feature, threshold, children, value, roots, classes, max_depth):
+        self.feature = feature        # split feature per node (0 for leaves)
+        self.threshold = threshold    # float64 split threshold per node (+inf for leaves)
+        self.children = children      # [left, right] of node i at 2*i and 2*i+1 (self for leaves)
+        self.value = value            # float64 class distribution per node, rows sum to 1
+        self.roots = roots            # index of each tree's root node
+        self.classes = classes
+        self.max_depth = max_depth
+
+    @classmethod
+    def from_sklearn(cls, model):
+        """Compile a fitted RandomForestClassifier (or any bagged ensemble of decision trees)"""
+        trees = [estimator.tree_ for estimator in model.estimators_]
+        sizes = [tree.node_count for tree in trees]
+        offsets = np.concatenate(([0], np.cumsum(sizes)[:-1])).astype(np.intp)
+        total = int(sum(sizes))
+        n_classes = len(model.classes_)
+
+        feature = np.zeros(total, dtype=np.intp)
+        threshold = np.full(total, np.inf, dtype=np.float64)
+        left = np.arange(total, dtype=np.intp)
+        right = np.arange(total, dtype=np.intp)
+        value = np.empty((total, n_classes), dtype=np.float64)
+
+        for tree, offset, size in zip(trees, offsets, sizes):
+            nodes = slice(offset, offset + size)
+            split = tree.children_left != -1
+
+            feature[nodes][split] = tree.feature[split]
+            threshold[nodes][split] = tree.threshold[split]
+            left[nodes][split] = tree.children_left[split] + offset
+            right[nodes][split] = tree.children_right[split] + offset
+
+            # Older sklearn stores sample counts, newer stores fractions; normalize both
+            counts = tree.value[:, 0, :]
+            value[nodes] = counts / counts.sum(axis=1, keepdims=True)
+
+        return cls(
+            feature=feature,
+            threshold=threshold,
+            children=np.stack([left, right], axis=1).ravel(),
+            value=value,
+            roots=offsets,
+            classes=np.asarray(model.classes_),
+            max_depth=max(tree.max_depth for tree in trees)
+        )
+
+    def to_arrays(self):
+        """Plain arrays for saving alongside a model artifact"""
+        return {
+            'feature': self.feature,
+            'threshold': self.threshold,
+            'children': self.children,
+            'value': self.value,
+            'roots': self.roots,
+            'classes': self.classes,
+            'max_depth': self.max_depth
+        }
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        """Rebuild from to_arrays() output; the arrays are used as-is, so memory-mapped ones stay shared"""
+        return cls(**arrays)
+
+    def predict_proba(self, X):
+        """Class probabilities for a 2D feature matrix, matching sklearn's predict_proba"""
+        # sklearn trees compare float32 inputs against float64 thresholds
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+
+        n_rows, n_features = X.shape
+        values = np.ascontiguousarray(X).ravel()
+        row_offsets = (np.arange(n_rows, dtype=np.intp) * n_features)[:, None]
+        nodes = np.broadcast_to(self.roots, (n_rows, len(self.roots)))
+
+        # Leaves point at themselves, so a fixed number of steps settles every row
+        for _ in range(self.max_depth):
+            go_right = values[row_offsets + self.feature[nodes]] > self.threshold[nodes]
+            nodes = self.children[2 * nodes + go_right]
+
+        return self.value[nodes].mean(axis=1)
+
+    def predict(self, X):
+        """Labels and probabilities from one pass over the forest"""
+        probabilities = self.predict_proba(X)
+        return self.classes.take(np.argmax(probabilities, axis=1)), probabilities
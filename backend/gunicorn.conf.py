@@ -0,0 +1,26 @@
+"""
+Gunicorn settings for multi-worker deployments
+
+    cd backend && gunicorn main:app -c gunicorn.conf.py
+
+The app and the model are loaded once in the master and workers are forked
+from it. The model's engine arrays are memory-mapped from the artifact, so all
+workers read the same physical pages instead of holding private copies.
+A model retrained or rolled back in one worker is promoted to the shared
+artifact, and the other workers reload it (see MODEL_RELOAD_INTERVAL).
+"""
+
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+workers = int(os.getenv('WEB_CONCURRENCY', '4'))
+worker_class = 'uvicorn.workers.UvicornWorker'
+preload_app = True
+
+def on_starting(server):
+    """Load the saved model in the master so forked workers inherit it"""
+    from ml_model import classifier
+    if classifier.load_model():
+        server.log.info(f"Preloaded model {classifier.bundle.version}")
+    else:
+        server.log.info("No saved model to preload; workers start on fallback detection")
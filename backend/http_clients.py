@@ -0,0 +1,84 @@
+import os
+import threading
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+
+# Shared connection pools for outbound threat feed calls. Keeping connections
+# alive saves a TCP and TLS handshake on every lookup after the first.
+FEED_HTTP_POOL_SIZE = int(os.getenv('FEED_HTTP_POOL_SIZE', 20))      # kept-alive connections per host
+FEED_HTTP_POOL_HOSTS = int(os.getenv('FEED_HTTP_POOL_HOSTS', 10))    # hosts with a pool of their own
+FEED_HTTP_CONNECT_TIMEOUT = float(os.getenv('FEED_HTTP_CONNECT_TIMEOUT', 3.0))
+FEED_HTTP_TIMEOUT = float(os.getenv('FEED_HTTP_TIMEOUT', 10.0))
+FEED_HTTP_KEEPALIVE = float(os.getenv('FEED_HTTP_KEEPALIVE', 60.0))  # idle seconds before a connection is dropped
+
+# (connect, read) timeouts for requests calls
+TIMEOUT = (FEED_HTTP_CONNECT_TIMEOUT, FEED_HTTP_TIMEOUT)
+
+_session = None
+_async_client = None
+_lock = threading.Lock()
+
+
+def new_session(pool_size=FEED_HTTP_POOL_SIZE, pool_hosts=FEED_HTTP_POOL_HOSTS):
+    """A requests session with keep-alive pools sized for concurrent feed lookups"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_hosts, pool_maxsize=pool_size)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def new_async_client(pool_size=FEED_HTTP_POOL_SIZE, **kwargs):
+    """An httpx client with the same pool and timeout settings, for the event loop"""
+    return httpx.AsyncClient(
+        timeout=httpx.Timeout(FEED_HTTP_TIMEOUT, connect=FEED_HTTP_CONNECT_TIMEOUT),
+        limits=httpx.Limits(
+            max_connections=pool_size * FEED_HTTP_POOL_HOSTS,
+            max_keepalive_connections=pool_size,
+            keepalive_expiry=FEED_HTTP_KEEPALIVE
+        ),
+        **kwargs
+    )
+
+
+def get_session():
+    """The process-wide session for blocking feed calls (safe to share across threads)"""
+    global _session
+    if _session is None:
+        with _lock:
+            if _session is None:
+                _session = new_session()
+    return _session
+
+
+def get_async_client():
+    """The process-wide async client; call from the serving event loop"""
+    global _async_client
+    if _async_client is None:
+        _async_client = new_async_client()
+    return _async_client
+
+
+async def aclose():
+    """Close both pools"""
+    global _session, _async_client
+    if _async_client is not None:
+        await _async_client.aclose()
+        _async_client = None
+    if _session is not None:
+        _session.close()
+        _session = None
+
+
+def _reset_after_fork():
+    # A forked worker must not reuse its parent's sockets; it opens its own on first use
+    global _session, _async_client, _lock
+    _session = None
+    _async_client = None
+    _lock = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
@@ -1,14 +1,22 @@
 from fastapi import FastAPI, HTTPException, Depends, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from pydantic import BaseModel
 from typing import Optional, List
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import csv
+import functools
 import hashlib
+import io
+import json
 import jwt
 from datetime import datetime, timedelta
 import os
 from dotenv import load_dotenv
 import logging
+import urllib.parse
 
 # Load environment variables
 load_dotenv()
@@ -17,8 +25,12 @@ load_dotenv()
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-from database import db
+from fastapi.concurrency import run_in_threadpool
+from database import db, adb
+import http_clients
+from cache import TTLCache
 from ml_model import classifier
+from retraining import ModelRetrainer
 from enhanced_threat_feed import enhanced_safe_browsing, virustotal_api, enhanced_child_filter
 
 app = FastAPI(
@@ -45,6 +57,52 @@ app.add_middleware(
 security = HTTPBearer()
 SECRET_KEY = os.getenv("SECRET_KEY", "safeguard-secret-key-2024")
 
+# Latency budget for a single /predict-url call; every stage also has its own deadline
+PREDICT_LATENCY_BUDGET = float(os.getenv("PREDICT_LATENCY_BUDGET", "3.0"))
+STAGE_TIMEOUTS = {
+    'ml': float(os.getenv("ML_STAGE_TIMEOUT", "1.0")),
+    'google_safe_browsing': float(os.getenv("GSB_STAGE_TIMEOUT", "2.0")),
+    'virustotal': float(os.getenv("VIRUSTOTAL_STAGE_TIMEOUT", "2.5")),
+    'child_mode': float(os.getenv("CHILD_MODE_STAGE_TIMEOUT", "0.5")),
+    'ml_batch': float(os.getenv("ML_BATCH_STAGE_TIMEOUT", "10.0")),
+    'child_mode_batch': float(os.getenv("CHILD_MODE_BATCH_STAGE_TIMEOUT", "5.0")),
+}
+
+# Final verdict cache, keyed by normalized URL plus child/strict mode flags
+VERDICT_CACHE_SIZE = int(os.getenv("VERDICT_CACHE_SIZE", "50000"))
+VERDICT_CACHE_TTL = float(os.getenv("VERDICT_CACHE_TTL", "300"))
+VERDICT_CACHE_DEGRADED_TTL = float(os.getenv("VERDICT_CACHE_DEGRADED_TTL", "30"))
+verdict_cache = TTLCache(max_entries=VERDICT_CACHE_SIZE, ttl=VERDICT_CACHE_TTL, purge_interval=60)
+
+# Report not-ready while only the fallback classifier is available
+READINESS_REQUIRES_MODEL = os.getenv("READINESS_REQUIRES_MODEL", "false").lower() == "true"
+
+# Backoff between attempts to train the first model, e.g. while the database is unreachable
+STARTUP_TRAINING_RETRY = float(os.getenv("STARTUP_TRAINING_RETRY", "30"))
+STARTUP_TRAINING_RETRY_MAX = float(os.getenv("STARTUP_TRAINING_RETRY_MAX", "900"))
+
+# Seconds between checks for a model promoted by another worker process; 0 disables them
+MODEL_RELOAD_INTERVAL = float(os.getenv("MODEL_RELOAD_INTERVAL", "5"))
+
+# /admin/datasets page sizes and export encodings
+DATASET_PAGE_SIZE = int(os.getenv("DATASET_PAGE_SIZE", "50"))
+MAX_DATASET_PAGE_SIZE = int(os.getenv("MAX_DATASET_PAGE_SIZE", "1000"))
+URL_EXPORT_COLUMNS = ('id', 'url', 'source', 'date_added', 'verified')
+EXPORT_MEDIA_TYPES = {'ndjson': 'application/x-ndjson', 'csv': 'text/csv'}
+
+# Most report ids accepted by one /admin/handle-reports call
+MAX_BULK_REPORTS = int(os.getenv("MAX_BULK_REPORTS", "5000"))
+
+# Limits for /predict-urls
+MAX_BATCH_URLS = int(os.getenv("MAX_BATCH_URLS", "1000"))
+BATCH_LATENCY_BUDGET = float(os.getenv("BATCH_LATENCY_BUDGET", "15.0"))
+
+# Dedicated pool for the analysis stages so slow feeds cannot starve the default executor
+stage_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("STAGE_WORKERS", "32")),
+    thread_name_prefix="predict-stage"
+)
+
 # Enhanced Pydantic models
 class URLRequest(BaseModel):
     url: str
@@ -52,6 +110,7 @@ class URLRequest(BaseModel):
     strict_mode: Optional[bool] = False
     real_time: Optional[bool] = False
     immediate_scan: Optional[bool] = False
+    explain: Optional[bool] = False
 
 class URLResponse(BaseModel):
     url: str
@@ -60,6 +119,15 @@ class URLResponse(BaseModel):
     reason: str
     threat_feed_result: Optional[dict] = None
     child_mode_result: Optional[dict] = None
+    explanation: Optional[dict] = None
+
+class BatchURLRequest(BaseModel):
+    urls: List[str]
+    child_mode: Optional[bool] = False
+    strict_mode: Optional[bool] = False
+
+class BatchURLResponse(BaseModel):
+    results: List[URLResponse]
 
 class ReportRequest(BaseModel):
     url: str
@@ -80,6 +148,10 @@ class URLManagement(BaseModel):
     action: str  # 'add' or 'remove'
     table: str   # 'malicious_urls' or 'valid_urls'
 
+class BulkReportAction(BaseModel):
+    report_ids: List[int]
+    action: str  # 'approve' or 'reject'
+
 class AutoAddRequest(BaseModel):
     url: str
     reason: Optional[str] = None
@@ -116,46 +188,84 @@ def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
 # Initialize ML model
 @app.on_event("startup")
 async def startup_event():
-    """Initialize the ML model and database on startup"""
+    """Start serving immediately; the model is loaded or trained in the background"""
+    logger.info("🛡️ Starting Safeguard URL Detection API...")
+    
+    # In update mode, Safe Browsing lists are synced locally in the background
+    enhanced_safe_browsing.start()
+    virustotal_api.scans.on_result = on_virustotal_result
+    
+    # Until a trained model is active, URLs are classified by basic_url_analysis
+    app.state.init_task = asyncio.get_running_loop().create_task(initialize_backend())
+    if MODEL_RELOAD_INTERVAL > 0:
+        app.state.model_watch_task = asyncio.get_running_loop().create_task(watch_promoted_model())
+    
+    logger.info("🚀 API server ready at http://localhost:8000")
+    logger.info("📖 API documentation at http://localhost:8000/docs")
+    logger.info("🔍 Health check at http://localhost:8000/health")
+
+async def initialize_backend():
+    """Check the database, then load the saved model or train one in the background, retrying until it succeeds"""
     try:
-        logger.info("🛡️ Starting Safeguard URL Detection API...")
-        
         # Test database connection
         try:
-            stats = db.get_stats()
+            stats = await adb.get_stats()
             logger.info(f"✅ Database connected - {stats['malicious_count']} malicious, {stats['valid_count']} valid URLs")
         except Exception as e:
             logger.error(f"❌ Database connection failed: {e}")
             logger.info("⚠️ Some features may not work without database")
         
-        # Initialize ML model
-        if not classifier.load_model():
-            logger.info("📚 Training new ML model...")
-            try:
-                # Get training data from database
-                malicious_data = db.get_malicious_urls()
-                valid_data = db.get_valid_urls()
-                
-                malicious_urls = [row['url'] for row in malicious_data]
-                valid_urls = [row['url'] for row in valid_data]
-                
-                if len(malicious_urls) > 0 and len(valid_urls) > 0:
-                    accuracy = classifier.train(malicious_urls, valid_urls)
-                    logger.info(f"✅ ML Model trained with accuracy: {accuracy:.4f}")
-                else:
-                    logger.warning("⚠️ No training data available - using fallback detection")
-            except Exception as e:
-                logger.error(f"❌ Model training failed: {e}")
-                logger.info("⚠️ Using fallback detection methods")
-        else:
+        # Initialize ML model, unless it was loaded before the worker was forked
+        if classifier.bundle is not None:
+            # Forked workers share the master's model; record it under this worker's pid too
+            await run_in_threadpool(classifier.mark_in_use)
+            logger.info(f"✅ ML Model {classifier.bundle.version} preloaded")
+        elif await run_in_threadpool(classifier.load_model):
+            verdict_cache.clear()
             logger.info("✅ ML Model loaded successfully")
-            
-        logger.info("🚀 API server ready at http://localhost:8000")
-        logger.info("📖 API documentation at http://localhost:8000/docs")
-        logger.info("🔍 Health check at http://localhost:8000/health")
-        
+        else:
+            await train_initial_model()
     except Exception as e:
         logger.error(f"❌ Startup error: {e}")
+        logger.info("⚠️ Using fallback detection methods")
+
+async def train_initial_model():
+    """Train the first model in the background, retrying with backoff until one is active"""
+    delay = STARTUP_TRAINING_RETRY
+    while classifier.bundle is None:
+        job, _ = retrainer.start(requested_by="startup")
+        logger.info(f"📚 Training new ML model in the background (job {job.id}) - using fallback detection until it is ready")
+        await retrainer.wait(job)
+        if classifier.bundle is not None:
+            return
+        logger.warning(f"⚠️ Initial model training failed ({job.error}) - retrying in {delay:.0f}s")
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, STARTUP_TRAINING_RETRY_MAX)
+
+async def watch_promoted_model():
+    """Follow models that other worker processes train or roll back to"""
+    while True:
+        await asyncio.sleep(MODEL_RELOAD_INTERVAL)
+        try:
+            bundle = await run_in_threadpool(classifier.reload_if_promoted)
+        except Exception as e:
+            logger.error(f"❌ Failed to load the promoted model: {e}")
+            continue
+        if bundle is not None:
+            verdict_cache.clear()
+            logger.info(f"🔄 Model {bundle.version} promoted by another worker is now live")
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Release threat feed clients and scan queues, flush queued log writes and close pooled connections"""
+    model_watch_task = getattr(app.state, 'model_watch_task', None)
+    if model_watch_task is not None:
+        model_watch_task.cancel()
+    await enhanced_safe_browsing.aclose()
+    await virustotal_api.aclose()
+    await http_clients.aclose()
+    await run_in_threadpool(db.log_writer.close)
+    db.pool.closeall()
 
 # API Endpoints
 
@@ -178,6 +288,31 @@ async def root():
         ]
     }
 
+@app.get("/health/live")
+async def liveness():
+    """Liveness probe: the process is up and serving the event loop"""
+    return {
+        "status": "alive",
+        "timestamp": datetime.utcnow().isoformat()
+    }
+
+@app.get("/health/ready")
+async def readiness():
+    """Readiness probe: requests can be served, reporting which classifier tier answers them
+    
+    The fallback tier counts as ready unless READINESS_REQUIRES_MODEL is set.
+    """
+    status = model_status()
+    ready = status["tier"] == "ml" or not READINESS_REQUIRES_MODEL
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={
+            "status": "ready" if ready else "not_ready",
+            "timestamp": datetime.utcnow().isoformat(),
+            **status
+        }
+    )
+
 @app.get("/health")
 async def health_check():
     """Enhanced health check endpoint for Chrome extension"""
@@ -190,25 +325,28 @@ async def health_check():
         
         # Test database connection
         try:
-            stats = db.get_stats()
+            stats = await adb.get_stats()
             health_status["database"] = {
                 "status": "connected",
                 "malicious_urls": stats['malicious_count'],
                 "valid_urls": stats['valid_count'],
-                "pending_reports": stats['pending_reports']
+                "pending_reports": stats['pending_reports'],
+                "pool": db.pool_stats()
             }
         except Exception as e:
             health_status["database"] = {
                 "status": "error",
-                "error": str(e)
+                "error": str(e),
+                "pool": db.pool_stats()
             }
         
         # Test ML model
         try:
-            test_result = classifier.predict("https://example.com")
+            test_result = await run_in_threadpool(classify_url, "https://example.com")
             health_status["ml_model"] = {
-                "status": "loaded",
-                "test_prediction": test_result['prediction']
+                "status": "loaded" if model_tier() == "ml" else "fallback",
+                "test_prediction": test_result['prediction'],
+                **model_status()
             }
         except Exception as e:
             health_status["ml_model"] = {
@@ -216,10 +354,29 @@ async def health_check():
                 "error": str(e)
             }
         
+        health_status["log_queue"] = db.log_queue_stats()
+        
+        health_status["caches"] = {
+            "verdicts": verdict_cache.stats(),
+            "google_safe_browsing": enhanced_safe_browsing.cache.stats(),
+            "virustotal": virustotal_api.cache.stats()
+        }
+        
+        health_status["virustotal_scans"] = virustotal_api.scans.stats()
+        
         # Test threat feeds
         health_status["threat_feeds"] = {
             "google_safe_browsing": "simulated" if enhanced_safe_browsing.api_key == 'demo_key' else "active",
-            "virustotal": "simulated" if virustotal_api.api_key == 'demo_key' else "active"
+            "virustotal": "simulated" if virustotal_api.api_key == 'demo_key' else "active",
+            "google_safe_browsing_mode": enhanced_safe_browsing.mode
+        }
+        if enhanced_safe_browsing.local_db is not None:
+            health_status["threat_feeds"]["google_safe_browsing_local"] = enhanced_safe_browsing.local_db.stats()
+        if enhanced_safe_browsing.batcher is not None:
+            health_status["threat_feeds"]["google_safe_browsing_batching"] = enhanced_safe_browsing.batcher.stats()
+        health_status["threat_feeds"]["circuit_breakers"] = {
+            breaker.name: breaker.stats()
+            for breaker in (enhanced_safe_browsing.breaker, virustotal_api.breaker)
         }
         
         return health_status
@@ -233,120 +390,65 @@ async def predict_url(request: URLRequest):
     try:
         logger.info(f"🔍 {'IMMEDIATE ' if request.immediate_scan else ''}Analyzing URL: {request.url}")
         
-        # Initialize results
-        ml_result = {"prediction": "unknown", "confidence": 0.5, "reason": "Analysis unavailable"}
-        gsb_result = {"is_threat": False, "source": "Google Safe Browsing"}
-        vt_result = {"is_threat": False, "source": "VirusTotal"}
-        child_result = None
-        
-        # Get ML prediction
-        try:
-            ml_result = classifier.predict(request.url)
+        # Every stage sees the normalized URL, so URLs sharing a cache key share a verdict
+        target = normalize_url(request.url)
+        cache_key = verdict_cache_key(target, request.child_mode, request.strict_mode)
+        verdict = verdict_cache.get(cache_key)
+        if verdict is not None:
+            logger.info(f"⚡ Cached verdict: {verdict.prediction}")
+        else:
+            # Run all analysis stages concurrently, each bounded by its own deadline
+            stages = {
+                'ml': run_stage('ml', classify_url, target),
+                'google_safe_browsing': run_stage('google_safe_browsing', enhanced_safe_browsing.check_url_async, target),
+                'virustotal': run_stage(
+                    'virustotal', virustotal_api.check_url_async, target,
+                    priority='interactive' if request.immediate_scan or request.real_time else 'normal'
+                ),
+            }
+            if request.child_mode:
+                stages['child_mode'] = run_stage(
+                    'child_mode', enhanced_child_filter.check_url, target, strict_mode=request.strict_mode
+                )
+            
+            results = dict(zip(stages.keys(), await asyncio.gather(*stages.values(), return_exceptions=True)))
+            
+            ml_result = ml_stage_result(results['ml'], target)
             logger.info(f"🤖 ML Prediction: {ml_result['prediction']} ({ml_result['confidence']:.3f})")
-        except Exception as e:
-            logger.error(f"❌ ML prediction failed: {e}")
-            # Fallback to basic pattern matching
-            ml_result = basic_url_analysis(request.url)
-        
-        # Check Google Safe Browsing
-        try:
-            gsb_result = enhanced_safe_browsing.check_url(request.url)
+            
+            gsb_result = stage_result(results['google_safe_browsing'], 'Google Safe Browsing')
             if gsb_result['is_threat']:
                 logger.info(f"⚠️ Google Safe Browsing: {gsb_result['threat_type']}")
-        except Exception as e:
-            logger.error(f"❌ Google Safe Browsing check failed: {e}")
-        
-        # Check VirusTotal
-        try:
-            vt_result = virustotal_api.check_url(request.url)
+            
+            vt_result = stage_result(results['virustotal'], 'VirusTotal')
             if vt_result['is_threat']:
                 logger.info(f"⚠️ VirusTotal: {vt_result.get('positives', 0)} detections")
-        except Exception as e:
-            logger.error(f"❌ VirusTotal check failed: {e}")
-        
-        # Check child mode if enabled
-        if request.child_mode:
-            try:
-                child_result = enhanced_child_filter.check_url(request.url, strict_mode=request.strict_mode)
-                if child_result['should_block']:
-                    logger.info(f"👶 Child Mode: {child_result['category']}")
-            except Exception as e:
-                logger.error(f"❌ Child mode check failed: {e}")
-        
-        # ENHANCED PREDICTION LOGIC with strict mode
-        final_prediction = ml_result['prediction']
-        final_reason = ml_result['reason']
-        final_confidence = ml_result['confidence']
-        
-        # Enhanced threat feed override logic
-        threat_sources = []
-        
-        # Google Safe Browsing override
-        if gsb_result['is_threat']:
-            final_prediction = 'malicious'
-            final_reason = f"Google Safe Browsing: {gsb_result.get('threat_type', 'Threat detected')}"
-            final_confidence = max(final_confidence, gsb_result.get('confidence', 0.95))
-            threat_sources.append('Google Safe Browsing')
-        
-        # VirusTotal override (lowered threshold for better protection)
-        if vt_result['is_threat']:
-            positives = vt_result.get('positives', 0)
-            total = vt_result.get('total', 0)
-            if positives > 2:  # Lower threshold for immediate blocking
-                final_prediction = 'malicious'
-                final_reason = f"VirusTotal: {positives}/{total} engines detected threat"
-                final_confidence = max(final_confidence, vt_result.get('confidence', 0.9))
-                threat_sources.append('VirusTotal')
-        
-        # STRICT MODE ENHANCED LOGIC
-        if request.strict_mode:
-            # Lower confidence threshold for blocking in strict mode
-            if ml_result['confidence'] > 0.6 and ml_result['prediction'] != 'safe':
-                final_prediction = 'malicious'
-                final_reason = f"Strict Mode: {ml_result['reason']} (lowered threshold)"
-                final_confidence = max(final_confidence, 0.8)
             
-            # Additional strict mode patterns
-            strict_patterns = ['download', 'free', 'click-here', 'winner', 'prize', 'urgent']
-            url_lower = request.url.lower()
-            for pattern in strict_patterns:
-                if pattern in url_lower:
-                    final_prediction = 'malicious'
-                    final_reason = f"Strict Mode: Suspicious pattern detected ({pattern})"
-                    final_confidence = max(final_confidence, 0.75)
-                    break
-        
-        # Child mode override
-        if request.child_mode and child_result and child_result['should_block']:
-            final_prediction = 'blocked'
-            final_reason = f"Child Mode: {child_result['reason']}"
-            final_confidence = child_result.get('confidence', 0.95)
-        
-        # Combine threat sources
-        if threat_sources:
-            final_reason += f" (Sources: {', '.join(threat_sources)})"
+            child_result = child_stage_result(results['child_mode']) if request.child_mode else None
+            if child_result and child_result['should_block']:
+                logger.info(f"👶 Child Mode: {child_result['category']}")
+            
+            verdict = combine_verdict(
+                target, ml_result, gsb_result, vt_result, child_result,
+                child_mode=request.child_mode, strict_mode=request.strict_mode
+            )
+            verdict_cache.set(cache_key, verdict, ttl=verdict_ttl(verdict))
+        verdict = with_url(verdict, request.url)
         
         # Log result and handle database updates
-        if final_prediction in ['malicious', 'blocked']:
-            try:
-                db.log_blocked_url(request.url, final_reason)
-            except Exception as e:
-                logger.error(f"❌ Failed to log blocked URL: {e}")
-            logger.info(f"🚫 BLOCKED: {request.url} - {final_reason}")
+        if verdict.prediction in ['malicious', 'blocked']:
+            if not db.log_blocked_url(request.url, verdict.reason):
+                logger.warning("⚠️ Blocked URL log queue full - entry dropped")
+            logger.info(f"🚫 BLOCKED: {request.url} - {verdict.reason}")
         else:
             logger.info(f"✅ SAFE: {request.url}")
         
-        return URLResponse(
-            url=request.url,
-            prediction=final_prediction,
-            confidence=final_confidence,
-            reason=final_reason,
-            threat_feed_result={
-                'google_safe_browsing': gsb_result,
-                'virustotal': vt_result
-            },
-            child_mode_result=child_result
-        )
+        # Explanations are only built on request and never cached with the verdict
+        if request.explain:
+            explanation = await run_in_threadpool(classifier.explain, target)
+            verdict = copy_verdict(verdict, explanation=explanation)
+        
+        return verdict
         
     except Exception as e:
         logger.error(f"❌ Error analyzing URL {request.url}: {e}")
@@ -360,6 +462,322 @@ async def predict_url(request: URLRequest):
             child_mode_result=None
         )
 
+@app.post("/predict-urls", response_model=BatchURLResponse)
+async def predict_urls(request: BatchURLRequest):
+    """Batch URL prediction with one ML pass and deduplicated threat feed lookups"""
+    if len(request.urls) > MAX_BATCH_URLS:
+        raise HTTPException(status_code=413, detail=f"Batch exceeds {MAX_BATCH_URLS} URLs")
+    
+    # URLs are analyzed in normalized form, like /predict-url, so variants share one verdict
+    unique_urls = list(dict.fromkeys(normalize_url(url) for url in request.urls))
+    logger.info(f"🔍 Batch analyzing {len(request.urls)} URLs ({len(unique_urls)} unique)")
+    
+    try:
+        # Serve what we can from the verdict cache
+        verdicts = {}
+        pending_urls = []
+        for url in unique_urls:
+            cached = verdict_cache.get(verdict_cache_key(url, request.child_mode, request.strict_mode))
+            if cached is None:
+                pending_urls.append(url)
+            else:
+                verdicts[url] = cached
+        
+        budget = BATCH_LATENCY_BUDGET
+        
+        async def check_feed(name, func, **kwargs):
+            return await asyncio.gather(
+                *(run_stage(name, func, url, budget=budget, **kwargs) for url in pending_urls),
+                return_exceptions=True
+            )
+        
+        async def check_child_mode():
+            if not request.child_mode:
+                return [None] * len(pending_urls)
+            return await run_stage(
+                'child_mode_batch',
+                lambda urls: [enhanced_child_filter.check_url(url, strict_mode=request.strict_mode) for url in urls],
+                pending_urls,
+                budget=budget
+            )
+        
+        ml_results, child_results, gsb_results, vt_results = await asyncio.gather(
+            run_stage('ml_batch', classify_urls, pending_urls, budget=budget),
+            check_child_mode(),
+            check_feed('google_safe_browsing', enhanced_safe_browsing.check_url_async),
+            check_feed('virustotal', virustotal_api.check_url_async, priority='batch'),
+            return_exceptions=True
+        )
+        
+        if isinstance(ml_results, Exception):
+            logger.warning(f"⚠️ Batch ML prediction unavailable ({ml_results!r}) - using basic analysis")
+            ml_results = [basic_url_analysis(url) for url in pending_urls]
+        if isinstance(child_results, Exception):
+            child_results = [child_results] * len(pending_urls)
+        
+        for url, ml_result, child_result, gsb_result, vt_result in zip(
+            pending_urls, ml_results, child_results, gsb_results, vt_results
+        ):
+            verdict = combine_verdict(
+                url,
+                ml_result,
+                stage_result(gsb_result, 'Google Safe Browsing'),
+                stage_result(vt_result, 'VirusTotal'),
+                child_stage_result(child_result) if request.child_mode else None,
+                child_mode=request.child_mode,
+                strict_mode=request.strict_mode
+            )
+            verdict_cache.set(
+                verdict_cache_key(url, request.child_mode, request.strict_mode),
+                verdict,
+                ttl=verdict_ttl(verdict)
+            )
+            verdicts[url] = verdict
+        
+        results = [with_url(verdicts[normalize_url(url)], url) for url in request.urls]
+        blocked = list({v.url: v for v in results if v.prediction in ['malicious', 'blocked']}.values())
+        dropped = sum(1 for v in blocked if not db.log_blocked_url(v.url, v.reason))
+        if dropped:
+            logger.warning(f"⚠️ Blocked URL log queue full - {dropped} entries dropped")
+        
+        blocked_count = sum(1 for v in verdicts.values() if v.prediction in ['malicious', 'blocked'])
+        logger.info(f"✅ Batch complete: {blocked_count} of {len(unique_urls)} unique URLs blocked")
+        return BatchURLResponse(results=results)
+        
+    except Exception as e:
+        logger.error(f"❌ Error analyzing URL batch: {e}")
+        # Return safe predictions on error to avoid blocking legitimate sites
+        return BatchURLResponse(results=[
+            URLResponse(
+                url=url,
+                prediction="safe",
+                confidence=0.5,
+                reason=f"Analysis error: {str(e)}",
+                threat_feed_result=None,
+                child_mode_result=None
+            )
+            for url in request.urls
+        ])
+
+async def run_stage(name: str, func, *args, budget: float = None, **kwargs):
+    """Run an analysis stage without blocking the event loop, bounded by its deadline
+    
+    Coroutine functions are awaited directly; blocking functions run in the stage executor.
+    """
+    timeout = min(STAGE_TIMEOUTS[name], budget or PREDICT_LATENCY_BUDGET)
+    if asyncio.iscoroutinefunction(func):
+        awaitable = func(*args, **kwargs)
+    else:
+        loop = asyncio.get_running_loop()
+        awaitable = loop.run_in_executor(stage_executor, functools.partial(func, *args, **kwargs))
+    return await asyncio.wait_for(awaitable, timeout=timeout)
+
+def stage_result(result, source: str) -> dict:
+    """Normalize a threat feed stage outcome, marking timeouts and failures"""
+    if isinstance(result, asyncio.TimeoutError):
+        logger.warning(f"⏱️ {source} check timed out")
+        return {
+            'is_threat': False,
+            'threat_type': None,
+            'source': source,
+            'status': 'timeout',
+            'confidence': 0.0
+        }
+    if isinstance(result, Exception):
+        logger.error(f"❌ {source} check failed: {result}")
+        return {
+            'is_threat': False,
+            'threat_type': None,
+            'source': source,
+            'status': 'error',
+            'error': str(result),
+            'confidence': 0.0
+        }
+    return result
+
+def model_tier() -> str:
+    """'ml' once a trained model is active, 'fallback' while basic_url_analysis stands in"""
+    return 'ml' if classifier.bundle is not None else 'fallback'
+
+def model_status() -> dict:
+    """Active classifier tier plus model and training progress, for health endpoints"""
+    init_task = getattr(app.state, 'init_task', None)
+    job = retrainer.current_job
+    failed = next((past for past in reversed(retrainer.jobs.values()) if past.status == 'failed'), None)
+    return {
+        "tier": model_tier(),
+        "model_version": classifier.bundle.version if classifier.bundle else None,
+        "initializing": init_task is not None and not init_task.done(),
+        "training_job": job.id if job else None,
+        # Why there is still no model, e.g. the database was unreachable; training is retried
+        "training_error": failed.error if failed is not None and classifier.bundle is None else None
+    }
+
+def classify_url(url: str) -> dict:
+    """ML stage: the trained model, or basic analysis while none is active"""
+    if classifier.bundle is None:
+        return basic_url_analysis(url)
+    return classifier.predict(url)
+
+def classify_urls(urls: List[str]) -> List[dict]:
+    """Batch ML stage with the same fallback as classify_url"""
+    if classifier.bundle is None:
+        return [basic_url_analysis(url) for url in urls]
+    return classifier.predict_batch(urls)
+
+def ml_stage_result(result, url: str) -> dict:
+    """Normalize the ML stage outcome, falling back to basic analysis"""
+    if isinstance(result, Exception):
+        if isinstance(result, asyncio.TimeoutError):
+            logger.warning("⏱️ ML prediction timed out - using basic analysis")
+        else:
+            logger.error(f"❌ ML prediction failed: {result}")
+        # Fallback to basic pattern matching
+        return basic_url_analysis(url)
+    return result
+
+def child_stage_result(result) -> Optional[dict]:
+    """Normalize the child mode stage outcome"""
+    if isinstance(result, asyncio.TimeoutError):
+        logger.warning("⏱️ Child mode check timed out")
+        return {
+            'should_block': False,
+            'category': None,
+            'reason': 'Child mode check timed out',
+            'status': 'timeout',
+            'confidence': 0.0
+        }
+    if isinstance(result, Exception):
+        logger.error(f"❌ Child mode check failed: {result}")
+        return None
+    return result
+
+def combine_verdict(url: str, ml_result: dict, gsb_result: dict, vt_result: dict,
+                    child_result: Optional[dict], child_mode: bool = False,
+                    strict_mode: bool = False) -> URLResponse:
+    """Combine stage results into the final verdict"""
+    # ENHANCED PREDICTION LOGIC with strict mode
+    final_prediction = ml_result['prediction']
+    final_reason = ml_result['reason']
+    final_confidence = ml_result['confidence']
+    
+    # Enhanced threat feed override logic
+    threat_sources = []
+    
+    # Google Safe Browsing override
+    if gsb_result['is_threat']:
+        final_prediction = 'malicious'
+        final_reason = f"Google Safe Browsing: {gsb_result.get('threat_type', 'Threat detected')}"
+        final_confidence = max(final_confidence, gsb_result.get('confidence', 0.95))
+        threat_sources.append('Google Safe Browsing')
+    
+    # VirusTotal override (lowered threshold for better protection)
+    if vt_result['is_threat']:
+        positives = vt_result.get('positives', 0)
+        total = vt_result.get('total', 0)
+        if positives > 2:  # Lower threshold for immediate blocking
+            final_prediction = 'malicious'
+            final_reason = f"VirusTotal: {positives}/{total} engines detected threat"
+            final_confidence = max(final_confidence, vt_result.get('confidence', 0.9))
+            threat_sources.append('VirusTotal')
+    
+    # STRICT MODE ENHANCED LOGIC
+    if strict_mode:
+        # Lower confidence threshold for blocking in strict mode
+        if ml_result['confidence'] > 0.6 and ml_result['prediction'] != 'safe':
+            final_prediction = 'malicious'
+            final_reason = f"Strict Mode: {ml_result['reason']} (lowered threshold)"
+            final_confidence = max(final_confidence, 0.8)
+        
+        # Additional strict mode patterns
+        strict_patterns = ['download', 'free', 'click-here', 'winner', 'prize', 'urgent']
+        url_lower = url.lower()
+        for pattern in strict_patterns:
+            if pattern in url_lower:
+                final_prediction = 'malicious'
+                final_reason = f"Strict Mode: Suspicious pattern detected ({pattern})"
+                final_confidence = max(final_confidence, 0.75)
+                break
+    
+    # Child mode override
+    if child_mode and child_result and child_result['should_block']:
+        final_prediction = 'blocked'
+        final_reason = f"Child Mode: {child_result['reason']}"
+        final_confidence = child_result.get('confidence', 0.95)
+    
+    # Combine threat sources
+    if threat_sources:
+        final_reason += f" (Sources: {', '.join(threat_sources)})"
+    
+    return URLResponse(
+        url=url,
+        prediction=final_prediction,
+        confidence=final_confidence,
+        reason=final_reason,
+        threat_feed_result={
+            'google_safe_browsing': gsb_result,
+            'virustotal': vt_result
+        },
+        child_mode_result=child_result
+    )
+
+def normalize_url(url: str) -> str:
+    """Normalize a URL for cache lookups (case-insensitive scheme/host, no fragment)"""
+    url = url.strip()
+    try:
+        parts = urllib.parse.urlsplit(url)
+    except ValueError:
+        return url
+    return urllib.parse.urlunsplit((
+        parts.scheme.lower(),
+        parts.netloc.lower(),
+        parts.path or '/',
+        parts.query,
+        ''
+    ))
+
+def verdict_cache_key(url: str, child_mode: bool = False, strict_mode: bool = False) -> tuple:
+    return (normalize_url(url), bool(child_mode), bool(strict_mode))
+
+def verdict_ttl(verdict: URLResponse) -> float:
+    """Cache degraded verdicts (timed-out, failed, still-scanning, skipped or unavailable sources) only briefly"""
+    results = list((verdict.threat_feed_result or {}).values())
+    if verdict.child_mode_result:
+        results.append(verdict.child_mode_result)
+    if any(result.get('status') in ('timeout', 'error', 'pending', 'skipped', 'unavailable') for result in results):
+        return VERDICT_CACHE_DEGRADED_TTL
+    return VERDICT_CACHE_TTL
+
+def copy_verdict(verdict: URLResponse, **changes) -> URLResponse:
+    """Copy a verdict with some fields replaced, leaving the (possibly cached) original untouched"""
+    fields = {
+        'url': verdict.url,
+        'prediction': verdict.prediction,
+        'confidence': verdict.confidence,
+        'reason': verdict.reason,
+        'threat_feed_result': verdict.threat_feed_result,
+        'child_mode_result': verdict.child_mode_result,
+        'explanation': verdict.explanation
+    }
+    fields.update(changes)
+    return URLResponse(**fields)
+
+def with_url(verdict: URLResponse, url: str) -> URLResponse:
+    """Return a cached verdict addressed to the URL exactly as the caller sent it"""
+    if verdict.url == url:
+        return verdict
+    return copy_verdict(verdict, url=url)
+
+def on_virustotal_result(url: str, result: dict):
+    """A background scan finished: re-evaluate the URL with its report on the next request"""
+    invalidate_verdicts(url)
+
+def invalidate_verdicts(url: str):
+    """Drop cached verdicts for a URL under every child/strict mode combination"""
+    for child_mode in (False, True):
+        for strict_mode in (False, True):
+            verdict_cache.delete(verdict_cache_key(url, child_mode, strict_mode))
+
 def basic_url_analysis(url: str) -> dict:
     """Basic fallback URL analysis when ML model fails"""
     url_lower = url.lower()
@@ -389,10 +807,11 @@ async def report_malicious(request: ReportRequest):
     """Enhanced report malicious with immediate database integration"""
     try:
         # Add to user reports
-        db.add_user_report(request.url, 'false_negative')
+        await adb.add_user_report(request.url, 'false_negative')
         
         # IMMEDIATE DATABASE UPDATE: Move to malicious database
-        success = db.add_malicious_url(request.url, 'user_report_immediate')
+        success = await adb.add_malicious_url(request.url, 'user_report_immediate')
+        invalidate_verdicts(request.url)
         
         if success:
             logger.info(f"📝 IMMEDIATE: {request.url} added to malicious database from user report")
@@ -418,11 +837,12 @@ async def report_valid(request: ReportRequest):
     """Enhanced report valid with immediate database integration"""
     try:
         # Add to user reports
-        db.add_user_report(request.url, 'false_positive')
+        await adb.add_user_report(request.url, 'false_positive')
         
         # IMMEDIATE DATABASE UPDATE: Move to valid database and remove from malicious
-        db.remove_url(request.url, 'malicious_urls')
-        success = db.add_valid_url(request.url, 'user_report_immediate')
+        await adb.remove_url(request.url, 'malicious_urls')
+        success = await adb.add_valid_url(request.url, 'user_report_immediate')
+        invalidate_verdicts(request.url)
         
         if success:
             logger.info(f"📝 IMMEDIATE: {request.url} moved to valid database from user report")
@@ -449,9 +869,11 @@ async def report_valid(request: ReportRequest):
 async def auto_add_malicious(request: AutoAddRequest):
     """Auto-add malicious URLs detected by ML model"""
     try:
-        success = db.add_malicious_url(request.url, request.source)
+        success = await adb.add_malicious_url(request.url, request.source)
         
         if success:
+            invalidate_verdicts(request.url)
+            
             # Log detailed information
             db.log_admin_action(
                 "Auto-added malicious URL",
@@ -480,9 +902,11 @@ async def auto_add_malicious(request: AutoAddRequest):
 async def auto_add_valid(request: AutoAddRequest):
     """Auto-add valid URLs with high confidence"""
     try:
-        success = db.add_valid_url(request.url, request.source)
+        success = await adb.add_valid_url(request.url, request.source)
         
         if success:
+            invalidate_verdicts(request.url)
+            
             # Log detailed information
             db.log_admin_action(
                 "Auto-added valid URL",
@@ -513,17 +937,19 @@ async def move_reported_url(request: MoveURLRequest):
     try:
         if request.report_type == 'false_positive':
             # URL was incorrectly flagged as malicious, move to valid
-            db.remove_url(request.url, 'malicious_urls')
-            success = db.add_valid_url(request.url, request.source)
+            await adb.remove_url(request.url, 'malicious_urls')
+            success = await adb.add_valid_url(request.url, request.source)
             action = "moved_to_valid"
         elif request.report_type == 'false_negative':
             # URL was incorrectly flagged as safe, move to malicious
-            db.remove_url(request.url, 'valid_urls')
-            success = db.add_malicious_url(request.url, request.source)
+            await adb.remove_url(request.url, 'valid_urls')
+            success = await adb.add_malicious_url(request.url, request.source)
             action = "moved_to_malicious"
         else:
             raise HTTPException(status_code=400, detail="Invalid report type")
         
+        invalidate_verdicts(request.url)
+        
         if success:
             db.log_admin_action(
                 f"Moved reported URL ({action})",
@@ -556,7 +982,7 @@ async def admin_login(login_data: AdminLogin):
     """Admin login endpoint"""
     try:
         # Get admin user from database
-        admin_user = db.get_admin_user(login_data.username)
+        admin_user = await adb.get_admin_user(login_data.username)
         
         if not admin_user:
             raise HTTPException(status_code=401, detail="Invalid credentials")
@@ -585,32 +1011,91 @@ async def admin_login(login_data: AdminLogin):
 async def get_admin_stats(current_user: str = Depends(verify_token)):
     """Get system statistics"""
     try:
-        stats = db.get_stats()
+        stats = await adb.get_stats()
         return stats
     except Exception as e:
         logger.error(f"❌ Error getting stats: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/admin/datasets")
-async def get_datasets(current_user: str = Depends(verify_token)):
-    """Get all datasets"""
+async def get_datasets(
+    table: str = 'malicious_urls',
+    limit: int = DATASET_PAGE_SIZE,
+    cursor: Optional[int] = None,
+    source: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    q: Optional[str] = None,
+    format: str = 'json',
+    current_user: str = Depends(verify_token)
+):
+    """Page through a URL table, newest first, or export it
+    
+    Pass the returned next_cursor as `cursor` for the next page. Filters:
+    source, date_added range (since exclusive, until inclusive) and URL
+    substring q. format=ndjson or csv streams every matching row instead.
+    """
+    if table not in ('malicious_urls', 'valid_urls'):
+        raise HTTPException(status_code=400, detail="Invalid table")
+    if format not in ('json', 'ndjson', 'csv'):
+        raise HTTPException(status_code=400, detail="Invalid format")
+    filters = {'source': source, 'since': since, 'until': until, 'search': q, 'before_id': cursor}
+    
+    if format != 'json':
+        return StreamingResponse(
+            export_urls(table, format, filters),
+            media_type=EXPORT_MEDIA_TYPES[format],
+            headers={"Content-Disposition": f'attachment; filename="{table}.{format}"'}
+        )
+    
     try:
-        malicious_urls = db.get_malicious_urls()
-        valid_urls = db.get_valid_urls()
-        
+        rows, next_cursor = await adb.get_urls_page(table, limit=max(1, min(limit, MAX_DATASET_PAGE_SIZE)), **filters)
         return {
-            "malicious_urls": malicious_urls,
-            "valid_urls": valid_urls
+            "table": table,
+            "items": rows,
+            "next_cursor": next_cursor
         }
     except Exception as e:
         logger.error(f"❌ Error getting datasets: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+async def export_urls(table, format, filters):
+    """Encode a URL table export chunk by chunk from a server-side cursor
+    
+    Only one fetch of rows is in memory at a time; each chunk is pulled on
+    a worker thread so the event loop is never blocked.
+    """
+    rows = db.stream_urls(table, columns=URL_EXPORT_COLUMNS, ordered=True, **filters)
+    try:
+        if format == 'csv':
+            buffer = io.StringIO()
+            csv.writer(buffer).writerow(URL_EXPORT_COLUMNS)
+            yield buffer.getvalue()
+        while True:
+            chunk = await run_in_threadpool(next, rows, None)
+            if chunk is None:
+                break
+            buffer = io.StringIO()
+            if format == 'csv':
+                csv.writer(buffer).writerows(
+                    [value.isoformat() if isinstance(value, datetime) else value for value in row] for row in chunk
+                )
+            else:
+                for row in chunk:
+                    buffer.write(json.dumps(dict(zip(URL_EXPORT_COLUMNS, row)), default=datetime.isoformat))
+                    buffer.write('\n')
+            yield buffer.getvalue()
+    except Exception as e:
+        logger.error(f"❌ Error exporting {table}: {e}")
+        raise
+    finally:
+        await run_in_threadpool(rows.close)
+
 @app.get("/admin/reports")
 async def get_reports(current_user: str = Depends(verify_token)):
     """Get pending user reports"""
     try:
-        reports = db.get_pending_reports()
+        reports = await adb.get_pending_reports()
         return {"reports": reports}
     except Exception as e:
         logger.error(f"❌ Error getting reports: {e}")
@@ -622,21 +1107,23 @@ async def manage_url(request: URLManagement, current_user: str = Depends(verify_
     try:
         if request.action == 'add':
             if request.table == 'malicious_urls':
-                success = db.add_malicious_url(request.url, 'admin')
+                success = await adb.add_malicious_url(request.url, 'admin')
             elif request.table == 'valid_urls':
-                success = db.add_valid_url(request.url, 'admin')
+                success = await adb.add_valid_url(request.url, 'admin')
             else:
                 raise HTTPException(status_code=400, detail="Invalid table")
             
             action_desc = f"Added URL to {request.table}: {request.url}"
             
         elif request.action == 'remove':
-            success = db.remove_url(request.url, request.table)
+            success = await adb.remove_url(request.url, request.table)
             action_desc = f"Removed URL from {request.table}: {request.url}"
             
         else:
             raise HTTPException(status_code=400, detail="Invalid action")
         
+        invalidate_verdicts(request.url)
+        
         if success:
             db.log_admin_action(action_desc)
             logger.info(f"🔧 Admin action: {action_desc}")
@@ -658,30 +1145,15 @@ async def handle_report(report_id: int, action: str, current_user: str = Depends
             raise HTTPException(status_code=400, detail="Invalid action")
         
         # Get the report first
-        reports = db.get_pending_reports()
-        report = next((r for r in reports if r['id'] == report_id), None)
-        
-        if not report:
+        report = await adb.get_report(report_id)
+        if not report or report['status'] != 'pending':
             raise HTTPException(status_code=404, detail="Report not found")
         
-        if action == 'approve':
-            # Move URL to appropriate dataset
-            if report['report_type'] == 'false_positive':
-                # URL was incorrectly flagged as malicious, move to valid
-                db.remove_url(report['url'], 'malicious_urls')
-                db.add_valid_url(report['url'], 'user_report')
-            elif report['report_type'] == 'false_negative':
-                # URL was incorrectly flagged as safe, move to malicious
-                db.remove_url(report['url'], 'valid_urls')
-                db.add_malicious_url(report['url'], 'user_report')
-        
-        # Update report status
-        db.update_report_status(report_id, 'approved' if action == 'approve' else 'rejected')
-        
-        db.log_admin_action(
-            f"Report {action}ed",
-            f"Report ID: {report_id}, URL: {report['url']}, Type: {report['report_type']}"
-        )
+        # Move the URL (on approval) and update the report in one transaction
+        resolved = await adb.resolve_reports([report_id], action)
+        if not resolved:
+            raise HTTPException(status_code=404, detail="Report not found")
+        record_resolved_reports(resolved, action)
         
         logger.info(f"📋 Report {action}ed: {report['url']}")
         return {"message": f"Report {action}ed successfully"}
@@ -692,50 +1164,152 @@ async def handle_report(report_id: int, action: str, current_user: str = Depends
         logger.error(f"❌ Error handling report: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.post("/admin/retrain-model")
-async def retrain_model(current_user: str = Depends(verify_token)):
-    """Retrain the ML model"""
+@app.post("/admin/handle-reports")
+async def handle_reports(request: BulkReportAction, current_user: str = Depends(verify_token)):
+    """Approve or reject many user reports in one transaction"""
     try:
-        # Get updated training data
-        malicious_data = db.get_malicious_urls()
-        valid_data = db.get_valid_urls()
-        
-        malicious_urls = [row['url'] for row in malicious_data]
-        valid_urls = [row['url'] for row in valid_data]
+        if request.action not in ['approve', 'reject']:
+            raise HTTPException(status_code=400, detail="Invalid action")
+        if len(request.report_ids) > MAX_BULK_REPORTS:
+            raise HTTPException(status_code=400, detail=f"At most {MAX_BULK_REPORTS} reports per request")
         
-        if len(malicious_urls) == 0 or len(valid_urls) == 0:
-            raise HTTPException(status_code=400, detail="Insufficient training data")
+        resolved = await adb.resolve_reports(request.report_ids, request.action)
+        record_resolved_reports(resolved, request.action)
         
-        # Retrain model
-        accuracy = classifier.train(malicious_urls, valid_urls)
+        resolved_ids = {report['id'] for report in resolved}
+        logger.info(f"📋 {len(resolved)} reports {request.action}ed")
+        return {
+            "message": f"{len(resolved)} reports {request.action}ed",
+            "processed": sorted(resolved_ids),
+            "skipped": [report_id for report_id in request.report_ids if report_id not in resolved_ids]
+        }
         
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"❌ Error handling reports: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+def record_resolved_reports(reports, action):
+    """Drop cached verdicts for moved URLs and queue an admin log entry per report"""
+    for report in reports:
+        if action == 'approve':
+            invalidate_verdicts(report['url'])
         db.log_admin_action(
-            "Model retrained",
-            f"New accuracy: {accuracy:.4f}, Dataset size: {len(malicious_urls) + len(valid_urls)}"
+            f"Report {action}ed",
+            f"Report ID: {report['id']}, URL: {report['url']}, Type: {report['report_type']}"
         )
+
+async def load_training_data(since=None):
+    """Count the URLs the classifier is trained on, all rows or those added after `since`
+    
+    The URLs are returned as database.TrainingURLs handles, which the training
+    process streams itself. Also returns the newest date_added among them, the
+    cutoff for the next incremental run.
+    """
+    malicious_urls, malicious_newest = await adb.get_training_urls('malicious_urls', since)
+    valid_urls, valid_newest = await adb.get_training_urls('valid_urls', since)
+    cutoff = max((newest for newest in (malicious_newest, valid_newest) if newest is not None), default=since)
+    return malicious_urls, valid_urls, cutoff
+
+async def on_model_swap(job):
+    """Drop verdicts from the old model and record the new one"""
+    verdict_cache.clear()
+    await adb.log_model_training(
+        job.version, job.accuracy, job.dataset_size, classifier.bundle.path, job.data_cutoff
+    )
+    db.log_admin_action(
+        "Model retrained",
+        f"Version: {job.version}, Mode: {job.mode}, New accuracy: {job.accuracy:.4f}, Dataset size: {job.dataset_size}"
+    )
+
+retrainer = ModelRetrainer(
+    classifier, load_training_data, get_training_cutoff=adb.get_model_data_cutoff, on_swap=on_model_swap
+)
+
+@app.post("/admin/retrain-model")
+async def retrain_model(full: bool = False, current_user: str = Depends(verify_token)):
+    """Start retraining the ML model in the background; poll the returned job id for progress
+    
+    Retraining grows the active model from rows added since it was trained;
+    pass full=true to rebuild it from every row.
+    """
+    job, started = retrainer.start(requested_by=current_user, full=full)
+    
+    if started:
+        logger.info(f"🤖 Model retraining started - job {job.id} ({job.mode})")
+    
+    return JSONResponse(
+        status_code=202,
+        content={
+            "message": "Model retraining started" if started else "Model retraining already in progress",
+            **job.to_dict()
+        }
+    )
+
+@app.get("/admin/retrain-jobs")
+async def list_retrain_jobs(current_user: str = Depends(verify_token)):
+    """Recent retraining jobs and the active model"""
+    return {
+        "active_model": classifier.bundle.info() if classifier.bundle else None,
+        "previous_model": classifier.previous_bundle.info() if classifier.previous_bundle else None,
+        "jobs": retrainer.recent()
+    }
+
+@app.get("/admin/retrain-jobs/{job_id}")
+async def get_retrain_job(job_id: str, current_user: str = Depends(verify_token)):
+    """Progress of one retraining job"""
+    job = retrainer.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Retraining job not found")
+    return job.to_dict()
+
+@app.post("/admin/rollback-model")
+async def rollback_model(current_user: str = Depends(verify_token)):
+    """Swap back to the previously active model"""
+    try:
+        # Other workers follow the promoted file; the lock keeps this off a swap in progress
+        if not retrainer.lock.acquire():
+            raise HTTPException(status_code=409, detail="A model is being trained or swapped; try again shortly")
+        try:
+            replaced = classifier.bundle
+            restored = await run_in_threadpool(classifier.rollback)
+        finally:
+            retrainer.lock.release()
+        if restored is None:
+            raise HTTPException(status_code=409, detail="No previous model to roll back to")
         
-        logger.info(f"🤖 Model retrained - Accuracy: {accuracy:.4f}")
+        verdict_cache.clear()
+        db.log_admin_action(
+            "Model rolled back",
+            f"Restored version: {restored.version}, Replaced version: {replaced.version if replaced else None}"
+        )
+        logger.info(f"⏪ Model rolled back to {restored.version}")
         
         return {
-            "message": "Model retrained successfully",
-            "accuracy": accuracy,
-            "dataset_size": len(malicious_urls) + len(valid_urls)
+            "message": "Model rolled back successfully",
+            "active_model": restored.info(),
+            "previous_model": replaced.info() if replaced else None
         }
         
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"❌ Error retraining model: {e}")
+        logger.error(f"❌ Error rolling back model: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 if __name__ == "__main__":
     import uvicorn
     print("🛡️ Starting Safeguard Backend Server with Enhanced Features...")
     print("✨ Features: Immediate Blocking | Auto Database Updates | Active Reporting")
+    # uvicorn spawns its workers, so they share the model through the memory-mapped
+    # artifact; gunicorn.conf.py also loads it once before forking
+    workers = int(os.getenv("WEB_CONCURRENCY", "1"))
     uvicorn.run(
-        app, 
+        "main:app" if workers > 1 else app, 
         host="0.0.0.0", 
         port=8000, 
+        workers=workers,
         log_level="info",
         access_log=True
     )
@@ -1,213 +1,803 @@
-import pandas as pd
 import numpy as np
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.model_selection import train_test_split
-from sklearn.metrics import accuracy_score, classification_report
-import joblib
+import shutil
+import threading
+import zlib
+from forest_engine import CompiledForest
+from feature_store import FeatureStore
 import re
+import itertools
 import urllib.parse
+from collections import Counter
 from datetime import datetime
 import os
 
+# sklearn and joblib are imported where they are used: serving only needs them
+# once a model is loaded, and model_selection/metrics only when training runs.
+
+# Bump when extraction changes without changing FEATURE_NAMES, so cached features are rebuilt
+FEATURE_SCHEMA_VERSION = 1
+
+# Fixed feature order shared by training and inference
+FEATURE_NAMES = (
+    'url_length', 'domain_length',
+    'count_dots', 'count_hyphens', 'count_underscores', 'count_slashes',
+    'count_question_marks', 'count_equal_signs', 'count_at_signs', 'count_ampersands',
+    'count_digits', 'count_letters', 'count_uppercase',
+    'has_ip', 'has_port', 'subdomain_count',
+    'path_length', 'path_depth', 'has_query', 'query_length',
+    'suspicious_word_count', 'has_suspicious_tld', 'is_https', 'is_shortened'
+)
+BOOLEAN_FEATURES = frozenset([
+    'has_ip', 'has_port', 'has_query', 'has_suspicious_tld', 'is_https', 'is_shortened'
+])
+FEATURE_INDEX = {name: index for index, name in enumerate(FEATURE_NAMES)}
+
+SUSPICIOUS_WORDS = (
+    'login', 'verify', 'account', 'update', 'secure', 'bank', 'paypal',
+    'amazon', 'microsoft', 'apple', 'google', 'facebook', 'download',
+    'free', 'win', 'prize', 'click', 'here', 'now'
+)
+SUSPICIOUS_TLDS = frozenset(['tk', 'ml', 'ga', 'cf', 'gq'])
+SHORTENING_SERVICES = ('bit.ly', 'tinyurl.com', 't.co', 'goo.gl', 'ow.ly', 'short.link')
+IP_PATTERN = re.compile(r'\d+\.\d+\.\d+\.\d+')
+
+FEATURE_SCHEMA = f"{FEATURE_SCHEMA_VERSION}-{zlib.crc32(','.join(FEATURE_NAMES).encode()):08x}"
+
+# On-disk cache of training features; defaults to <model_dir>/features
+FEATURE_STORE_ENABLED = os.getenv("FEATURE_STORE", "true").lower() == "true"
+FEATURE_STORE_DIR = os.getenv("FEATURE_STORE_DIR")
+
+# Largest matrix scored by the compiled forest; bigger ones go through sklearn
+ENGINE_MAX_ROWS = int(os.getenv("ENGINE_MAX_ROWS", "512"))
+
+# Versioned model artifacts kept on disk besides the active and previous ones
+MODEL_KEEP_VERSIONS = int(os.getenv("MODEL_KEEP_VERSIONS", "5"))
+
+# Directory under model_dir where each process lists the artifacts it has loaded, so none gets pruned
+MODELS_IN_USE_DIR = 'in-use'
+
+# joblib mmap_mode for the engine arrays of loaded models; empty loads private copies
+MODEL_MMAP_MODE = os.getenv("MODEL_MMAP_MODE", "r") or None
+ESTIMATOR_SUFFIX = '.estimator.joblib'
+
+# Incremental retraining: trees added per update, forest size that forces a full
+# rebuild, and training rows whose features are kept to replay in later updates
+INCREMENTAL_TREES = int(os.getenv("INCREMENTAL_TREES", "20"))
+MODEL_MAX_TREES = int(os.getenv("MODEL_MAX_TREES", "300"))
+REPLAY_ROWS = int(os.getenv("REPLAY_ROWS", "50000"))
+REPLAY_SUFFIX = '.replay.npz'
+
+# Byte classes for counting character kinds in ASCII URLs
+ASCII_DIGITS = b'0123456789'
+ASCII_UPPERCASE = b'ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+ASCII_LETTERS = ASCII_UPPERCASE + b'abcdefghijklmnopqrstuvwxyz'
+
+def _chunked(iterable, size):
+    """Yield lists of up to `size` items"""
+    iterator = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
 class URLFeatureExtractor:
     """Extract lexical features from URLs"""
     
+    feature_names = FEATURE_NAMES
+    
     @staticmethod
-    def extract_features(url):
-        """Extract all lexical features from a URL"""
-        features = {}
-        
-        # Basic URL properties
-        features['url_length'] = len(url)
-        features['domain_length'] = len(urllib.parse.urlparse(url).netloc)
-        
-        # Count special characters
-        features['count_dots'] = url.count('.')
-        features['count_hyphens'] = url.count('-')
-        features['count_underscores'] = url.count('_')
-        features['count_slashes'] = url.count('/')
-        features['count_question_marks'] = url.count('?')
-        features['count_equal_signs'] = url.count('=')
-        features['count_at_signs'] = url.count('@')
-        features['count_ampersands'] = url.count('&')
-        
-        # Count digits and letters
-        features['count_digits'] = sum(c.isdigit() for c in url)
-        features['count_letters'] = sum(c.isalpha() for c in url)
-        features['count_uppercase'] = sum(c.isupper() for c in url)
-        
-        # URL structure analysis
-        parsed_url = urllib.parse.urlparse(url)
-        features['has_ip'] = bool(re.match(r'\d+\.\d+\.\d+\.\d+', parsed_url.netloc))
-        features['has_port'] = bool(parsed_url.port)
+    def extract_vector(url):
+        """Extract lexical features as a numeric list in FEATURE_NAMES order
         
-        # Subdomain count
-        domain_parts = parsed_url.netloc.split('.')
-        features['subdomain_count'] = max(0, len(domain_parts) - 2)
-        
-        # Path analysis
+        The URL is parsed and lowercased once. Character classes are counted
+        with C-level scans: bytes.translate for ASCII URLs, one Counter pass otherwise.
+        """
+        parsed_url = urllib.parse.urlparse(url)
+        netloc = parsed_url.netloc
         path = parsed_url.path
-        features['path_length'] = len(path)
-        features['path_depth'] = path.count('/') - 1 if path.startswith('/') else path.count('/')
-        
-        # Query parameters
-        features['has_query'] = bool(parsed_url.query)
-        features['query_length'] = len(parsed_url.query)
-        
-        # Suspicious patterns
-        suspicious_words = ['login', 'verify', 'account', 'update', 'secure', 'bank', 'paypal', 
-                          'amazon', 'microsoft', 'apple', 'google', 'facebook', 'download', 
-                          'free', 'win', 'prize', 'click', 'here', 'now']
-        
-        features['suspicious_word_count'] = sum(1 for word in suspicious_words if word in url.lower())
-        
-        # TLD analysis
-        tld = parsed_url.netloc.split('.')[-1] if '.' in parsed_url.netloc else ''
-        suspicious_tlds = ['tk', 'ml', 'ga', 'cf', 'gq']
-        features['has_suspicious_tld'] = tld.lower() in suspicious_tlds
-        
-        # Protocol
-        features['is_https'] = url.startswith('https://')
-        
-        # URL shortening services
-        shortening_services = ['bit.ly', 'tinyurl.com', 't.co', 'goo.gl', 'ow.ly', 'short.link']
-        features['is_shortened'] = any(service in url.lower() for service in shortening_services)
+        query = parsed_url.query
+        url_lower = url.lower()
+        
+        if url.isascii():
+            raw = url.encode('ascii')
+            length = len(raw)
+            count_digits = length - len(raw.translate(None, ASCII_DIGITS))
+            count_letters = length - len(raw.translate(None, ASCII_LETTERS))
+            count_uppercase = length - len(raw.translate(None, ASCII_UPPERCASE))
+            char_count = url.count
+        else:
+            char_counts = Counter(url)
+            count_digits = count_letters = count_uppercase = 0
+            for char, count in char_counts.items():
+                if char.isdigit():
+                    count_digits += count
+                if char.isalpha():
+                    count_letters += count
+                if char.isupper():
+                    count_uppercase += count
+            char_count = char_counts.__getitem__
+        
+        tld = netloc.rpartition('.')[2] if '.' in netloc else ''
+        dots_in_netloc = netloc.count('.')
+        path_slashes = path.count('/')
+        
+        return [
+            len(url),
+            len(netloc),
+            char_count('.'),
+            char_count('-'),
+            char_count('_'),
+            char_count('/'),
+            char_count('?'),
+            char_count('='),
+            char_count('@'),
+            char_count('&'),
+            count_digits,
+            count_letters,
+            count_uppercase,
+            int(IP_PATTERN.match(netloc) is not None),
+            # The port attribute re-parses netloc, so only consult it when one can exist
+            int(':' in netloc and bool(parsed_url.port)),
+            max(0, dots_in_netloc - 1),
+            len(path),
+            path_slashes - 1 if path.startswith('/') else path_slashes,
+            int(bool(query)),
+            len(query),
+            sum(1 for word in SUSPICIOUS_WORDS if word in url_lower),
+            int(tld.lower() in SUSPICIOUS_TLDS),
+            int(url.startswith('https://')),
+            int(any(service in url_lower for service in SHORTENING_SERVICES)),
+        ]
+    
+    @classmethod
+    def extract_matrix(cls, urls, dtype=np.float32, chunk_size=10000):
+        """Extract features for many URLs into a matrix, one row per URL in input order
+        
+        Sized inputs are written into a single preallocated matrix; other iterables
+        (e.g. streamed database rows) are consumed chunk by chunk.
+        """
+        if hasattr(urls, '__len__'):
+            matrix = np.empty((len(urls), len(FEATURE_NAMES)), dtype=dtype)
+            cls.extract_into(urls, matrix, chunk_size=chunk_size)
+            return matrix
+        
+        blocks = []
+        for chunk in _chunked(urls, chunk_size):
+            block = np.empty((len(chunk), len(FEATURE_NAMES)), dtype=dtype)
+            cls.extract_into(chunk, block, chunk_size=chunk_size)
+            blocks.append(block)
+        if not blocks:
+            return np.empty((0, len(FEATURE_NAMES)), dtype=dtype)
+        return np.concatenate(blocks)
+    
+    @classmethod
+    def extract_into(cls, urls, out, chunk_size=10000):
+        """Write feature rows for `urls` into the preallocated matrix `out`, returning the row count
+        
+        Only one chunk of intermediate Python lists is alive at a time.
+        """
+        row = 0
+        for chunk in _chunked(urls, chunk_size):
+            out[row:row + len(chunk)] = [cls.extract_vector(url) for url in chunk]
+            row += len(chunk)
+        return row
+    
+    @staticmethod
+    def extract_features(url):
+        """Extract all lexical features from a URL as a dict"""
+        return URLFeatureExtractor.vector_to_features(URLFeatureExtractor.extract_vector(url))
+    
+    @staticmethod
+    def vector_to_features(vector):
+        """Name the values of a feature vector"""
+        return {
+            name: bool(value) if name in BOOLEAN_FEATURES else value
+            for name, value in zip(FEATURE_NAMES, vector)
+        }
+
+class ModelBundle:
+    """A trained model and everything derived from it, swapped in as one unit
+    
+    Predictions take a single reference to the active bundle, so a model swap
+    never mixes the estimator, feature order and compiled engine of two models.
+    
+    The artifact stores the compiled engine's node arrays uncompressed, so they
+    are memory-mapped read-only on load and every worker process serves from
+    the same page-cache copy. The sklearn estimator unpickles into private
+    memory, so it lives in a sidecar file and is only loaded when needed.
+    """
+    
+    def __init__(self, model=None, feature_names=FEATURE_NAMES, feature_ranking=None, version=None,
+                 accuracy=None, training_date=None, path=None, engine=None, estimator_path=None,
+                 base_version=None):
+        self._model = model
+        self._model_lock = threading.Lock()
+        self.estimator_path = estimator_path
+        self.feature_names = list(feature_names)
+        self.feature_ranking = feature_ranking or self.rank_features(self.model, self.feature_names)
+        self.engine = engine if engine is not None else CompiledForest.from_sklearn(self.model)
+        self.version = version
+        self.accuracy = accuracy
+        self.training_date = training_date
+        self.path = path
+        self.base_version = base_version  # model this one was grown from incrementally, if any
+    
+    @property
+    def model(self):
+        """The sklearn estimator, loaded from the sidecar file on first use"""
+        if self._model is None and self.estimator_path:
+            with self._model_lock:
+                if self._model is None:
+                    import joblib
+                    self._model = joblib.load(self.estimator_path)
+        return self._model
+    
+    @staticmethod
+    def rank_features(model, feature_names):
+        """Rank features by importance once per model
+        
+        feature_importances_ is recomputed over every tree on each access,
+        so it is read here and never on the prediction path.
+        """
+        return sorted(
+            ((name, float(importance)) for name, importance in zip(feature_names, model.feature_importances_)),
+            key=lambda x: x[1],
+            reverse=True
+        )
+    
+    @staticmethod
+    def estimator_path_for(path):
+        """Sidecar file holding the estimator of the artifact at `path`"""
+        return os.path.splitext(path)[0] + ESTIMATOR_SUFFIX
+    
+    @staticmethod
+    def replay_path_for(path):
+        """Sidecar file holding the replay sample of the artifact at `path`"""
+        return os.path.splitext(path)[0] + REPLAY_SUFFIX
+    
+    @classmethod
+    def sidecar_paths_for(cls, path):
+        return (cls.estimator_path_for(path), cls.replay_path_for(path))
+    
+    @classmethod
+    def load(cls, path, mmap_mode=MODEL_MMAP_MODE):
+        """Load a bundle from a joblib artifact, memory-mapping its engine arrays"""
+        import joblib
+        model_data = joblib.load(path, mmap_mode=mmap_mode)
+        engine_arrays = model_data.get('engine')
+        estimator_file = model_data.get('estimator_file')
+        return cls(
+            # Artifacts saved before the engine was stored embed the estimator instead
+            model=model_data.get('model'),
+            feature_names=model_data['feature_names'],
+            feature_ranking=model_data.get('feature_ranking'),
+            version=model_data.get('version'),
+            accuracy=model_data.get('accuracy'),
+            training_date=model_data.get('training_date'),
+            base_version=model_data.get('base_version'),
+            path=path,
+            engine=CompiledForest.from_arrays(engine_arrays) if engine_arrays else None,
+            estimator_path=os.path.join(os.path.dirname(path), estimator_file) if estimator_file else None
+        )
+    
+    def to_dict(self):
+        """Artifact contents"""
+        return {
+            'engine': self.engine.to_arrays(),
+            'estimator_file': os.path.basename(self.estimator_path) if self.estimator_path else None,
+            'feature_names': self.feature_names,
+            'feature_ranking': self.feature_ranking,
+            'version': self.version,
+            'accuracy': self.accuracy,
+            'training_date': self.training_date,
+            'base_version': self.base_version
+        }
+    
+    def save(self, path):
+        """Write the bundle as a joblib artifact plus its estimator sidecar
+        
+        Left uncompressed so the engine arrays can be memory-mapped on load.
+        """
+        import joblib
+        estimator_path = self.estimator_path_for(path)
+        joblib.dump(self.model, estimator_path)
+        self.estimator_path = estimator_path
+        joblib.dump(self.to_dict(), path)
+        self.path = path
+    
+    def save_replay(self, X, y, seen_rows):
+        """Store training feature rows for later incremental updates
         
-        return features
+        `seen_rows` is how many rows all fits of this model lineage have used,
+        which keeps the sample uniform as updates are merged in.
+        """
+        np.savez(self.replay_path_for(self.path), X=X, y=y, seen_rows=seen_rows)
+    
+    def load_replay(self):
+        """Return the stored (X, y, seen_rows) replay sample"""
+        with np.load(self.replay_path_for(self.path)) as replay:
+            return replay['X'], replay['y'], int(replay['seen_rows'])
+    
+    def info(self):
+        """Describe the bundle for status endpoints"""
+        return {
+            'version': self.version,
+            'accuracy': self.accuracy,
+            'training_date': self.training_date,
+            'base_version': self.base_version,
+            'path': self.path
+        }
 
 class URLClassifier:
     """Machine Learning model for URL classification"""
     
-    def __init__(self):
-        self.model = RandomForestClassifier(
+    def __init__(self, model_dir='models'):
+        self.feature_extractor = URLFeatureExtractor()
+        self.model_dir = model_dir
+        self.model_path = os.path.join(model_dir, 'url_classifier.joblib')
+        self.bundle = None           # active ModelBundle, replaced atomically
+        self.previous_bundle = None  # last active bundle, kept for rollback
+        self._swap_lock = threading.Lock()
+        self._loaded_stamp = None    # identity of the current-model file this process last loaded or wrote
+        self.feature_store = FeatureStore(
+            FEATURE_STORE_DIR or os.path.join(model_dir, 'features'),
+            schema=FEATURE_SCHEMA,
+            n_features=len(FEATURE_NAMES),
+            extract_matrix=self.feature_extractor.extract_matrix
+        ) if FEATURE_STORE_ENABLED else None
+    
+    @property
+    def model(self):
+        return self.bundle.model if self.bundle else None
+    
+    @property
+    def feature_names(self):
+        return self.bundle.feature_names if self.bundle else None
+    
+    @property
+    def feature_ranking(self):
+        return self.bundle.feature_ranking if self.bundle else None
+    
+    @property
+    def engine(self):
+        return self.bundle.engine if self.bundle else None
+    
+    @staticmethod
+    def new_estimator():
+        """Untrained forest with the production hyperparameters"""
+        from sklearn.ensemble import RandomForestClassifier
+        return RandomForestClassifier(
             n_estimators=100,
             random_state=42,
             max_depth=10,
             min_samples_split=5
         )
-        self.feature_extractor = URLFeatureExtractor()
-        self.feature_names = None
-        self.model_path = 'models/url_classifier.joblib'
-        
-    def prepare_data(self, malicious_urls, valid_urls):
-        """Prepare training data from URL lists"""
-        data = []
-        labels = []
-        
-        # Process malicious URLs
-        for url in malicious_urls:
-            features = self.feature_extractor.extract_features(url)
-            data.append(features)
-            labels.append(1)  # 1 for malicious
-        
-        # Process valid URLs
-        for url in valid_urls:
-            features = self.feature_extractor.extract_features(url)
-            data.append(features)
-            labels.append(0)  # 0 for safe
         
-        # Convert to DataFrame
-        df = pd.DataFrame(data)
-        self.feature_names = df.columns.tolist()
-        
-        return df.values, np.array(labels)
+    def prepare_data(self, malicious_urls, valid_urls, chunk_size=10000, complete=False):
+        """Prepare training data from URL lists or streams
+        
+        URLs are read `chunk_size` at a time, so iterables such as
+        database.TrainingURLs stream from the database and only the float32
+        feature rows (the dtype the forest trains on) are kept. With the feature
+        store, only URLs it has not seen are extracted; complete=True marks the
+        inputs as whole tables so removed URLs are dropped.
+        """
+        blocks = {}
+        for label, urls in (('malicious', malicious_urls), ('valid', valid_urls)):
+            if self.feature_store is not None:
+                blocks[label] = self.feature_store.blocks(label, _chunked(urls, chunk_size), complete=complete)
+            else:
+                blocks[label] = [
+                    self.feature_extractor.extract_matrix(chunk, chunk_size=chunk_size)
+                    for chunk in _chunked(urls, chunk_size)
+                ]
+        n_malicious = sum(len(block) for block in blocks['malicious'])
+        n_rows = n_malicious + sum(len(block) for block in blocks['valid'])
+        
+        # Move the chunks into one matrix, releasing each as it is copied
+        X = np.empty((n_rows, len(FEATURE_NAMES)), dtype=np.float32)
+        row = 0
+        for label in ('malicious', 'valid'):
+            while blocks[label]:
+                block = blocks[label].pop(0)
+                X[row:row + len(block)] = block
+                row += len(block)
+        
+        # 1 for malicious, 0 for safe
+        y = np.zeros(len(X), dtype=np.int64)
+        y[:n_malicious] = 1
+        
+        return X, y
     
-    def train(self, malicious_urls, valid_urls):
-        """Train the model"""
+    def fit(self, malicious_urls, valid_urls):
+        """Fit and evaluate a new model, save it as a versioned artifact and return its bundle
+        
+        The active model is left untouched; see train() and activate().
+        """
         print("Preparing training data...")
-        X, y = self.prepare_data(malicious_urls, valid_urls)
+        X, y = self.prepare_data(malicious_urls, valid_urls, complete=True)
         
         print(f"Training on {len(X)} samples...")
         print(f"Malicious: {sum(y)}, Safe: {len(y) - sum(y)}")
         
+        model = self.new_estimator()
+        accuracy = self._fit_and_evaluate(model, X, y)
+        
+        replay_X, replay_y = self._sample_replay(X, y, REPLAY_ROWS)
+        return self._save_fitted(model, accuracy, replay_X, replay_y, seen_rows=len(X))
+    
+    def update(self, base_bundle, malicious_urls, valid_urls):
+        """Grow a copy of `base_bundle`'s forest with trees fit on new rows, save and return it
+        
+        The added trees learn from the new rows plus the base model's replay
+        sample of older rows, whose cached features are reused as-is, so the
+        cost depends on the new rows only. Rows removed from the tables are not
+        unlearned; a full fit() does that.
+        """
+        print("Preparing incremental training data...")
+        X_new, y_new = self.prepare_data(malicious_urls, valid_urls)
+        replay_X, replay_y, seen_rows = base_bundle.load_replay()
+        X = np.concatenate([X_new, replay_X])
+        y = np.concatenate([y_new, replay_y])
+        
+        print(f"Adding {INCREMENTAL_TREES} trees on {len(X_new)} new and {len(replay_X)} replayed samples...")
+        
+        # A private copy of the estimator, so base_bundle keeps serving unchanged;
+        # warm_start keeps its fitted trees and only fits the additional ones
+        import joblib
+        model = joblib.load(base_bundle.estimator_path)
+        model.set_params(warm_start=True, n_estimators=len(model.estimators_) + INCREMENTAL_TREES)
+        accuracy = self._fit_and_evaluate(model, X, y)
+        model.set_params(warm_start=False)
+        
+        replay_X, replay_y = self._merge_replay(replay_X, replay_y, seen_rows, X_new, y_new)
+        return self._save_fitted(
+            model, accuracy, replay_X, replay_y,
+            seen_rows=seen_rows + len(X_new), base_version=base_bundle.version
+        )
+    
+    def can_update(self, bundle):
+        """Whether `bundle` can be grown incrementally instead of rebuilt"""
+        return (
+            bundle is not None
+            and bundle.path is not None
+            and bundle.estimator_path is not None
+            and os.path.exists(ModelBundle.replay_path_for(bundle.path))
+            and len(bundle.engine.roots) + INCREMENTAL_TREES <= MODEL_MAX_TREES
+        )
+    
+    @staticmethod
+    def _fit_and_evaluate(model, X, y):
+        """Fit on a stratified 80% split and return the accuracy on the rest"""
+        from sklearn.model_selection import train_test_split
+        from sklearn.metrics import accuracy_score, classification_report
+        
         # Split data
         X_train, X_test, y_train, y_test = train_test_split(
             X, y, test_size=0.2, random_state=42, stratify=y
         )
         
         # Train model
-        self.model.fit(X_train, y_train)
+        model.fit(X_train, y_train)
         
         # Evaluate
-        y_pred = self.model.predict(X_test)
+        y_pred = model.predict(X_test)
         accuracy = accuracy_score(y_test, y_pred)
         
         print(f"Model Accuracy: {accuracy:.4f}")
         print("\nClassification Report:")
         print(classification_report(y_test, y_pred, target_names=['Safe', 'Malicious']))
+        return accuracy
+    
+    def _save_fitted(self, model, accuracy, replay_X, replay_y, seen_rows, base_version=None):
+        """Wrap a fitted model in a bundle and save it with its replay sample"""
+        trained_at = datetime.now()
+        bundle = ModelBundle(
+            model=model,
+            feature_names=FEATURE_NAMES,
+            version=trained_at.strftime('%Y%m%d%H%M%S%f'),
+            accuracy=float(accuracy),
+            training_date=trained_at.isoformat(),
+            base_version=base_version
+        )
         
-        # Save model
-        os.makedirs('models', exist_ok=True)
-        joblib.dump({
-            'model': self.model,
-            'feature_names': self.feature_names,
-            'accuracy': accuracy,
-            'training_date': datetime.now().isoformat()
-        }, self.model_path)
+        # Save a versioned artifact; the current-model path is only updated on activation
+        os.makedirs(self.model_dir, exist_ok=True)
+        bundle.save(self._version_path(bundle.version))
+        bundle.save_replay(replay_X, replay_y, seen_rows)
         
-        print(f"Model saved to {self.model_path}")
-        return accuracy
+        print(f"Model saved to {bundle.path}")
+        return bundle
+    
+    @staticmethod
+    def _sample_replay(X, y, size, seed=42):
+        """Uniform sample of up to `size` training rows"""
+        if len(X) <= size:
+            return X, y
+        rows = np.random.default_rng(seed).choice(len(X), size=size, replace=False)
+        return X[rows], y[rows]
+    
+    def _merge_replay(self, replay_X, replay_y, seen_rows, X_new, y_new):
+        """Keep the replay sample roughly uniform over every row trained on so far"""
+        total = seen_rows + len(X_new)
+        keep_new = min(len(X_new), round(REPLAY_ROWS * len(X_new) / total))
+        keep_old = min(len(replay_X), REPLAY_ROWS - keep_new)
+        old_X, old_y = self._sample_replay(replay_X, replay_y, keep_old)
+        new_X, new_y = self._sample_replay(X_new, y_new, keep_new)
+        return np.concatenate([old_X, new_X]), np.concatenate([old_y, new_y])
+    
+    def train(self, malicious_urls, valid_urls):
+        """Train the model and make it the active one"""
+        bundle = self.fit(malicious_urls, valid_urls)
+        self.activate(bundle)
+        return bundle.accuracy
     
-    def load_model(self):
+    def load_model(self, path=None):
         """Load trained model"""
-        if os.path.exists(self.model_path):
-            model_data = joblib.load(self.model_path)
-            self.model = model_data['model']
-            self.feature_names = model_data['feature_names']
+        path = path or self.model_path
+        if os.path.exists(path):
+            stamp = self._model_file_stamp() if path == self.model_path else None
+            self.activate(self._load_bundle(path), promote=False)
+            if stamp is not None:
+                self._loaded_stamp = stamp
             return True
         return False
     
-    def predict(self, url):
-        """Predict if URL is malicious"""
-        if not self.feature_names:
-            if not self.load_model():
-                return {'prediction': 'unknown', 'confidence': 0.0, 'reason': 'Model not trained'}
+    def _load_bundle(self, path):
+        bundle = ModelBundle.load(path)
+        # Track the versioned artifact, since the current-model file is overwritten on the next swap
+        versioned_path = self._version_path(bundle.version) if bundle.version else None
+        if versioned_path and os.path.exists(versioned_path):
+            bundle.path = versioned_path
+        return bundle
+    
+    def _model_file_stamp(self):
+        """Identity of the current-model file; each promotion renames a new file into place"""
+        try:
+            stat = os.stat(self.model_path)
+        except FileNotFoundError:
+            return None
+        return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+    
+    def reload_if_promoted(self):
+        """Activate the current-model file if another process has promoted a new one
+        
+        Worker processes train, retrain and roll back independently; the
+        others call this periodically to follow along. Returns the newly
+        active bundle, or None if nothing changed.
+        """
+        stamp = self._model_file_stamp()
+        if stamp is None or stamp == self._loaded_stamp:
+            return None
+        bundle = self._load_bundle(self.model_path)
+        self._loaded_stamp = stamp
+        if self.bundle is not None and bundle.version == self.bundle.version:
+            return None
+        self.activate(bundle, promote=False)
+        return bundle
+    
+    def _version_path(self, version):
+        return os.path.join(self.model_dir, f'url_classifier-{version}.joblib')
+    
+    def activate(self, bundle, promote=True):
+        """Atomically make a bundle the active model, keeping the old one for rollback
+        
+        With promote=True the bundle's artifact also becomes the current-model
+        file that a restarted process loads.
+        """
+        if promote:
+            self._promote(bundle)
+        with self._swap_lock:
+            if self.bundle is not None and self.bundle is not bundle:
+                self.previous_bundle = self.bundle
+            self.bundle = bundle
+        self.mark_in_use()
+        if promote:
+            self._prune_versions()
+        return bundle
+    
+    def rollback(self):
+        """Swap back to the previously active model; returns it, or None if there is none"""
+        with self._swap_lock:
+            previous = self.previous_bundle
+            if previous is None:
+                return None
+            self.previous_bundle, self.bundle = self.bundle, previous
+        self.mark_in_use()
+        self._promote(previous)
+        self._prune_versions()
+        return previous
+    
+    def _promote(self, bundle):
+        """Make a bundle the current-model file with an atomic rename"""
+        os.makedirs(self.model_dir, exist_ok=True)
+        if not (bundle.path and os.path.exists(bundle.path)) or \
+                os.path.abspath(bundle.path) == os.path.abspath(self.model_path):
+            # The current-model file gets overwritten, so give the bundle a versioned artifact first
+            bundle.save(self._version_path(bundle.version or datetime.now().strftime('%Y%m%d%H%M%S%f')))
+        # The copy refers to the versioned estimator sidecar, which stays in place
+        staging_path = f"{self.model_path}.{os.getpid()}.tmp"
+        shutil.copyfile(bundle.path, staging_path)
+        os.replace(staging_path, self.model_path)
+        # Our own promotion is not news to reload_if_promoted
+        self._loaded_stamp = self._model_file_stamp()
+    
+    def mark_in_use(self):
+        """List this process's active and previous artifacts for other processes' pruning"""
+        names = [
+            os.path.basename(bundle.path)
+            for bundle in (self.bundle, self.previous_bundle)
+            if bundle is not None and bundle.path
+        ]
+        directory = os.path.join(self.model_dir, MODELS_IN_USE_DIR)
+        try:
+            os.makedirs(directory, exist_ok=True)
+            staging_path = os.path.join(directory, f".{os.getpid()}.tmp")
+            with open(staging_path, 'w') as f:
+                f.write('\n'.join(names))
+            os.replace(staging_path, os.path.join(directory, str(os.getpid())))
+        except OSError as e:
+            print(f"Could not record the models in use: {e}")
+    
+    def _paths_in_use(self):
+        """Artifacts loaded by any live process, per their in-use files"""
+        directory = os.path.join(self.model_dir, MODELS_IN_USE_DIR)
+        try:
+            entries = os.listdir(directory)
+        except FileNotFoundError:
+            return set()
+        paths = set()
+        for entry in entries:
+            if not entry.isdigit():
+                continue
+            entry_path = os.path.join(directory, entry)
+            if not _process_alive(int(entry)):
+                try:
+                    os.remove(entry_path)
+                except OSError:
+                    pass
+                continue
+            try:
+                with open(entry_path) as f:
+                    paths.update(os.path.abspath(os.path.join(self.model_dir, name)) for name in f.read().split())
+            except FileNotFoundError:
+                pass
+        return paths
+    
+    def _prune_versions(self):
+        """Delete old versioned artifacts, keeping the newest and those any process has active or previous"""
+        keep_paths = {
+            os.path.abspath(bundle.path)
+            for bundle in (self.bundle, self.previous_bundle)
+            if bundle is not None and bundle.path
+        } | self._paths_in_use()
+        versions = sorted(
+            name for name in os.listdir(self.model_dir)
+            if name.startswith('url_classifier-') and name.endswith('.joblib')
+            and not name.endswith(ESTIMATOR_SUFFIX)
+        )
+        for name in versions[:-MODEL_KEEP_VERSIONS] if MODEL_KEEP_VERSIONS > 0 else versions:
+            path = os.path.join(self.model_dir, name)
+            if os.path.abspath(path) not in keep_paths:
+                # Mapped pages of a deleted artifact stay valid for processes still using it
+                for stale_path in (path, *ModelBundle.sidecar_paths_for(path)):
+                    if os.path.exists(stale_path):
+                        os.remove(stale_path)
+    
+    def _active_bundle(self):
+        """Return the active bundle, loading the saved model on first use"""
+        bundle = self.bundle
+        if bundle is None and self.load_model():
+            bundle = self.bundle
+        return bundle
+    
+    def predict(self, url, explain=False):
+        """Predict if URL is malicious
+        
+        Set explain=True to include the top contributing features.
+        """
+        bundle = self._active_bundle()
+        if bundle is None:
+            return {'prediction': 'unknown', 'confidence': 0.0, 'reason': 'Model not trained'}
         
         # Extract features
-        features = self.feature_extractor.extract_features(url)
+        vector = self.feature_extractor.extract_vector(url)
         
         # Ensure feature order matches training
-        feature_vector = []
-        for feature_name in self.feature_names:
-            feature_vector.append(features.get(feature_name, 0))
-        
-        # Make prediction
-        prediction = self.model.predict([feature_vector])[0]
-        confidence = self.model.predict_proba([feature_vector])[0]
-        
-        # Get feature importance for explanation
-        feature_importance = self.model.feature_importances_
-        top_features = sorted(
-            zip(self.feature_names, feature_vector, feature_importance),
-            key=lambda x: x[2],
-            reverse=True
-        )[:5]
+        feature_vector = self._model_vector(vector, bundle.feature_names)
+        
+        # Label and probabilities from a single pass over the compiled forest
+        predictions, probabilities = bundle.engine.predict([feature_vector])
+        prediction, confidence = predictions[0], probabilities[0]
+        
+        return self._format_prediction(vector, prediction, confidence, bundle, explain=explain)
+    
+    def explain(self, url, top_n=5):
+        """Return the most important features and their values for a URL"""
+        bundle = self._active_bundle()
+        if bundle is None:
+            return None
+        features = self.feature_extractor.extract_features(url)
+        return {'top_features': self._top_features(features, bundle, top_n)}
+    
+    def predict_batch(self, urls, explain=False):
+        """Predict many URLs with one feature matrix and a single predict_proba call"""
+        bundle = self._active_bundle()
+        if bundle is None:
+            return [
+                {'prediction': 'unknown', 'confidence': 0.0, 'reason': 'Model not trained'}
+                for _ in urls
+            ]
+        
+        if not urls:
+            return []
+        
+        # Build the feature matrix in training order
+        vectors = [self.feature_extractor.extract_vector(url) for url in urls]
+        matrix = np.array([self._model_vector(vector, bundle.feature_names) for vector in vectors], dtype=np.float32)
         
+        # One pass over the forest for the whole batch
+        predictions, probabilities = self._predict_matrix(matrix, bundle)
+        
+        return [
+            self._format_prediction(vector, prediction, confidence, bundle, explain=explain)
+            for vector, prediction, confidence in zip(vectors, predictions, probabilities)
+        ]
+    
+    @staticmethod
+    def _predict_matrix(matrix, bundle):
+        """Labels and probabilities for a feature matrix from a single forest pass"""
+        if len(matrix) <= ENGINE_MAX_ROWS:
+            return bundle.engine.predict(matrix)
+        probabilities = bundle.model.predict_proba(matrix)
+        return bundle.model.classes_.take(np.argmax(probabilities, axis=1)), probabilities
+    
+    @staticmethod
+    def _model_vector(vector, feature_names):
+        """Reorder an extracted vector to the feature order the model was trained with"""
+        if tuple(feature_names) == FEATURE_NAMES:
+            return vector
+        features = dict(zip(FEATURE_NAMES, vector))
+        return [features.get(name, 0) for name in feature_names]
+    
+    @staticmethod
+    def _top_features(features, bundle, top_n=5):
+        """Pair the precomputed importance ranking with this URL's feature values"""
+        return [
+            {
+                'feature': feature,
+                'value': features.get(feature, 0),
+                'importance': importance
+            }
+            for feature, importance in bundle.feature_ranking[:top_n]
+        ]
+    
+    def _format_prediction(self, vector, prediction, confidence, bundle, explain=False):
+        """Build the prediction result with reason and, on request, explanation
+        
+        `vector` is in FEATURE_NAMES order; the named features are only built for explanations.
+        """
         result = {
             'prediction': 'malicious' if prediction == 1 else 'safe',
             'confidence': float(max(confidence)),
             'malicious_probability': float(confidence[1]),
-            'safe_probability': float(confidence[0]),
-            'top_features': [
-                {
-                    'feature': feature,
-                    'value': value,
-                    'importance': importance
-                }
-                for feature, value, importance in top_features
-            ]
+            'safe_probability': float(confidence[0])
         }
         
+        if explain:
+            result['top_features'] = self._top_features(self.feature_extractor.vector_to_features(vector), bundle)
+        
         # Generate reason
         if prediction == 1:
             reasons = []
-            if features.get('has_suspicious_tld', False):
+            if vector[FEATURE_INDEX['has_suspicious_tld']]:
                 reasons.append("Suspicious TLD detected")
-            if features.get('suspicious_word_count', 0) > 2:
+            if vector[FEATURE_INDEX['suspicious_word_count']] > 2:
                 reasons.append("Multiple suspicious keywords")
-            if features.get('url_length', 0) > 100:
+            if vector[FEATURE_INDEX['url_length']] > 100:
                 reasons.append("Unusually long URL")
-            if features.get('has_ip', False):
+            if vector[FEATURE_INDEX['has_ip']]:
                 reasons.append("IP address instead of domain")
             
             result['reason'] = '; '.join(reasons) if reasons else "ML model detected malicious patterns"
@@ -216,5 +806,31 @@ class URLClassifier:
         
         return result
 
+def _process_alive(pid):
+    if os.name == 'nt':
+        # os.kill would signal the process on Windows; keep its artifacts
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+def train_artifact(malicious_urls, valid_urls, model_dir='models', base_path=None):
+    """Fit a model and write its versioned artifact without activating it
+    
+    With `base_path`, that artifact's model is grown incrementally from the
+    given (new) rows instead. Runs in a worker process during background
+    retraining, where database.TrainingURLs inputs stream their rows from the
+    database; returns the artifact's metadata so the serving process can load
+    and swap it in.
+    """
+    trainer = URLClassifier(model_dir)
+    if base_path is not None:
+        return trainer.update(ModelBundle.load(base_path), malicious_urls, valid_urls).info()
+    return trainer.fit(malicious_urls, valid_urls).info()
+
 # Global classifier instance
 classifier = URLClassifier()
@@ -0,0 +1,65 @@
+import threading
+import time
+
+
+class TokenBucket:
+    """Thread-safe token bucket for pacing calls to a rate-limited API
+
+    Holds up to `capacity` tokens and refills at `rate_per_minute`. A call
+    takes one token. pause() empties the bucket for a while, for when the
+    server itself says we are over quota.
+    """
+
+    def __init__(self, rate_per_minute, capacity=None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity or max(1, int(rate_per_minute))
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+        self.granted = 0
+        self.throttled = 0
+        self._recent = []  # monotonic times of grants in the last minute
+
+    def _refill(self, now):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self):
+        """Take a token if one is available, returning 0.0; otherwise the seconds until one will be"""
+        with self._lock:
+            now = time.monotonic()
+            if now < self._paused_until:
+                return self._paused_until - now
+            self._refill(now)
+            if self._tokens >= 1:
+                self._tokens -= 1
+                self.granted += 1
+                self._recent.append(now)
+                return 0.0
+            return (1 - self._tokens) / self.rate
+
+    def pause(self, seconds):
+        """Hand out no tokens for `seconds`, and start empty afterwards"""
+        with self._lock:
+            now = time.monotonic()
+            self._paused_until = max(self._paused_until, now + seconds)
+            self._tokens = 0.0
+            self._updated = self._paused_until
+            self.throttled += 1
+
+    def stats(self):
+        with self._lock:
+            now = time.monotonic()
+            if now >= self._paused_until:
+                self._refill(now)
+            self._recent = [t for t in self._recent if t > now - 60]
+            return {
+                'rate_per_minute': round(self.rate * 60, 2),
+                'capacity': self.capacity,
+                'tokens': round(max(self._tokens, 0.0), 2),
+                'used_last_minute': len(self._recent),
+                'granted': self.granted,
+                'throttled': self.throttled,
+                'paused_for': round(max(0.0, self._paused_until - now), 1)
+            }
@@ -0,0 +1,217 @@
+import asyncio
+import threading
+import time
+
+
+class CircuitOpen(Exception):
+    """The feed's circuit is open, so the call was not made"""
+
+
+class FeedUnavailable(Exception):
+    """A feed answered, but with a server-side error (5xx)"""
+
+
+def raise_for_outage(response):
+    """Raise FeedUnavailable for a 5xx answer, so the breaker counts it; return the response otherwise"""
+    if response.status_code >= 500:
+        raise FeedUnavailable(f"HTTP {response.status_code}")
+    return response
+
+
+def _describe(error):
+    # Shown on /health: client errors can quote the request URL, API key included
+    if error is None or isinstance(error, str):
+        return error
+    if isinstance(error, FeedUnavailable):
+        return f"FeedUnavailable: {error}"
+    return type(error).__name__
+
+
+class CircuitBreaker:
+    """Per-feed circuit breaker with optional hedged async calls
+
+    closed: calls go through. After `failure_threshold` failures in a row
+    (errors, timeouts, or calls slower than `slow_call` seconds) the
+    circuit opens. open: calls fail fast with CircuitOpen for
+    `reset_timeout` seconds. half_open: one probe call is let through; its
+    success closes the circuit, its failure opens it again.
+
+    With `hedge_delay` set, an async call still running after that many
+    seconds gets an identical second call, and whichever finishes first wins.
+    Only use it for idempotent lookups.
+
+    An async caller that gives up at its own deadline is not a verdict on
+    the feed: it may never have got a pooled connection. The call keeps
+    running in its own task, bounded by the HTTP client's timeout, and is
+    recorded however it actually ends.
+    """
+
+    def __init__(self, name, failure_threshold=5, reset_timeout=30.0, slow_call=None,
+                 hedge_delay=None, ignore=()):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.slow_call = slow_call
+        self.hedge_delay = hedge_delay
+        self.ignore = ignore  # exceptions that still mean the feed answered, e.g. quota errors
+        self.state = 'closed'
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self._probe_started = None
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.failures = 0
+        self.slow_calls = 0
+        self.rejected = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.abandoned = 0  # async calls whose caller stopped waiting
+        self.last_error = None
+
+    def allow(self):
+        """Whether a call may go out now; in half_open this claims the probe"""
+        with self._lock:
+            now = time.monotonic()
+            if self.state == 'open' and now - self.opened_at >= self.reset_timeout:
+                self.state = 'half_open'
+                self._probe_started = None
+            if self.state == 'half_open':
+                # A probe that never reported back does not block the circuit forever
+                if self._probe_started is None or now - self._probe_started >= self.reset_timeout:
+                    self._probe_started = now
+                    return True
+            elif self.state == 'closed':
+                return True
+            self.rejected += 1
+            return False
+
+    def retry_after(self):
+        """Seconds until a call would be let through, 0 when one would be now"""
+        with self._lock:
+            now = time.monotonic()
+            if self.state == 'open':
+                return max(0.0, self.opened_at + self.reset_timeout - now)
+            if self.state == 'half_open' and self._probe_started is not None:
+                return max(0.0, self._probe_started + self.reset_timeout - now)
+            return 0.0
+
+    def record_success(self, duration=None):
+        if self.slow_call is not None and duration is not None and duration > self.slow_call:
+            with self._lock:
+                self.slow_calls += 1
+            self.record_failure(f"slow call ({duration:.2f}s)")
+            return
+        with self._lock:
+            self.calls += 1
+            self.consecutive_failures = 0
+            self.state = 'closed'
+            self.opened_at = None
+
+    def record_failure(self, error=None):
+        with self._lock:
+            self.calls += 1
+            self.failures += 1
+            self.consecutive_failures += 1
+            self.last_error = _describe(error)
+            if self.state == 'half_open' or self.consecutive_failures >= self.failure_threshold:
+                self.state = 'open'
+                self.opened_at = time.monotonic()
+
+    def record_abandoned(self):
+        with self._lock:
+            self.abandoned += 1
+
+    def call(self, func, *args, **kwargs):
+        """Run a blocking call through the breaker"""
+        if not self.allow():
+            raise CircuitOpen(self.name)
+        start = time.monotonic()
+        try:
+            result = func(*args, **kwargs)
+        except self.ignore:
+            self.record_success()
+            raise
+        except Exception as e:
+            self.record_failure(e)
+            raise
+        self.record_success(time.monotonic() - start)
+        return result
+
+    async def call_async(self, func, *args, **kwargs):
+        """Await func(*args, **kwargs) through the breaker, hedging it when configured"""
+        if not self.allow():
+            raise CircuitOpen(self.name)
+        # A half-open probe is a single call
+        hedge = self.hedge_delay if self.state == 'closed' else None
+        start = time.monotonic()
+        task = asyncio.ensure_future(
+            self._hedged(func, hedge, *args, **kwargs) if hedge else func(*args, **kwargs)
+        )
+        task.add_done_callback(lambda done: self._record(done, time.monotonic() - start))
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if not task.done():
+                self.record_abandoned()
+            raise
+
+    def _record(self, task, duration):
+        """Record how an async call ended"""
+        if task.cancelled():
+            # Only happens when the event loop shuts down; let the next call probe
+            with self._lock:
+                self._probe_started = None
+            return
+        error = task.exception()
+        if error is None:
+            self.record_success(duration)
+        elif isinstance(error, self.ignore):
+            self.record_success()
+        else:
+            self.record_failure(error)
+
+    async def _hedged(self, func, delay, *args, **kwargs):
+        """Start a second call if the first is still running after `delay`; return the first success"""
+        first = asyncio.ensure_future(func(*args, **kwargs))
+        tasks = {first}
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if done:
+                return first.result()
+
+            with self._lock:
+                self.hedges += 1
+            hedge = asyncio.ensure_future(func(*args, **kwargs))
+            tasks.add(hedge)
+            while True:
+                done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    tasks.discard(task)
+                    if task.exception() is None:
+                        if task is hedge:
+                            with self._lock:
+                                self.hedge_wins += 1
+                        return task.result()
+                if not tasks:
+                    # Both calls failed
+                    raise task.exception()
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    def stats(self):
+        retry_in = self.retry_after()
+        with self._lock:
+            return {
+                'state': self.state,
+                'consecutive_failures': self.consecutive_failures,
+                'retry_in': round(retry_in, 1) if self.state != 'closed' else None,
+                'calls': self.calls,
+                'failures': self.failures,
+                'slow_calls': self.slow_calls,
+                'rejected': self.rejected,
+                'hedges': self.hedges,
+                'hedge_wins': self.hedge_wins,
+                'abandoned': self.abandoned,
+                'last_error': self.last_error
+            }
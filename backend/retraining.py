@@ -0,0 +1,243 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from ml_model import ModelBundle, train_artifact
+
+try:
+    import fcntl
+except ImportError:  # Windows: no flock, and no forked workers sharing a model directory
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Finished jobs remembered for polling
+RETRAIN_JOB_HISTORY = int(os.getenv("RETRAIN_JOB_HISTORY", "20"))
+
+
+class TrainingLock:
+    """Advisory file lock so one process at a time trains, promotes or prunes models
+
+    Workers forked from one master share the model directory; without it each
+    would train its own copy and prune the artifacts the others have loaded.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+
+    def acquire(self):
+        """Take the lock without waiting; False if another process or job holds it"""
+        if self._file is not None:
+            return False
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        lock_file = open(self.path, 'a')
+        if fcntl is not None:
+            try:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                lock_file.close()
+                return False
+        self._file = lock_file
+        return True
+
+    def release(self):
+        if self._file is not None:
+            if fcntl is not None:
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+            self._file.close()
+            self._file = None
+
+
+class RetrainJob:
+    """State of one background retraining run"""
+
+    def __init__(self, requested_by=None, mode='incremental'):
+        self.id = uuid.uuid4().hex
+        self.status = 'queued'  # queued -> running -> completed | failed
+        self.stage = 'queued'   # queued, loading_data, training, loading_model, done
+        self.mode = mode        # incremental, or full when requested or the model cannot be grown
+        self.requested_by = requested_by
+        self.created_at = datetime.utcnow()
+        self.started_at = None
+        self.finished_at = None
+        self.dataset_size = None
+        self.data_cutoff = None  # newest date_added among the rows trained on
+        self.accuracy = None
+        self.version = None
+        self.previous_version = None
+        self.error = None
+
+    @property
+    def done(self):
+        return self.status in ('completed', 'failed')
+
+    def to_dict(self):
+        return {
+            'job_id': self.id,
+            'status': self.status,
+            'stage': self.stage,
+            'mode': self.mode,
+            'requested_by': self.requested_by,
+            'created_at': self.created_at.isoformat(),
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+            'dataset_size': self.dataset_size,
+            'data_cutoff': self.data_cutoff.isoformat() if self.data_cutoff else None,
+            'accuracy': self.accuracy,
+            'version': self.version,
+            'previous_version': self.previous_version,
+            'error': self.error
+        }
+
+
+class ModelRetrainer:
+    """Retrain the classifier in a separate process and hot-swap the result
+
+    The fit runs in a freshly spawned process, so it neither holds the GIL
+    nor grows the API process's memory. The serving process only loads the
+    finished artifact and swaps the classifier's bundle between requests.
+    One job runs at a time.
+
+    Jobs are incremental unless a full rebuild is requested: only rows added
+    after the active model's recorded training cutoff are loaded, and the
+    model is grown with trees fit on them. A full rebuild is used instead
+    when the model cannot be grown or its cutoff is unknown.
+
+    Jobs hold a lock file in the model directory, so with several worker
+    processes only one trains at a time; the others pick up the promoted
+    artifact through URLClassifier.reload_if_promoted().
+    """
+
+    def __init__(self, classifier, load_training_data, get_training_cutoff=None, on_swap=None):
+        self.classifier = classifier
+        self.load_training_data = load_training_data    # async (since) -> (malicious_urls, valid_urls, cutoff); URLs as lists or picklable streams
+        self.get_training_cutoff = get_training_cutoff  # async (version) -> cutoff recorded for that model
+        self.on_swap = on_swap                          # called (or awaited) with the job after a new model goes live
+        self.lock = TrainingLock(os.path.join(classifier.model_dir, '.training.lock'))
+        self.jobs = OrderedDict()
+        self._current = None
+        self._task = None
+
+    @property
+    def current_job(self):
+        """The queued or running job, if any"""
+        if self._current is not None and not self._current.done:
+            return self._current
+        return None
+
+    def start(self, requested_by=None, full=False):
+        """Start a retraining job, or return the one already in progress
+
+        Returns (job, started).
+        """
+        running = self.current_job
+        if running is not None:
+            return running, False
+
+        job = RetrainJob(requested_by, mode='full' if full else 'incremental')
+        self._remember(job)
+        self._current = job
+        self._task = asyncio.get_running_loop().create_task(self._run(job))
+        return job, True
+
+    async def wait(self, job):
+        """Wait until a job started by this retrainer has finished"""
+        if self._current is job and self._task is not None:
+            # Shielded: a cancelled waiter must not cancel the training run
+            await asyncio.shield(self._task)
+
+    def get(self, job_id):
+        return self.jobs.get(job_id)
+
+    def recent(self):
+        return [job.to_dict() for job in reversed(self.jobs.values())]
+
+    def _remember(self, job):
+        self.jobs[job.id] = job
+        while len(self.jobs) > RETRAIN_JOB_HISTORY:
+            oldest_id, oldest = next(iter(self.jobs.items()))
+            if not oldest.done:
+                break
+            del self.jobs[oldest_id]
+
+    async def _incremental_since(self, base):
+        """Training cutoff of the active model if it can be grown, else None"""
+        if self.get_training_cutoff is None or not self.classifier.can_update(base):
+            return None
+        return await self.get_training_cutoff(base.version)
+
+    async def _run(self, job):
+        loop = asyncio.get_running_loop()
+        job.status = 'running'
+        job.started_at = datetime.utcnow()
+        if not self.lock.acquire():
+            job.status = 'failed'
+            job.error = "Another worker process is already training or swapping the model"
+            job.finished_at = datetime.utcnow()
+            logger.info(f"🤖 Retraining job {job.id} skipped: {job.error}")
+            return
+        try:
+            job.stage = 'loading_data'
+            base = self.classifier.bundle
+            since = await self._incremental_since(base) if job.mode == 'incremental' else None
+            if since is None:
+                job.mode = 'full'
+            malicious_urls, valid_urls, job.data_cutoff = await self.load_training_data(since)
+            job.dataset_size = len(malicious_urls) + len(valid_urls)
+
+            if job.mode == 'incremental' and job.dataset_size == 0:
+                job.version = job.previous_version = base.version
+                job.accuracy = base.accuracy
+                job.stage = 'done'
+                job.status = 'completed'
+                job.finished_at = datetime.utcnow()
+                logger.info(f"🤖 No rows added since model {base.version} was trained - nothing to update")
+                return
+            if job.mode == 'full' and (not malicious_urls or not valid_urls):
+                raise ValueError("Insufficient training data")
+
+            job.stage = 'training'
+            base_path = base.path if job.mode == 'incremental' else None
+            # spawn gives the trainer a clean interpreter instead of a fork of the server's threads
+            executor = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn'))
+            try:
+                artifact = await loop.run_in_executor(
+                    executor, train_artifact, malicious_urls, valid_urls, self.classifier.model_dir, base_path
+                )
+            finally:
+                executor.shutdown(wait=False)
+
+            job.stage = 'loading_model'
+            bundle = await loop.run_in_executor(None, ModelBundle.load, artifact['path'])
+            previous = self.classifier.bundle
+            await loop.run_in_executor(None, self.classifier.activate, bundle)
+
+            job.previous_version = previous.version if previous else None
+            job.version = bundle.version
+            job.accuracy = bundle.accuracy
+            job.stage = 'done'
+            job.status = 'completed'
+            job.finished_at = datetime.utcnow()
+            logger.info(f"🤖 Model {bundle.version} live ({job.mode}) - Accuracy: {bundle.accuracy:.4f}")
+        except Exception as e:
+            job.status = 'failed'
+            job.error = str(e)
+            job.finished_at = datetime.utcnow()
+            logger.error(f"❌ Retraining job {job.id} failed at {job.stage}: {e}")
+            return
+        finally:
+            self.lock.release()
+
+        if self.on_swap is not None:
+            try:
+                result = self.on_swap(job)
+                if asyncio.iscoroutine(result):
+                    await result
+            except Exception as e:
+                logger.error(f"❌ Post-swap hook failed for job {job.id}: {e}")
@@ -0,0 +1,566 @@
+import base64
+import hashlib
+import logging
+import os
+import random
+import re
+import threading
+import time
+import urllib.parse
+import uuid
+from datetime import datetime
+
+import numpy as np
+
+import http_clients
+from cache import TTLCache
+from resilience import CircuitOpen, raise_for_outage
+
+logger = logging.getLogger(__name__)
+
+# Longest hash prefix the Update API hands out; full hashes are SHA-256
+FULL_HASH_SIZE = 32
+
+# Retry schedule for failed updates from the Update API docs: 15 min doubling, capped at a day
+UPDATE_RETRY_BASE = 15 * 60
+UPDATE_RETRY_MAX = 24 * 60 * 60
+
+_IP_PART = re.compile(rb'0[xX][0-9a-fA-F]*|[0-9]+')
+
+
+def _unescape(value):
+    """Percent-unescape until nothing changes"""
+    while True:
+        unescaped = urllib.parse.unquote_to_bytes(value)
+        if unescaped == value:
+            return value
+        value = unescaped
+
+
+def _escape(value):
+    """Percent-escape control, space, non-ASCII, '#' and '%' bytes"""
+    return ''.join(
+        f'%{b:02X}' if b <= 32 or b >= 127 or b in b'#%' else chr(b)
+        for b in value
+    )
+
+
+def _normalize_ip(host):
+    """Dotted-quad form of a host written as an IPv4 address in any notation, else None"""
+    parts = host.split(b'.')
+    if not 1 <= len(parts) <= 4 or not all(_IP_PART.fullmatch(p) for p in parts):
+        return None
+    values = []
+    for part in parts:
+        if part[:2].lower() == b'0x':
+            values.append(int(part[2:] or b'0', 16))
+        elif len(part) > 1 and part.startswith(b'0'):
+            try:
+                values.append(int(part, 8))
+            except ValueError:
+                return None
+        else:
+            values.append(int(part))
+    # The last part fills every byte the earlier parts did not
+    if any(v > 255 for v in values[:-1]) or values[-1] >= 256 ** (5 - len(values)):
+        return None
+    address = values[-1]
+    for i, value in enumerate(values[:-1]):
+        address |= value << (8 * (3 - i))
+    return '.'.join(str((address >> shift) & 255) for shift in (24, 16, 8, 0)).encode()
+
+
+def _normalize_path(path):
+    """Resolve '.' and '..' segments and collapse repeated slashes"""
+    segments = []
+    for segment in path.split(b'/'):
+        if segment in (b'', b'.'):
+            continue
+        if segment == b'..':
+            if segments:
+                segments.pop()
+            continue
+        segments.append(segment)
+    normalized = b'/' + b'/'.join(segments)
+    if segments and (path.endswith(b'/') or path.endswith(b'/.') or path.endswith(b'/..')):
+        normalized += b'/'
+    return normalized
+
+
+def canonicalize(url):
+    """Canonical (host, path, query) of a URL as the Safe Browsing API defines it
+
+    query is None when the URL has no '?'.
+    """
+    raw = re.sub(rb'[\t\r\n]', b'', url.strip().encode('utf-8'))
+    raw = _unescape(raw.split(b'#', 1)[0])
+
+    scheme_end = raw.find(b'://')
+    rest = raw[scheme_end + 3:] if scheme_end != -1 else raw
+    authority_end = min((i for i in (rest.find(b'/'), rest.find(b'?')) if i != -1), default=len(rest))
+    authority, path_query = rest[:authority_end], rest[authority_end:]
+
+    host = authority.rsplit(b'@', 1)[-1].split(b':', 1)[0]
+    host = re.sub(rb'\.{2,}', b'.', host.strip(b'.')).lower()
+    host = _normalize_ip(host) or host
+
+    path, separator, query = path_query.partition(b'?')
+    return (
+        _escape(host),
+        _escape(_normalize_path(path)),
+        _escape(query) if separator else None
+    )
+
+
+def url_expressions(url):
+    """Host-suffix/path-prefix expressions of a URL, most specific first (at most 30)"""
+    host, path, query = canonicalize(url)
+
+    hosts = [host]
+    if _normalize_ip(host.encode()) is None:
+        # Up to four suffixes built from the last five components, never the bare TLD
+        parts = host.split('.')
+        hosts += ['.'.join(parts[i:]) for i in range(max(1, len(parts) - 5), len(parts) - 1)]
+
+    paths = [f'{path}?{query}'] if query is not None else []
+    paths.append(path)
+    prefix = '/'
+    paths.append(prefix)
+    for directory in path.split('/')[1:-1][:3]:
+        prefix += f'{directory}/'
+        paths.append(prefix)
+
+    return list(dict.fromkeys(h + p for h in hosts for p in dict.fromkeys(paths)))
+
+
+def url_hashes(url):
+    """SHA-256 full hashes of a URL's expressions"""
+    return [hashlib.sha256(expression.encode()).digest() for expression in url_expressions(url)]
+
+
+def _duration(value, default):
+    """Seconds in a protobuf Duration string such as '593.44s'"""
+    return float(value.rstrip('s')) if value else default
+
+
+class ChecksumMismatch(Exception):
+    """The local copy of a list no longer matches the server's"""
+
+
+class ThreatList:
+    """Local copy of one Safe Browsing list: sorted hash prefixes plus the client state
+
+    Prefixes are grouped by length into sorted, fixed-width numpy byte arrays
+    (in practice almost all are 4 bytes), so a list of a million prefixes
+    costs a few megabytes and a lookup is a binary search per length.
+    """
+
+    def __init__(self, threat_type, platform_type, threat_entry_type='URL'):
+        self.threat_type = threat_type
+        self.platform_type = platform_type
+        self.threat_entry_type = threat_entry_type
+        self.state = ''
+        self.prefixes = {}  # prefix length -> sorted unique array of dtype S{length}
+
+    @property
+    def key(self):
+        return (self.threat_type, self.platform_type, self.threat_entry_type)
+
+    @property
+    def name(self):
+        return '_'.join(self.key)
+
+    def __len__(self):
+        return sum(len(prefixes) for prefixes in self.prefixes.values())
+
+    def match(self, hashes):
+        """Prefixes of the given full hashes that are in this list"""
+        found = set()
+        for length, prefixes in self.prefixes.items():
+            if not len(prefixes):
+                continue
+            keys = np.array([h[:length] for h in hashes], dtype=f'S{length}')
+            positions = np.minimum(np.searchsorted(prefixes, keys), len(prefixes) - 1)
+            for i in np.flatnonzero(prefixes[positions] == keys):
+                found.add(hashes[i][:length])
+        return found
+
+    def apply_update(self, response):
+        """Apply a listUpdateResponse, raising ChecksumMismatch without changing anything if it does not verify"""
+        prefixes = {} if response.get('responseType') == 'FULL_UPDATE' else dict(self.prefixes)
+
+        for removal in response.get('removals', []):
+            indices = removal.get('rawIndices', {}).get('indices', [])
+            if removal.get('compressionType', 'RAW') != 'RAW':
+                raise ValueError(f"Unsupported compression {removal['compressionType']}")
+            prefixes = self._remove(prefixes, indices)
+
+        for addition in response.get('additions', []):
+            if addition.get('compressionType', 'RAW') != 'RAW':
+                raise ValueError(f"Unsupported compression {addition['compressionType']}")
+            raw = addition['rawHashes']
+            length = raw['prefixSize']
+            added = np.frombuffer(base64.b64decode(raw['rawHashes']), dtype=f'S{length}')
+            prefixes[length] = np.unique(np.concatenate([prefixes.get(length, added[:0]), added]))
+
+        expected = response.get('checksum', {}).get('sha256')
+        if expected is not None and hashlib.sha256(self._ordered_bytes(prefixes)).digest() != base64.b64decode(expected):
+            raise ChecksumMismatch(self.name)
+
+        # Swap in one assignment so concurrent lookups see the old or the new list, never a mix
+        self.prefixes = prefixes
+        self.state = response.get('newClientState', self.state)
+
+    def reset(self):
+        """Forget the list so the next update is a full one"""
+        self.prefixes = {}
+        self.state = ''
+
+    @staticmethod
+    def _ordered(prefixes):
+        """All prefixes in the server's order (lexicographic over raw bytes), padded to 32 bytes, with their lengths"""
+        lengths = sorted(prefixes)
+        padded = np.concatenate(
+            [prefixes[n].astype(f'S{FULL_HASH_SIZE}') for n in lengths] or [np.empty(0, dtype=f'S{FULL_HASH_SIZE}')]
+        )
+        sizes = np.concatenate([np.full(len(prefixes[n]), n) for n in lengths] or [np.empty(0, dtype=int)])
+        # Null padding ties a prefix with its extensions; the shorter one sorts first
+        order = np.lexsort((sizes, padded))
+        return padded[order], sizes[order]
+
+    @classmethod
+    def _ordered_bytes(cls, prefixes):
+        """Concatenation of all prefixes in server order, as the update checksum covers"""
+        non_empty = [n for n, values in prefixes.items() if len(values)]
+        if len(non_empty) <= 1:
+            return prefixes[non_empty[0]].tobytes() if non_empty else b''
+        padded, sizes = cls._ordered(prefixes)
+        matrix = padded.view(np.uint8).reshape(-1, FULL_HASH_SIZE)
+        return matrix[np.arange(FULL_HASH_SIZE) < sizes[:, None]].tobytes()
+
+    @classmethod
+    def _remove(cls, prefixes, indices):
+        """Drop the prefixes at the given positions of the server-ordered list"""
+        if not indices:
+            return prefixes
+        padded, sizes = cls._ordered(prefixes)
+        keep = np.ones(len(padded), dtype=bool)
+        keep[np.asarray(indices, dtype=int)] = False
+        padded, sizes = padded[keep], sizes[keep]
+        # Each length's rows stay in sorted order
+        return {n: padded[sizes == n].astype(f'S{n}') for n in prefixes}
+
+    def save(self, directory):
+        """Write the list atomically
+
+        Every worker process syncs into the same directory, so each save
+        stages to a file of its own before renaming it into place.
+        """
+        path = os.path.join(directory, f'{self.name}.npz')
+        staging_path = os.path.join(directory, f'.{self.name}.npz.{os.getpid()}-{uuid.uuid4().hex[:8]}.tmp')
+        try:
+            with open(staging_path, 'wb') as f:
+                np.savez(f, state=np.array(self.state), **{f'prefixes_{n}': p for n, p in self.prefixes.items()})
+            os.replace(staging_path, path)
+        except BaseException:
+            if os.path.exists(staging_path):
+                os.remove(staging_path)
+            raise
+
+    def load(self, directory):
+        """Restore the list saved by save(), returning False if there is none"""
+        path = os.path.join(directory, f'{self.name}.npz')
+        if not os.path.exists(path):
+            return False
+        with np.load(path) as saved:
+            self.prefixes = {
+                int(name.rsplit('_', 1)[1]): saved[name] for name in saved.files if name.startswith('prefixes_')
+            }
+            self.state = str(saved['state'])
+        return True
+
+
+class SafeBrowsingLocalDB:
+    """Safe Browsing Update API client that matches URLs in-process
+
+    A background thread keeps a local copy of the configured lists' hash
+    prefixes in sync through threatListUpdates:fetch, honouring the server's
+    minimum wait and backing off after failures. A lookup canonicalizes the
+    URL, hashes its expressions and searches the prefixes locally; only a
+    prefix hit costs a fullHashes:find call, whose answer is cached for the
+    durations the server gives.
+    """
+
+    def __init__(self, api_key, api_base, directory, threat_types, platform_type='ANY_PLATFORM',
+                 client=None, update_interval=1800, cache_size=100000, breaker=None):
+        self.api_key = api_key
+        self.breaker = breaker  # CircuitBreaker guarding fullHashes:find, if any
+        self.api_base = api_base.rstrip('/')
+        self.directory = directory
+        self.client = client or {"clientId": "safeguard-extension", "clientVersion": "1.0.0"}
+        self.update_interval = update_interval
+        self.lists = {
+            threat_list.key: threat_list
+            for threat_list in (ThreatList(threat_type, platform_type) for threat_type in threat_types)
+        }
+        # Full hash -> list match and when it expires; prefix -> True when the server listed no full hash for it
+        self.full_hashes = TTLCache(max_entries=cache_size, ttl=300)
+        self.negative_prefixes = TTLCache(max_entries=cache_size, ttl=300)
+        self.next_update = 0.0
+        self.last_update = None
+        self.last_error = None
+        self.failures = 0
+        self._update_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def ready(self):
+        """Whether every list has been synced at least once"""
+        return all(threat_list.state for threat_list in self.lists.values())
+
+    def start(self):
+        """Load the saved lists and keep them in sync on a daemon thread"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self.load()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='gsb-update', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def load(self):
+        os.makedirs(self.directory, exist_ok=True)
+        for threat_list in self.lists.values():
+            threat_list.load(self.directory)
+
+    def _run(self):
+        while not self._stop.wait(max(0.0, self.next_update - time.time())):
+            self.update()
+
+    def update(self):
+        """Fetch and apply one round of list updates, returning True on success"""
+        with self._update_lock:
+            try:
+                response = http_clients.get_session().post(
+                    f"{self.api_base}/threatListUpdates:fetch",
+                    params={'key': self.api_key},
+                    json=self._update_request(),
+                    # A full update can be megabytes
+                    timeout=(http_clients.FEED_HTTP_CONNECT_TIMEOUT, 30)
+                )
+                response.raise_for_status()
+                body = response.json()
+
+                mismatched = False
+                for update in body.get('listUpdateResponses', []):
+                    threat_list = self.lists.get(
+                        (update.get('threatType'), update.get('platformType'), update.get('threatEntryType'))
+                    )
+                    if threat_list is None:
+                        continue
+                    try:
+                        threat_list.apply_update(update)
+                    except ChecksumMismatch:
+                        # Start this list over with a full update on the next round
+                        threat_list.reset()
+                        mismatched = True
+                    threat_list.save(self.directory)
+
+                self.failures = 0
+                self.last_error = 'checksum mismatch' if mismatched else None
+                self.last_update = datetime.utcnow()
+                self.next_update = time.time() + _duration(body.get('minimumWaitDuration'), self.update_interval)
+                return True
+
+            except Exception as e:
+                self.failures += 1
+                self.last_error = str(e)
+                backoff = UPDATE_RETRY_BASE * 2 ** (self.failures - 1) * (random.random() + 1)
+                self.next_update = time.time() + min(backoff, UPDATE_RETRY_MAX)
+                logger.warning(f"Safe Browsing update failed ({self.failures} in a row): {e}")
+                return False
+
+    def _update_request(self):
+        return {
+            "client": self.client,
+            "listUpdateRequests": [
+                {
+                    "threatType": threat_list.threat_type,
+                    "platformType": threat_list.platform_type,
+                    "threatEntryType": threat_list.threat_entry_type,
+                    "state": threat_list.state,
+                    "constraints": {"supportedCompressions": ["RAW"]}
+                }
+                for threat_list in self.lists.values()
+            ]
+        }
+
+    def _lookup(self, url):
+        """Local part of a check: the verdict if the caches decide it, else the prefixes to verify"""
+        hashes = url_hashes(url)
+        prefixes = set()
+        for threat_list in self.lists.values():
+            prefixes |= threat_list.match(hashes)
+        if not prefixes:
+            return self._safe_result(), []
+
+        now = time.monotonic()
+        expired = []
+        for full_hash in hashes:
+            match = self.full_hashes.get(full_hash)
+            if match is None:
+                continue
+            if match['expires'] > now:
+                return self._threat_result(match), []
+            expired.append(full_hash)
+
+        # An expired match must be asked about again, whatever the negative cache says
+        pending = [
+            prefix for prefix in prefixes
+            if any(full_hash.startswith(prefix) for full_hash in expired)
+            or self.negative_prefixes.get(prefix) is None
+        ]
+        return (None, pending) if pending else (self._safe_result(), [])
+
+    def _full_hash_request(self, prefixes):
+        return {
+            "client": self.client,
+            "clientStates": [threat_list.state for threat_list in self.lists.values()],
+            "threatInfo": {
+                "threatTypes": sorted({threat_list.threat_type for threat_list in self.lists.values()}),
+                "platformTypes": sorted({threat_list.platform_type for threat_list in self.lists.values()}),
+                "threatEntryTypes": ["URL"],
+                "threatEntries": [{"hash": base64.b64encode(prefix).decode()} for prefix in prefixes]
+            }
+        }
+
+    def _store_full_hashes(self, url, prefixes, body):
+        """Cache a fullHashes:find answer for the durations the server gave, returning the URL's verdict
+
+        Only prefixes without a listed full hash are cached as safe. A match stays in the cache
+        after its cacheDuration, marked expired, so that it is asked about again rather than
+        ending up under a negative entry.
+        """
+        negative_ttl = _duration(body.get('negativeCacheDuration'), 300)
+        listed = {}
+        for match in body.get('matches', []):
+            ttl = _duration(match.get('cacheDuration'), 300)
+            full_hash = base64.b64decode(match['threat']['hash'])
+            listed[full_hash] = {
+                'threat_type': match['threatType'],
+                'platform_type': match.get('platformType', 'ANY_PLATFORM'),
+                'expires': time.monotonic() + ttl
+            }
+            self.full_hashes.set(full_hash, listed[full_hash], ttl=max(ttl, negative_ttl))
+        for prefix in prefixes:
+            if not any(full_hash.startswith(prefix) for full_hash in listed):
+                self.negative_prefixes.set(prefix, True, ttl=negative_ttl)
+
+        result = self._safe_result()
+        for full_hash in url_hashes(url):
+            if full_hash in listed:
+                result = self._threat_result(listed[full_hash])
+            elif any(full_hash.startswith(prefix) for prefix in prefixes):
+                # The server no longer lists a hash whose match had expired
+                self.full_hashes.delete(full_hash)
+        return result
+
+    def _post_full_hashes(self, prefixes):
+        return raise_for_outage(http_clients.get_session().post(
+            f"{self.api_base}/fullHashes:find",
+            params={'key': self.api_key},
+            json=self._full_hash_request(prefixes),
+            timeout=http_clients.TIMEOUT
+        ))
+
+    async def _post_full_hashes_async(self, prefixes, client):
+        return raise_for_outage(await client.post(
+            f"{self.api_base}/fullHashes:find",
+            params={'key': self.api_key},
+            json=self._full_hash_request(prefixes)
+        ))
+
+    def check_url(self, url):
+        """Check a URL against the local lists, fetching full hashes only on a prefix hit
+
+        Raises CircuitOpen when a fetch is needed but the breaker is open.
+        """
+        result, pending = self._lookup(url)
+        if result is not None:
+            return result
+        try:
+            if self.breaker is not None:
+                response = self.breaker.call(self._post_full_hashes, pending)
+            else:
+                response = self._post_full_hashes(pending)
+            if response.status_code != 200:
+                return self._error_result(f"Full hash API Error: {response.status_code}")
+            return self._store_full_hashes(url, pending, response.json())
+        except CircuitOpen:
+            raise
+        except Exception as e:
+            return self._error_result(str(e))
+
+    async def check_url_async(self, url, client):
+        """Non-blocking check_url; `client` is the caller's httpx.AsyncClient, usually http_clients.get_async_client()"""
+        result, pending = self._lookup(url)
+        if result is not None:
+            return result
+        try:
+            if self.breaker is not None:
+                response = await self.breaker.call_async(self._post_full_hashes_async, pending, client)
+            else:
+                response = await self._post_full_hashes_async(pending, client)
+            if response.status_code != 200:
+                return self._error_result(f"Full hash API Error: {response.status_code}")
+            return self._store_full_hashes(url, pending, response.json())
+        except CircuitOpen:
+            raise
+        except Exception as e:
+            return self._error_result(str(e))
+
+    def stats(self):
+        return {
+            'ready': self.ready,
+            'lists': {threat_list.name: len(threat_list) for threat_list in self.lists.values()},
+            'last_update': self.last_update.isoformat() if self.last_update else None,
+            'next_update_in': round(max(0.0, self.next_update - time.time()), 1),
+            'consecutive_failures': self.failures,
+            'last_error': self.last_error,
+            'full_hash_cache': self.full_hashes.stats()
+        }
+
+    @staticmethod
+    def _threat_result(match):
+        return {
+            'is_threat': True,
+            'threat_type': match['threat_type'],
+            'platform_type': match['platform_type'],
+            'source': 'Google Safe Browsing',
+            'confidence': 0.95
+        }
+
+    @staticmethod
+    def _safe_result():
+        return {
+            'is_threat': False,
+            'threat_type': None,
+            'source': 'Google Safe Browsing',
+            'confidence': 0.9
+        }
+
+    @staticmethod
+    def _error_result(error):
+        return {
+            'is_threat': False,
+            'threat_type': None,
+            'source': 'Google Safe Browsing',
+            'error': error,
+            'confidence': 0.0
+        }
@@ -0,0 +1,48 @@
+import psycopg2
+from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
+import os
+
+# Columns that setup_database.py creates, for databases set up before they existed
+COLUMNS = [
+    "ALTER TABLE model_logs ADD COLUMN IF NOT EXISTS data_cutoff TIMESTAMP",
+]
+
+# Indexes that setup_database.py creates, for databases set up before they existed
+INDEXES = [
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_malicious_urls_date_added ON malicious_urls (date_added)",
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_malicious_urls_source_id ON malicious_urls (source, id)",
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_valid_urls_date_added ON valid_urls (date_added)",
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_valid_urls_source_id ON valid_urls (source, id)",
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_user_reports_status_date ON user_reports (status, date_reported DESC)",
+]
+
+def add_indexes():
+    """Create missing columns and indexes on an existing database without blocking writes"""
+    
+    DB_CONFIG = {
+        'host': os.getenv('DB_HOST', 'localhost'),
+        'user': os.getenv('DB_USER', 'postgres'),
+        'password': os.getenv('DB_PASSWORD', 'password'),
+        'database': os.getenv('DB_NAME', 'safeguard_db'),
+        'port': os.getenv('DB_PORT', 5432)
+    }
+    
+    try:
+        conn = psycopg2.connect(**DB_CONFIG)
+        # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+        conn.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
+        cursor = conn.cursor()
+        
+        for statement in COLUMNS + INDEXES:
+            print(statement)
+            cursor.execute(statement)
+        print("Columns and indexes created successfully")
+        
+        cursor.close()
+        conn.close()
+        
+    except Exception as e:
+        print(f"Error creating columns and indexes: {e}")
+
+if __name__ == "__main__":
+    add_indexes()
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Feature Extraction Microbenchmark
+Compares the optimized URLFeatureExtractor against the original
+multi-pass implementation and checks that both produce identical features
+"""
+
+import sys
+import os
+import re
+import random
+import statistics
+import timeit
+import urllib.parse
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+from ml_model import URLFeatureExtractor, FEATURE_NAMES
+
+def legacy_extract_features(url):
+    """Original multi-pass extractor, kept here as the reference implementation"""
+    features = {}
+
+    features['url_length'] = len(url)
+    features['domain_length'] = len(urllib.parse.urlparse(url).netloc)
+
+    features['count_dots'] = url.count('.')
+    features['count_hyphens'] = url.count('-')
+    features['count_underscores'] = url.count('_')
+    features['count_slashes'] = url.count('/')
+    features['count_question_marks'] = url.count('?')
+    features['count_equal_signs'] = url.count('=')
+    features['count_at_signs'] = url.count('@')
+    features['count_ampersands'] = url.count('&')
+
+    features['count_digits'] = sum(c.isdigit() for c in url)
+    features['count_letters'] = sum(c.isalpha() for c in url)
+    features['count_uppercase'] = sum(c.isupper() for c in url)
+
+    parsed_url = urllib.parse.urlparse(url)
+    features['has_ip'] = bool(re.match(r'\d+\.\d+\.\d+\.\d+', parsed_url.netloc))
+    features['has_port'] = bool(parsed_url.port)
+
+    domain_parts = parsed_url.netloc.split('.')
+    features['subdomain_count'] = max(0, len(domain_parts) - 2)
+
+    path = parsed_url.path
+    features['path_length'] = len(path)
+    features['path_depth'] = path.count('/') - 1 if path.startswith('/') else path.count('/')
+
+    features['has_query'] = bool(parsed_url.query)
+    features['query_length'] = len(parsed_url.query)
+
+    suspicious_words = ['login', 'verify', 'account', 'update', 'secure', 'bank', 'paypal',
+                      'amazon', 'microsoft', 'apple', 'google', 'facebook', 'download',
+                      'free', 'win', 'prize', 'click', 'here', 'now']
+    features['suspicious_word_count'] = sum(1 for word in suspicious_words if word in url.lower())
+
+    tld = parsed_url.netloc.split('.')[-1] if '.' in parsed_url.netloc else ''
+    suspicious_tlds = ['tk', 'ml', 'ga', 'cf', 'gq']
+    features['has_suspicious_tld'] = tld.lower() in suspicious_tlds
+
+    features['is_https'] = url.startswith('https://')
+
+    shortening_services = ['bit.ly', 'tinyurl.com', 't.co', 'goo.gl', 'ow.ly', 'short.link']
+    features['is_shortened'] = any(service in url.lower() for service in shortening_services)
+
+    return features
+
+def sample_urls(count=5000, seed=42):
+    """Generate a mix of benign-looking and suspicious URLs"""
+    rng = random.Random(seed)
+    words = ['login', 'secure', 'account', 'news', 'shop', 'docs', 'free', 'prize',
+             'update', 'blog', 'api', 'cdn', 'Mail', 'Verify', 'static', 'images']
+    tlds = ['com', 'org', 'net', 'io', 'tk', 'ml', 'ru', 'de', 'ga']
+    urls = []
+    for _ in range(count):
+        if rng.random() < 0.1:
+            host = '.'.join(str(rng.randint(1, 254)) for _ in range(4))
+        else:
+            host = '-'.join(rng.sample(words, rng.randint(1, 3))) + '.' + rng.choice(tlds)
+        path = '/'.join(rng.sample(words, rng.randint(0, 5)))
+        query = f"?id={rng.randint(0, 10**6)}&ref={rng.choice(words)}" if rng.random() < 0.4 else ''
+        scheme = rng.choice(['http', 'https'])
+        urls.append(f"{scheme}://{host}/{path}{query}")
+    return urls
+
+def main():
+    print("⏱️" + "=" * 60)
+    print("   FEATURE EXTRACTION MICROBENCHMARK")
+    print("=" * 62)
+
+    urls = sample_urls()
+
+    # Correctness: features must be identical, in training order
+    for url in urls:
+        legacy = legacy_extract_features(url)
+        vector = URLFeatureExtractor.extract_vector(url)
+        if list(legacy) != list(FEATURE_NAMES) or [float(v) for v in legacy.values()] != [float(v) for v in vector]:
+            print(f"❌ Feature mismatch for {url}")
+            sys.exit(1)
+    print(f"✅ Identical features for {len(urls)} URLs")
+
+    # Interleave the extractors in every round so machine noise hits all of them alike
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 15
+    extractors = {
+        'Legacy extractor': legacy_extract_features,
+        'extract_vector': URLFeatureExtractor.extract_vector,
+        'extract_features (dict)': URLFeatureExtractor.extract_features,
+    }
+    timings = {name: [] for name in extractors}
+    for _ in range(rounds):
+        for name, extract in extractors.items():
+            timings[name].append(timeit.timeit(lambda: [extract(u) for u in urls], number=1) / len(urls) * 1e6)
+
+    legacy = timings['Legacy extractor']
+    print(f"\n{rounds} rounds of {len(urls)} URLs (µs/URL; speedup vs legacy)")
+    for name, values in timings.items():
+        best, median = min(values), statistics.median(values)
+        print(f"{name + ':':<26}best {best:6.2f} ({min(legacy) / best:.2f}x)   "
+              f"median {median:6.2f} ({statistics.median(legacy) / median:.2f}x)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Threat Feed HTTP Benchmark
+Serves a threat-feed-like JSON endpoint over HTTPS on localhost with a
+throwaway self-signed certificate, then compares per-call latency of a new
+connection per lookup (module-level requests.post, or a new httpx client)
+with the pooled keep-alive clients from http_clients. Needs the openssl CLI.
+"""
+
+import sys
+import os
+import ssl
+import asyncio
+import statistics
+import subprocess
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+import requests
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+import http_clients
+
+PAYLOAD = {"threatInfo": {"threatEntries": [{"url": "http://example.com/"}]}}
+
+
+class FeedStub(BaseHTTPRequestHandler):
+    """Answers every POST like threatMatches:find does for a clean URL"""
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True  # headers and body go out in separate writes
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        body = b'{}'
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def make_certificate(directory):
+    cert, key = os.path.join(directory, 'cert.pem'), os.path.join(directory, 'key.pem')
+    subprocess.run(
+        ['openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes', '-keyout', key, '-out', cert,
+         '-days', '1', '-subj', '/CN=127.0.0.1', '-addext', 'subjectAltName=IP:127.0.0.1'],
+        check=True, capture_output=True
+    )
+    return cert, key
+
+
+def serve(cert, key):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FeedStub)
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    context.load_cert_chain(cert, key)
+    server.socket = context.wrap_socket(server.socket, server_side=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"https://127.0.0.1:{server.server_port}/v4/threatMatches:find"
+
+
+def timed(call, calls):
+    samples = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        call()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+async def timed_async(call, calls):
+    samples = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        await call()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def report(label, samples, baseline=None):
+    median = statistics.median(samples)
+    line = f"{label:<34} median {median * 1e3:7.2f} ms  p95 {sorted(samples)[int(len(samples) * 0.95)] * 1e3:7.2f} ms"
+    if baseline is not None:
+        line += f"  saves {(statistics.median(baseline) - median) * 1e3:6.2f} ms/call"
+    print(line)
+
+
+async def compare_async(url, cert, calls):
+    async def new_client_per_call():
+        async with httpx.AsyncClient(verify=cert) as client:
+            (await client.post(url, json=PAYLOAD)).raise_for_status()
+
+    pooled = http_clients.new_async_client(verify=cert)
+
+    async def shared_client():
+        (await pooled.post(url, json=PAYLOAD)).raise_for_status()
+
+    before = await timed_async(new_client_per_call, calls)
+    await shared_client()  # open the pooled connection
+    after = await timed_async(shared_client, calls)
+    await pooled.aclose()
+    return before, after
+
+
+def main():
+    print("🌐" + "=" * 60)
+    print("   THREAT FEED HTTP BENCHMARK")
+    print("=" * 62)
+
+    calls = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+
+    with tempfile.TemporaryDirectory() as directory:
+        cert, key = make_certificate(directory)
+        server, url = serve(cert, key)
+
+        # verify is passed per call: REQUESTS_CA_BUNDLE would override session.verify
+        session = http_clients.new_session()
+        session.post(url, json=PAYLOAD, verify=cert)  # open the pooled connection
+
+        before = timed(lambda: requests.post(url, json=PAYLOAD, verify=cert, timeout=10).raise_for_status(), calls)
+        after = timed(lambda: session.post(url, json=PAYLOAD, verify=cert, timeout=http_clients.TIMEOUT).raise_for_status(), calls)
+
+        print(f"\n{calls} sequential lookups over HTTPS to localhost:")
+        report("requests.post (new TLS each call)", before)
+        report("pooled keep-alive session", after, before)
+
+        async_before, async_after = asyncio.run(compare_async(url, cert, calls))
+        report("httpx client per call", async_before)
+        report("shared httpx AsyncClient", async_after, async_before)
+
+        session.close()
+        server.shutdown()
+
+    print("\nOn a real network each saved handshake is also one or two round trips to the feed.")
+
+
+if __name__ == "__main__":
+    main()
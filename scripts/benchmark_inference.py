@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Model Inference Microbenchmark
+Compares the compiled forest against sklearn's predict + predict_proba and
+checks that both produce the same probabilities
+"""
+
+import sys
+import os
+import tempfile
+import timeit
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+from ml_model import URLClassifier
+from benchmark_feature_extraction import sample_urls
+
+def load_classifier():
+    """Use the trained model if there is one, otherwise fit one on synthetic URLs"""
+    classifier = URLClassifier()
+    classifier.model_path = os.path.join(os.path.dirname(__file__), '..', 'backend', 'models', 'url_classifier.joblib')
+    if classifier.load_model():
+        print(f"📦 Loaded {classifier.model_path}")
+        return classifier
+
+    print("📦 No trained model found, training on synthetic URLs...")
+    urls = sample_urls(4000, seed=7)
+    flagged = [any(t in u for t in ('.tk/', '.ml/', '.ga/', 'login', 'prize')) for u in urls]
+    malicious = [u for u, bad in zip(urls, flagged) if bad]
+    valid = [u for u, bad in zip(urls, flagged) if not bad]
+    with tempfile.TemporaryDirectory() as workdir:
+        classifier.model_path = os.path.join(workdir, 'url_classifier.joblib')
+        cwd = os.getcwd()
+        os.chdir(workdir)
+        try:
+            classifier.train(malicious, valid)
+        finally:
+            os.chdir(cwd)
+    return classifier
+
+def main():
+    print("⏱️" + "=" * 60)
+    print("   MODEL INFERENCE MICROBENCHMARK")
+    print("=" * 62)
+
+    classifier = load_classifier()
+    model, engine = classifier.model, classifier.engine
+    X = classifier.feature_extractor.extract_matrix(sample_urls(5000))
+
+    # Correctness: probabilities and labels must match sklearn
+    expected = model.predict_proba(X)
+    labels, probabilities = engine.predict(X)
+    max_error = float(np.abs(expected - probabilities).max())
+    if max_error > 1e-9 or not np.array_equal(labels, model.predict(X)):
+        print(f"❌ Compiled forest disagrees with sklearn (max error {max_error:.2e})")
+        sys.exit(1)
+    print(f"✅ Same predictions for {len(X)} URLs (max probability error {max_error:.2e})")
+
+    row = X[:1]
+    repeat = 5
+    sklearn_time = min(timeit.repeat(lambda: (model.predict(row), model.predict_proba(row)), number=20, repeat=repeat)) / 20
+    engine_time = min(timeit.repeat(lambda: engine.predict(row), number=200, repeat=repeat)) / 200
+    print(f"\nSingle URL, sklearn predict + predict_proba: {sklearn_time * 1e6:9.1f} µs")
+    print(f"Single URL, compiled forest:                  {engine_time * 1e6:9.1f} µs  ({sklearn_time / engine_time:.1f}x)")
+
+    for size in (10, 100, 1000):
+        batch = X[:size]
+        sklearn_time = min(timeit.repeat(lambda: model.predict_proba(batch), number=5, repeat=repeat)) / 5
+        engine_time = min(timeit.repeat(lambda: engine.predict(batch), number=5, repeat=repeat)) / 5
+        print(f"Batch of {size:>5}: sklearn {sklearn_time * 1e3:7.2f} ms, compiled {engine_time * 1e3:7.2f} ms  ({sklearn_time / engine_time:.1f}x)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+"""
+Safe Browsing Local Database Benchmark
+Runs a fake Safe Browsing server on localhost, syncs the local hash-prefix
+database from it (a full update, then a partial one with removals), checks
+canonicalization and matching, and compares local lookups with a
+threatMatches:find round trip per URL. Needs no network access or API key.
+"""
+
+import sys
+import os
+import json
+import base64
+import hashlib
+import random
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+from safe_browsing_local import SafeBrowsingLocalDB, canonicalize, url_expressions, url_hashes
+from enhanced_threat_feed import GoogleSafeBrowsingAPI
+from benchmark_feature_extraction import sample_urls
+
+THREAT_TYPES = ['MALWARE', 'SOCIAL_ENGINEERING']
+
+# Examples from the Safe Browsing URL canonicalization spec
+CANONICAL_CASES = {
+    "http://host/%25%32%35": "host/%25",
+    "http://host/%25%32%35%25%32%35": "host/%25%25",
+    "http://host/%2525252525252525": "host/%25",
+    "http://host/asdf%25%32%35asd": "host/asdf%25asd",
+    "http://host/%%%25%32%35asd%%": "host/%25%25%25asd%25%25",
+    "http://www.google.com/": "www.google.com/",
+    "http://%31%36%38%2e%31%38%38%2e%39%39%2e%32%36/%2E%73%65%63%75%72%65/%77%77%77%2E%65%62%61%79%2E%63%6F%6D/": "168.188.99.26/.secure/www.ebay.com/",
+    "http://195.127.0.11/uploads/%20%20%20%20/.verify/.eBaysecure=updateuserdataxplimnbqmn-xplmvalidateinfoswqpcmlx=hgplmcx/": "195.127.0.11/uploads/%20%20%20%20/.verify/.eBaysecure=updateuserdataxplimnbqmn-xplmvalidateinfoswqpcmlx=hgplmcx/",
+    "http://host%23.com/%257Ea%2521b%2540c%2523d%2524e%25f%255E00%252611%252A22%252833%252944_55%252B": "host%23.com/~a!b@c%23d$e%25f^00&11*22(33)44_55+",
+    "http://3279880203/blah": "195.127.0.11/blah",
+    "http://www.google.com/blah/..": "www.google.com/",
+    "www.google.com/": "www.google.com/",
+    "www.google.com": "www.google.com/",
+    "http://www.evil.com/blah#frag": "www.evil.com/blah",
+    "http://www.GOOgle.com/": "www.google.com/",
+    "http://www.google.com.../": "www.google.com/",
+    "http://www.google.com/foo\tbar\rbaz\n2": "www.google.com/foobarbaz2",
+    "http://www.google.com/q?": "www.google.com/q?",
+    "http://www.google.com/q?r?": "www.google.com/q?r?",
+    "http://www.google.com/q?r?s": "www.google.com/q?r?s",
+    "http://evil.com/foo#bar#baz": "evil.com/foo",
+    "http://evil.com/foo;": "evil.com/foo;",
+    "http://evil.com/foo?bar;": "evil.com/foo?bar;",
+    "http://\x01%80.com/": "%01%80.com/",
+    "http://notrailingslash.com": "notrailingslash.com/",
+    "http://www.gotaport.com:1234/": "www.gotaport.com/",
+    "  http://www.google.com/  ": "www.google.com/",
+    "http:// leadingspace.com/": "%20leadingspace.com/",
+    "http://%20leadingspace.com/": "%20leadingspace.com/",
+    "%20leadingspace.com/": "%20leadingspace.com/",
+    "https://www.securesite.com/": "www.securesite.com/",
+    "http://host.com/ab%23cd": "host.com/ab%23cd",
+    "http://host.com//twoslashes?more//slashes": "host.com/twoslashes?more//slashes",
+}
+
+EXPRESSION_CASE = ("http://a.b.c/1/2.html?param=1", [
+    "a.b.c/1/2.html?param=1", "a.b.c/1/2.html", "a.b.c/", "a.b.c/1/",
+    "b.c/1/2.html?param=1", "b.c/1/2.html", "b.c/", "b.c/1/",
+])
+
+
+class FakeSafeBrowsing:
+    """Serves threatListUpdates:fetch, fullHashes:find and threatMatches:find from in-memory lists"""
+
+    def __init__(self, threats, noise_prefixes):
+        # Each version is the full set of 4-byte prefixes per list; clients name the version they hold
+        self.full_hashes = {}  # full hash -> threat type
+        self.versions = [{t: set(noise_prefixes[i::len(THREAT_TYPES)]) for i, t in enumerate(THREAT_TYPES)}]
+        self.add_threats(threats)
+        self.requests = {'update': 0, 'full_hashes': 0, 'lookup': 0}
+
+    def add_threats(self, threats, remove=()):
+        """Publish a new version adding `threats` ({url: threat type}) and dropping `remove` urls"""
+        lists = {t: set(prefixes) for t, prefixes in self.versions[-1].items()}
+        for url in remove:
+            for full_hash in url_hashes(url)[:1]:
+                lists[self.full_hashes.pop(full_hash)].discard(full_hash[:4])
+        for url, threat_type in threats.items():
+            full_hash = hashlib.sha256(url_expressions(url)[0].encode()).digest()
+            self.full_hashes[full_hash] = threat_type
+            lists[threat_type].add(full_hash[:4])
+        self.versions.append(lists)
+
+    def list_update(self, request):
+        threat_type = request['threatType']
+        current = self.versions[-1][threat_type]
+        state = request.get('state')
+        response = {
+            'threatType': threat_type,
+            'platformType': request['platformType'],
+            'threatEntryType': request['threatEntryType'],
+            'newClientState': str(len(self.versions) - 1),
+            'checksum': {'sha256': base64.b64encode(hashlib.sha256(b''.join(sorted(current))).digest()).decode()},
+        }
+        if not state:
+            response['responseType'] = 'FULL_UPDATE'
+            added = current
+        else:
+            held = sorted(self.versions[int(state)][threat_type])
+            response['responseType'] = 'PARTIAL_UPDATE'
+            removed = [i for i, prefix in enumerate(held) if prefix not in current]
+            if removed:
+                response['removals'] = [{'compressionType': 'RAW', 'rawIndices': {'indices': removed}}]
+            added = current.difference(held)
+        if added:
+            response['additions'] = [{'compressionType': 'RAW', 'rawHashes': {
+                'prefixSize': 4, 'rawHashes': base64.b64encode(b''.join(sorted(added))).decode()
+            }}]
+        return response
+
+    def handle(self, path, body):
+        if path.startswith('/v4/threatListUpdates:fetch'):
+            self.requests['update'] += 1
+            return {
+                'listUpdateResponses': [self.list_update(r) for r in body['listUpdateRequests']],
+                'minimumWaitDuration': '1800s'
+            }
+        if path.startswith('/v4/fullHashes:find'):
+            self.requests['full_hashes'] += 1
+            prefixes = {base64.b64decode(e['hash']) for e in body['threatInfo']['threatEntries']}
+            return {
+                'matches': [
+                    {'threatType': t, 'platformType': 'ANY_PLATFORM', 'threatEntryType': 'URL',
+                     'threat': {'hash': base64.b64encode(h).decode()}, 'cacheDuration': '300s'}
+                    for h, t in self.full_hashes.items() if h[:4] in prefixes
+                ],
+                'negativeCacheDuration': '300s'
+            }
+        if path.startswith('/v4/threatMatches:find'):
+            self.requests['lookup'] += 1
+            hashes = url_hashes(body['threatInfo']['threatEntries'][0]['url'])
+            matches = [{'threatType': self.full_hashes[h], 'platformType': 'ANY_PLATFORM'}
+                       for h in hashes if h in self.full_hashes]
+            return {'matches': matches} if matches else {}
+        return None
+
+    def serve(self):
+        """Start serving on a free localhost port and return the API base URL"""
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            disable_nagle_algorithm = True  # headers and body go out in separate writes
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+                result = fake.handle(self.path, body)
+                payload = json.dumps(result).encode()
+                self.send_response(200 if result is not None else 404)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return f"http://127.0.0.1:{self.server.server_port}/v4"
+
+
+def check(label, ok):
+    print(f"{'✅' if ok else '❌'} {label}")
+    return ok
+
+
+def flagged(db, urls):
+    return {url for url in urls if db.check_url(url)['is_threat']}
+
+
+def listed(urls, threats):
+    """URLs with any expression equal to a listed URL's, e.g. a.com/login when a.com/ is listed"""
+    expressions = {url_expressions(url)[0] for url in threats}
+    return {url for url in urls if expressions.intersection(url_expressions(url))}
+
+
+def main():
+    print("🔎" + "=" * 60)
+    print("   SAFE BROWSING LOCAL DATABASE BENCHMARK")
+    print("=" * 62)
+
+    ok = True
+    wrong = {url: (canonicalize(url), expected) for url, expected in CANONICAL_CASES.items()}
+    wrong = {url: got for url, (got, expected) in wrong.items()
+             if f"{got[0]}{got[1]}{'?' + got[2] if got[2] is not None else ''}" != expected}
+    for url, got in wrong.items():
+        print(f"   {url!r} -> {got}")
+    ok &= check(f"Canonicalization: {len(CANONICAL_CASES) - len(wrong)}/{len(CANONICAL_CASES)} spec examples", not wrong)
+    ok &= check("Host suffix / path prefix expressions",
+                sorted(url_expressions(EXPRESSION_CASE[0])) == sorted(EXPRESSION_CASE[1]))
+
+    random.seed(3)
+    urls = list(dict.fromkeys(sample_urls(6000, seed=11)))
+    threats = {url: random.choice(THREAT_TYPES) for url in urls[:500]}
+    later_threats = {url: 'MALWARE' for url in urls[500:600]}
+    clean = sorted(set(urls[1000:]) - listed(urls[1000:], urls[:600]))
+    noise = [random.getrandbits(32).to_bytes(4, 'big') for _ in range(int(sys.argv[1]) if len(sys.argv) > 1 else 500000)]
+
+    fake = FakeSafeBrowsing(threats, noise)
+    api_base = fake.serve()
+
+    with tempfile.TemporaryDirectory() as directory:
+        db = SafeBrowsingLocalDB('test-key', api_base, directory, THREAT_TYPES)
+
+        start = time.perf_counter()
+        ok &= check("Full update applied", db.update() and db.ready and db.last_error is None)
+        print(f"   {sum(db.stats()['lists'].values())} prefixes in {time.perf_counter() - start:.2f}s")
+        ok &= check("Every listed URL matches", flagged(db, threats) == set(threats))
+        ok &= check("No clean URL matches", not flagged(db, clean))
+
+        # Partial update: 100 removals, 100 additions
+        removed = list(threats)[:100]
+        fake.add_threats(later_threats, remove=removed)
+        db.full_hashes.clear()
+        db.negative_prefixes.clear()
+        ok &= check("Partial update applied with a verified checksum", db.update() and db.last_error is None)
+        remaining = set(threats).difference(removed) | set(later_threats)
+        ok &= check("Removed URLs no longer match", flagged(db, removed) == listed(removed, remaining))
+        ok &= check("Added URLs match", flagged(db, later_threats) == set(later_threats))
+
+        restored = SafeBrowsingLocalDB('test-key', api_base, directory, THREAT_TYPES)
+        restored.load()
+        ok &= check("Lists restored from disk", restored.ready and restored.stats()['lists'] == db.stats()['lists'])
+
+        # Corrupt the local copy; the checksum must catch it and force a full update
+        for threat_list in db.lists.values():
+            threat_list.prefixes = {4: threat_list.prefixes[4][1:]}
+        fake.add_threats({})
+        db.update()
+        ok &= check("Checksum mismatch resets the lists", db.last_error == 'checksum mismatch' and not db.ready)
+        ok &= check("Next update resyncs in full", db.update() and db.ready and db.last_error is None)
+
+        # Lookup cost: local match against one network round trip per URL
+        sample = clean[:2000]
+        before = fake.requests['full_hashes']
+        start = time.perf_counter()
+        for url in sample:
+            db.check_url(url)
+        local = (time.perf_counter() - start) / len(sample)
+        calls = fake.requests['full_hashes'] - before
+
+        lookup = GoogleSafeBrowsingAPI()
+        lookup.api_key, lookup.base_url = 'test-key', f"{api_base}/threatMatches:find"
+        start = time.perf_counter()
+        for url in sample[:300]:
+            lookup._real_api_check(url)
+        remote = (time.perf_counter() - start) / 300
+
+        print(f"\nPer-URL lookup ({len(sample)} uncached clean URLs):")
+        print(f"   Local prefix match:    {local * 1e6:8.1f} µs  ({calls} full-hash calls)")
+        print(f"   threatMatches:find:    {remote * 1e6:8.1f} µs  (localhost, no TLS)")
+
+    fake.server.shutdown()
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Cold Start Benchmark
+Measures backend import time and time to first prediction in fresh
+interpreters, and checks that training-only modules stay unloaded
+"""
+
+import sys
+import os
+import json
+import subprocess
+import statistics
+import tempfile
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'backend'))
+MODEL_DIR = os.path.join(BACKEND_DIR, 'models')
+
+# Modules that should only be imported when a model is trained
+TRAINING_MODULES = ('sklearn.model_selection', 'sklearn.metrics', 'pandas')
+
+# Each probe runs in a new process so nothing is already imported
+PROBE = r'''
+import json, os, sys, time
+start = time.perf_counter()
+import {module}
+imported = time.perf_counter()
+result = {{'import': imported - start}}
+if {predict}:
+    from ml_model import classifier
+    classifier.model_dir = {model_dir!r}
+    classifier.model_path = os.path.join(classifier.model_dir, 'url_classifier.joblib')
+    if classifier.load_model():
+        loaded = time.perf_counter()
+        classifier.predict('http://example.com/login?next=/account')
+        done = time.perf_counter()
+        result['load'] = loaded - imported
+        result['first_prediction'] = done - start
+result['training_modules'] = [name for name in {training_modules!r} if name in sys.modules]
+print(json.dumps(result))
+'''
+
+def probe_runs(module, runs, predict=False, model_dir=MODEL_DIR):
+    """Repeat a probe, stopping at the first failure"""
+    samples = []
+    for _ in range(runs):
+        sample = probe(module, predict=predict, model_dir=model_dir)
+        if sample is None:
+            return None
+        samples.append(sample)
+    return samples
+
+def probe(module, predict=False, model_dir=MODEL_DIR):
+    """Run one cold-start probe and return its timings, or None if it failed"""
+    code = PROBE.format(module=module, predict=predict, model_dir=model_dir, training_modules=TRAINING_MODULES)
+    completed = subprocess.run(
+        [sys.executable, '-c', code], cwd=BACKEND_DIR, capture_output=True, text=True
+    )
+    if completed.returncode != 0:
+        print(f"❌ Importing {module} failed:\n{completed.stderr.strip().splitlines()[-1]}")
+        return None
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+def train_synthetic_model(model_dir):
+    """Fit a small model on synthetic URLs in `model_dir`, as benchmark_inference.py does"""
+    sys.path.append(BACKEND_DIR)
+    from ml_model import URLClassifier
+    from benchmark_feature_extraction import sample_urls
+
+    urls = sample_urls(4000, seed=7)
+    flagged = [any(t in u for t in ('.tk/', '.ml/', '.ga/', 'login', 'prize')) for u in urls]
+    malicious = [u for u, bad in zip(urls, flagged) if bad]
+    valid = [u for u, bad in zip(urls, flagged) if not bad]
+    cwd = os.getcwd()
+    os.chdir(model_dir)
+    try:
+        URLClassifier(model_dir).train(malicious, valid)
+    finally:
+        os.chdir(cwd)
+
+def report(label, samples, key):
+    values = [sample[key] for sample in samples if key in sample]
+    if values:
+        print(f"{label:<34} median {statistics.median(values) * 1e3:8.1f} ms, best {min(values) * 1e3:8.1f} ms")
+
+def main():
+    print("⏱️" + "=" * 60)
+    print("   COLD START BENCHMARK")
+    print("=" * 62)
+
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+
+    for module in ('ml_model', 'main'):
+        samples = probe_runs(module, runs)
+        if samples is None:
+            continue
+        report(f"import {module}", samples, 'import')
+        if samples[0]['training_modules']:
+            print(f"⚠️  Training-only modules imported: {', '.join(samples[0]['training_modules'])}")
+
+    with tempfile.TemporaryDirectory() as workdir:
+        model_dir = MODEL_DIR
+        if not os.path.exists(os.path.join(MODEL_DIR, 'url_classifier.joblib')):
+            print(f"\n📦 No trained model in {MODEL_DIR}, training on synthetic URLs...")
+            model_dir = workdir
+            train_synthetic_model(model_dir)
+        samples = probe_runs('ml_model', runs, predict=True, model_dir=model_dir)
+    if samples is None or 'first_prediction' not in samples[0]:
+        print("❌ The probe could not load the model")
+        sys.exit(1)
+    print()
+    report("model load", samples, 'load')
+    report("import to first prediction", samples, 'first_prediction')
+    if samples[0]['training_modules']:
+        print(f"⚠️  Training-only modules imported: {', '.join(samples[0]['training_modules'])}")
+        sys.exit(1)
+    print("✅ No training-only modules loaded on the serving path")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Worker Memory Benchmark
+Starts several worker processes that each load the model and serve a
+prediction, then reports resident (RSS) and proportional (PSS) memory per
+worker with private model copies versus memory-mapped artifacts.
+
+PSS splits shared pages between the processes mapping them, so the sum of
+PSS across workers is what the node actually pays. Linux only.
+"""
+
+import sys
+import os
+import tempfile
+import multiprocessing
+
+BACKEND_DIR = os.path.join(os.path.dirname(__file__), '..', 'backend')
+sys.path.append(BACKEND_DIR)
+
+from benchmark_feature_extraction import sample_urls
+
+def memory_kb():
+    """Current RSS and PSS of this process in kB"""
+    with open('/proc/self/smaps_rollup') as f:
+        next(f)  # address range header
+        fields = dict(line.split(':', 1) for line in f)
+    return int(fields['Rss'].split()[0]), int(fields['Pss'].split()[0])
+
+def worker(path, model_dir, mmap_mode, load_estimator, results, release):
+    """Load the model like a serving worker, report memory and stay alive until released"""
+    from ml_model import ModelBundle, URLClassifier
+
+    classifier = URLClassifier(model_dir)
+    classifier.activate(ModelBundle.load(path, mmap_mode=mmap_mode), promote=False)
+    if load_estimator:
+        classifier.model  # before: every worker unpickled the full estimator
+    classifier.predict('http://example.com/login?next=/account')
+    results.put(memory_kb())
+    release.wait()
+
+def baseline_worker(results, release):
+    """A worker with the backend imported but no model loaded"""
+    import ml_model  # noqa: F401
+    results.put(memory_kb())
+    release.wait()
+
+def measure(workers, target, *args):
+    """Run `workers` processes of `target` at once and return their (rss, pss) readings"""
+    context = multiprocessing.get_context('spawn')
+    results, release = context.Queue(), context.Event()
+    processes = [context.Process(target=target, args=(*args, results, release)) for _ in range(workers)]
+    for process in processes:
+        process.start()
+    readings = [results.get() for _ in processes]
+    release.set()
+    for process in processes:
+        process.join()
+    return readings
+
+def report(label, readings, baseline_pss=0):
+    rss = sum(r for r, _ in readings) / len(readings)
+    pss = sum(p for _, p in readings) / len(readings)
+    total = sum(p for _, p in readings)
+    print(f"{label:<30} RSS {rss / 1024:7.1f} MB  PSS {pss / 1024:7.1f} MB  "
+          f"model PSS {(pss - baseline_pss) / 1024:7.1f} MB  total PSS {total / 1024:8.1f} MB")
+
+def train_sample_model(model_dir):
+    """Fit a model on synthetic URLs when no trained one exists"""
+    from ml_model import URLClassifier
+
+    urls = sample_urls(20000, seed=7)
+    flagged = [any(t in u for t in ('.tk/', '.ml/', '.ga/', 'login', 'prize')) for u in urls]
+    malicious = [u for u, bad in zip(urls, flagged) if bad]
+    valid = [u for u, bad in zip(urls, flagged) if not bad]
+    return URLClassifier(model_dir).fit(malicious, valid).path
+
+def upgrade_artifact(path, workdir):
+    """Re-save artifacts from before the engine arrays were stored, so they can be mapped"""
+    from ml_model import ModelBundle
+
+    bundle = ModelBundle.load(path, mmap_mode=None)
+    if bundle.estimator_path is not None:
+        return path
+    print("📦 Re-saving the legacy artifact with its engine arrays")
+    bundle.save(os.path.join(workdir, os.path.basename(path)))
+    return bundle.path
+
+def main():
+    print("🧠" + "=" * 60)
+    print("   WORKER MEMORY BENCHMARK")
+    print("=" * 62)
+
+    if not os.path.exists('/proc/self/smaps_rollup'):
+        print("❌ /proc/self/smaps_rollup is not available; run this on Linux")
+        sys.exit(1)
+
+    workers = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+
+    with tempfile.TemporaryDirectory() as workdir:
+        path = os.path.join(BACKEND_DIR, 'models', 'url_classifier.joblib')
+        if os.path.exists(path):
+            print(f"📦 Using {path}")
+            path = upgrade_artifact(path, workdir)
+        else:
+            print("📦 No trained model found, training on synthetic URLs...")
+            path = train_sample_model(workdir)
+
+        print(f"\n{workers} workers each:")
+        baseline = measure(workers, baseline_worker)
+        baseline_pss = sum(p for _, p in baseline) / len(baseline)
+        report("no model", baseline)
+        report("before: private copies", measure(workers, worker, path, workdir, None, True), baseline_pss)
+        report("after: memory-mapped engine", measure(workers, worker, path, workdir, 'r', False), baseline_pss)
+
+if __name__ == "__main__":
+    main()
@@ -8,40 +8,66 @@ sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'backend'))
 
 from database import db
 from ml_model import classifier
+from retraining import TrainingLock
 
-def retrain_model():
-    """Retrain the model with latest data"""
+def retrain_model(full=False):
+    """Retrain the model with latest data
+    
+    Grows the active model from rows added since its last recorded training
+    run; rebuilds from every row when full=True or the model cannot be grown.
+    """
     
     print(f"[{datetime.now()}] Starting scheduled model retraining...")
     
+    # The API's workers train and prune in the same model directory
+    lock = TrainingLock(os.path.join(classifier.model_dir, '.training.lock'))
+    if not lock.acquire():
+        print("Another process is training the model; skipping this run")
+        return
+    
     try:
-        # Get updated training data
-        malicious_data = db.get_malicious_urls()
-        valid_data = db.get_valid_urls()
+        base = classifier.bundle if classifier.load_model() else None
+        since = None
+        if not full and classifier.can_update(base):
+            since = db.get_model_data_cutoff(base.version)
+        mode = 'incremental' if since is not None else 'full'
         
-        malicious_urls = [row['url'] for row in malicious_data]
-        valid_urls = [row['url'] for row in valid_data]
+        # Get updated training data
+        malicious_urls, malicious_newest = db.get_training_urls('malicious_urls', since)
+        valid_urls, valid_newest = db.get_training_urls('valid_urls', since)
+        cutoff = max((newest for newest in (malicious_newest, valid_newest) if newest is not None), default=since)
+        dataset_size = len(malicious_urls) + len(valid_urls)
         
-        if len(malicious_urls) == 0 or len(valid_urls) == 0:
+        if mode == 'incremental' and dataset_size == 0:
+            print(f"No rows added since model {base.version} was trained")
+            return
+        if mode == 'full' and (len(malicious_urls) == 0 or len(valid_urls) == 0):
             print("Insufficient training data for retraining")
             return
         
-        print(f"Retraining with {len(malicious_urls)} malicious and {len(valid_urls)} valid URLs")
+        print(f"Retraining ({mode}) with {len(malicious_urls)} malicious and {len(valid_urls)} valid URLs")
         
         # Retrain model
-        accuracy = classifier.train(malicious_urls, valid_urls)
+        if mode == 'incremental':
+            bundle = classifier.update(base, malicious_urls, valid_urls)
+        else:
+            bundle = classifier.fit(malicious_urls, valid_urls)
+        classifier.activate(bundle)
         
         # Log the retraining
+        db.log_model_training(bundle.version, bundle.accuracy, dataset_size, bundle.path, cutoff)
         db.log_admin_action(
             "Scheduled model retraining",
-            f"New accuracy: {accuracy:.4f}, Dataset size: {len(malicious_urls) + len(valid_urls)}"
+            f"Mode: {mode}, New accuracy: {bundle.accuracy:.4f}, Dataset size: {dataset_size}"
         )
         
-        print(f"Model retrained successfully with accuracy: {accuracy:.4f}")
+        print(f"Model retrained successfully with accuracy: {bundle.accuracy:.4f}")
         
     except Exception as e:
         print(f"Error during retraining: {e}")
         db.log_admin_action("Retraining failed", str(e))
+    finally:
+        lock.release()
 
 def run_scheduler():
     """Run the scheduled retraining"""
@@ -53,11 +79,15 @@ def run_scheduler():
     # schedule.every().hour.do(retrain_model)
     
     print("Scheduled retraining service started...")
-    print("Model will be retrained every Sunday at 2:00 AM")
+    print("Model will be updated incrementally every Sunday at 2:00 AM (run with --full for a rebuild)")
     
     while True:
         schedule.run_pending()
         time.sleep(60)  # Check every minute
 
 if __name__ == "__main__":
-    run_scheduler()
+    if '--full' in sys.argv or '--now' in sys.argv:
+        # One-off run; --full rebuilds the model from every row
+        retrain_model(full='--full' in sys.argv)
+    else:
+        run_scheduler()
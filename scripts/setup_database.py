@@ -77,7 +77,8 @@ def create_database():
             accuracy FLOAT,
             training_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
             dataset_size INTEGER,
-            model_path TEXT
+            model_path TEXT,
+            data_cutoff TIMESTAMP -- newest date_added among the rows trained on
         );
         
         -- Blocked URLs log (for analytics)
@@ -88,6 +89,15 @@ def create_database():
             user_agent TEXT,
             reason VARCHAR(100)
         );
+        
+        -- Incremental training reads by date_added; /admin/datasets pages by id within a source
+        CREATE INDEX idx_malicious_urls_date_added ON malicious_urls (date_added);
+        CREATE INDEX idx_malicious_urls_source_id ON malicious_urls (source, id);
+        CREATE INDEX idx_valid_urls_date_added ON valid_urls (date_added);
+        CREATE INDEX idx_valid_urls_source_id ON valid_urls (source, id);
+        
+        -- The moderation queue lists pending reports newest first
+        CREATE INDEX idx_user_reports_status_date ON user_reports (status, date_reported DESC);
         """
         
         cursor.execute(create_tables_sql)
@@ -11,16 +11,13 @@ def train_initial_model():
     print("Loading training data from database...")
     
     # Get training data
-    malicious_data = db.get_malicious_urls()
-    valid_data = db.get_valid_urls()
+    malicious_urls, malicious_newest = db.get_training_urls('malicious_urls')
+    valid_urls, valid_newest = db.get_training_urls('valid_urls')
     
-    if not malicious_data or not valid_data:
+    if not malicious_urls or not valid_urls:
         print("No training data found. Please run generate_sample_data.py first.")
         return
     
-    malicious_urls = [row['url'] for row in malicious_data]
-    valid_urls = [row['url'] for row in valid_data]
-    
     print(f"Found {len(malicious_urls)} malicious URLs")
     print(f"Found {len(valid_urls)} valid URLs")
     
@@ -28,6 +25,12 @@ def train_initial_model():
     print("Training model...")
     accuracy = classifier.train(malicious_urls, valid_urls)
     
+    # Record the run so the next retraining can be incremental
+    db.log_model_training(
+        classifier.bundle.version, accuracy, len(malicious_urls) + len(valid_urls),
+        classifier.bundle.path, max(malicious_newest, valid_newest)
+    )
+    
     print(f"Model trained successfully with accuracy: {accuracy:.4f}")
     
     # Test a few predictions
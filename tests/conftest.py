@@ -0,0 +1,128 @@
+import json
+import multiprocessing
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+
+# The backend modules import each other by bare name, as when run from backend/
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Base for the feed stubs: logs each request and answers with the server's delay and status"""
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def record(self, entry):
+        with self.server.log_lock:
+            with open(self.server.log_path, 'a') as log:
+                log.write(json.dumps(entry) + '\n')
+        time.sleep(self.server.delay.value)
+
+    def reply(self, body):
+        status = self.server.status.value
+        payload = b'' if status == 204 else json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+class SafeBrowsingStubHandler(StubHandler):
+    """Answers threatMatches:find like the v4 API, flagging URLs that contain 'malware'"""
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        urls = [entry['url'] for entry in body['threatInfo']['threatEntries']]
+        self.record(urls)
+        matches = [
+            {'threatType': 'MALWARE', 'platformType': 'ANY_PLATFORM', 'threat': {'url': url}}
+            for url in urls if 'malware' in url
+        ]
+        self.reply({'matches': matches} if matches else {})
+
+
+class VirusTotalStubHandler(StubHandler):
+    """Answers url/scan and url/report like the v2 API; URLs that contain 'malware' get positives"""
+
+    def do_POST(self):
+        form = parse_qs(self.rfile.read(int(self.headers['Content-Length'])).decode())
+        url = form['url'][0]
+        self.record(['scan', url])
+        self.reply({'response_code': 1, 'scan_id': f"scan-{url}"})
+
+    def do_GET(self):
+        resource = parse_qs(urlsplit(self.path).query)['resource'][0]
+        self.record(['report', resource])
+        self.reply({'response_code': 1, 'positives': 5 if 'malware' in resource else 0, 'total': 70})
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024  # a burst of pooled connections should not overflow the accept backlog
+
+
+def _serve_stub(handler, ready, log_path, delay, status):
+    server = StubServer(('127.0.0.1', 0), handler)
+    server.log_path, server.log_lock = log_path, threading.Lock()
+    server.delay, server.status = delay, status
+    ready.put(server.server_port)
+    server.serve_forever()
+
+
+class FeedStub:
+    """A local feed endpoint in a process of its own
+
+    Its handler threads would otherwise compete with the client's event loop
+    for the GIL. `delay` and `status` can be changed while it runs.
+    """
+
+    def __init__(self, handler, log_path, path):
+        context = multiprocessing.get_context('fork')
+        self.log_path = log_path
+        self._delay = context.Value('d', 0.0)
+        self._status = context.Value('i', 200)
+        ready = context.Queue()
+        self.process = context.Process(
+            target=_serve_stub, args=(handler, ready, log_path, self._delay, self._status), daemon=True
+        )
+        self.process.start()
+        self.url = f"http://127.0.0.1:{ready.get(timeout=10)}{path}"
+
+    delay = property(lambda self: self._delay.value, lambda self, value: setattr(self._delay, 'value', value))
+    status = property(lambda self: self._status.value, lambda self, value: setattr(self._status, 'value', value))
+
+    @property
+    def requests(self):
+        """What each request received so far asked for"""
+        if not os.path.exists(self.log_path):
+            return []
+        with open(self.log_path) as log:
+            return [json.loads(line) for line in log]
+
+    def close(self):
+        self.process.terminate()
+        self.process.join()
+
+
+@pytest.fixture
+def safe_browsing_stub(tmp_path):
+    stub = FeedStub(SafeBrowsingStubHandler, str(tmp_path / 'stub-requests.jsonl'), '/v4/threatMatches:find')
+    yield stub
+    stub.close()
+
+
+@pytest.fixture
+def virustotal_stub(tmp_path):
+    stub = FeedStub(VirusTotalStubHandler, str(tmp_path / 'virustotal-requests.jsonl'), '/vtapi/v2/url')
+    yield stub
+    stub.close()
@@ -0,0 +1,90 @@
+"""Batch /predict-urls: one ML pass and one feed lookup per distinct URL"""
+
+import asyncio
+
+import httpx
+import numpy as np
+import pytest
+
+import http_clients
+import main
+from enhanced_threat_feed import GoogleSafeBrowsingAPI
+from ml_model import URLClassifier
+
+MALICIOUS = [f"http://login-verify-{i}.tk/account/update.php?id={i}" for i in range(40)]
+VALID = [f"https://www.site{i}.com/about" for i in range(40)]
+
+
+def post_batch(urls):
+    async def scenario():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url='http://test') as client:
+            response = await client.post('/predict-urls', json={'urls': urls})
+        await http_clients.aclose()
+        return response
+
+    return asyncio.run(scenario())
+
+
+@pytest.fixture
+def gsb(monkeypatch, safe_browsing_stub):
+    api = GoogleSafeBrowsingAPI()
+    api.api_key = 'test_key'
+    api.base_url = safe_browsing_stub.url
+    api.local_db = None
+    monkeypatch.setattr(main, 'enhanced_safe_browsing', api)
+    main.verdict_cache.clear()
+    yield api
+    main.verdict_cache.clear()
+
+
+def test_duplicates_are_looked_up_once_and_answered_in_request_order(gsb, safe_browsing_stub):
+    urls = [
+        'http://a.example/', 'http://malware.example/', 'http://a.example/',
+        'http://b.example/', 'http://malware.example/', 'http://a.example/',
+    ]
+    response = post_batch(urls)
+
+    assert response.status_code == 200
+    results = response.json()['results']
+    assert [r['url'] for r in results] == urls
+    assert [r['threat_feed_result']['google_safe_browsing']['is_threat'] for r in results] == [
+        False, True, False, False, True, False
+    ]
+    assert [r['prediction'] for r in results if 'malware' in r['url']] == ['malicious', 'malicious']
+    looked_up = [url for request in safe_browsing_stub.requests for url in request]
+    assert sorted(looked_up) == ['http://a.example/', 'http://b.example/', 'http://malware.example/']
+
+
+def test_cached_verdicts_skip_the_feeds(gsb, safe_browsing_stub):
+    post_batch(['http://a.example/', 'http://b.example/'])
+    before = len(safe_browsing_stub.requests)
+
+    results = post_batch(['http://b.example/', 'http://c.example/', 'http://a.example/']).json()['results']
+
+    assert [r['url'] for r in results] == ['http://b.example/', 'http://c.example/', 'http://a.example/']
+    assert [url for request in safe_browsing_stub.requests[before:] for url in request] == ['http://c.example/']
+
+
+def test_oversized_batch_is_refused(gsb, monkeypatch):
+    monkeypatch.setattr(main, 'MAX_BATCH_URLS', 3)
+    assert post_batch([f"http://{i}.example/" for i in range(4)]).status_code == 413
+
+
+def test_predict_batch_scores_the_whole_matrix_in_one_pass(tmp_path):
+    classifier = URLClassifier(str(tmp_path))
+    classifier.activate(classifier.fit(MALICIOUS, VALID))
+    urls = MALICIOUS[:5] + VALID[:5] + ['http://192.168.0.1/free-prize-login']
+    expected = [classifier.predict(url) for url in urls]
+
+    engine = classifier.bundle.engine
+    passes = []
+    predict = engine.predict
+    engine.predict = lambda matrix: passes.append(np.shape(matrix)) or predict(matrix)
+    try:
+        results = classifier.predict_batch(urls)
+    finally:
+        del engine.predict
+
+    assert passes == [(len(urls), len(classifier.feature_names))]
+    assert results == expected
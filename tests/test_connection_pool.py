@@ -0,0 +1,87 @@
+"""Pooled database connections, without a database server"""
+
+import psycopg2
+import pytest
+from psycopg2 import pool as pg_pool
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE
+
+from database import ConnectionPool
+
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = 0
+        self.pings = 0
+        self.info = self
+
+    @property
+    def transaction_status(self):
+        return TRANSACTION_STATUS_IDLE
+
+    def get_transaction_status(self):
+        return TRANSACTION_STATUS_IDLE
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        self.closed = 1
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, query):
+        self.conn.pings += 1
+
+
+@pytest.fixture
+def connections(monkeypatch):
+    opened = []
+
+    def connect(*args, **kwargs):
+        opened.append(FakeConnection())
+        return opened[-1]
+
+    monkeypatch.setattr(psycopg2, 'connect', connect)
+    return opened
+
+
+def test_new_connections_are_not_pinged_until_idle(connections, monkeypatch):
+    pool = ConnectionPool({}, minconn=1, maxconn=2, ping_after=30.0)
+    first = pool.getconn()
+    second = pool.getconn()
+    assert connections == [first, second]
+    assert first.pings == second.pings == 0
+
+    pool.putconn(first)
+    assert pool.getconn() is first and first.pings == 0
+    pool.putconn(first)
+
+    # Idle past ping_after: checked before it is handed out again
+    pool._last_used[id(first)] -= 60
+    assert pool.getconn() is first and first.pings == 1
+
+
+def test_connections_returned_after_close_are_closed(connections):
+    pool = ConnectionPool({}, minconn=1, maxconn=2)
+    in_flight = pool.getconn()
+    pool.closeall()
+
+    pool.putconn(in_flight)
+
+    assert in_flight.closed
+    assert pool._pool is None and len(connections) == 1
+    assert pool.stats()['in_use'] == 0
+    with pytest.raises(pg_pool.PoolError):
+        pool.getconn()
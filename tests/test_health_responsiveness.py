@@ -0,0 +1,82 @@
+"""/health keeps answering while a threat feed call hangs"""
+
+import asyncio
+import socket
+import threading
+import time
+
+import httpx
+
+import http_clients
+import main
+from enhanced_threat_feed import GoogleSafeBrowsingAPI
+
+# /health does a database check and a model prediction; a blocked event loop would take the full GSB deadline
+HEALTH_LATENCY_BOUND = 1.0
+
+
+class StalledServer:
+    """Accepts connections and never answers, like a feed that hangs"""
+
+    def __init__(self):
+        self.sock = socket.socket()
+        self.sock.bind(('127.0.0.1', 0))
+        self.sock.listen(64)
+        self.connections = []
+        self._stopped = False
+        threading.Thread(target=self._accept, daemon=True).start()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.sock.getsockname()[1]}/v4/threatMatches:find"
+
+    def _accept(self):
+        while not self._stopped:
+            try:
+                self.connections.append(self.sock.accept()[0])
+            except OSError:
+                return
+
+    def close(self):
+        self._stopped = True
+        for conn in self.connections:
+            conn.close()
+        self.sock.close()
+
+
+def test_health_answers_during_hanging_predict(monkeypatch):
+    server = StalledServer()
+    gsb = GoogleSafeBrowsingAPI()
+    gsb.api_key = 'test_key'
+    gsb.base_url = server.url
+    gsb.local_db = None
+    monkeypatch.setattr(main, 'enhanced_safe_browsing', gsb)
+    main.verdict_cache.clear()
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url='http://test') as client:
+            predict = asyncio.ensure_future(client.post('/predict-url', json={'url': 'http://hanging-feed.example/'}))
+            # Wait until the lookup is stuck on the stalled socket
+            deadline = time.monotonic() + 2
+            while not server.connections and time.monotonic() < deadline:
+                await asyncio.sleep(0.01)
+            assert server.connections, "GSB lookup never reached the stub"
+
+            start = time.perf_counter()
+            health = await client.get('/health')
+            health_latency = time.perf_counter() - start
+            assert not predict.done()
+
+            verdict = (await predict).json()
+        await http_clients.aclose()
+        return health, health_latency, verdict
+
+    try:
+        health, health_latency, verdict = asyncio.run(scenario())
+    finally:
+        server.close()
+
+    assert health.status_code == 200
+    assert health_latency < HEALTH_LATENCY_BOUND
+    assert verdict['threat_feed_result']['google_safe_browsing']['status'] == 'timeout'
@@ -0,0 +1,107 @@
+"""Worker processes sharing one model directory"""
+
+import asyncio
+import os
+import subprocess
+import sys
+
+import ml_model
+from ml_model import ESTIMATOR_SUFFIX, MODELS_IN_USE_DIR, URLClassifier
+from retraining import ModelRetrainer, TrainingLock
+
+MALICIOUS = [f"http://login-verify-{i}.tk/account/update.php?id={i}" for i in range(40)]
+VALID = [f"https://www.site{i}.com/about" for i in range(40)]
+
+
+def artifacts(model_dir):
+    return sorted(
+        name for name in os.listdir(model_dir)
+        if name.startswith('url_classifier-') and name.endswith('.joblib') and not name.endswith(ESTIMATOR_SUFFIX)
+    )
+
+
+def test_training_lock_admits_one_holder(tmp_path):
+    path = str(tmp_path / '.training.lock')
+    first, second = TrainingLock(path), TrainingLock(path)
+    assert first.acquire()
+    assert not second.acquire()
+    first.release()
+    assert second.acquire()
+    second.release()
+
+
+def test_only_one_worker_trains_at_startup(tmp_path):
+    async def scenario():
+        loading = asyncio.Event()
+        proceed = asyncio.Event()
+
+        async def load_training_data(since=None):
+            loading.set()
+            await proceed.wait()
+            return MALICIOUS, VALID, None
+
+        workers = [ModelRetrainer(URLClassifier(str(tmp_path)), load_training_data) for _ in range(2)]
+        elected, _ = workers[0].start(requested_by="startup")
+        await loading.wait()
+        refused, _ = workers[1].start(requested_by="startup")
+        await workers[1].wait(refused)
+        proceed.set()
+        await workers[0].wait(elected)
+        return workers, elected, refused
+
+    workers, elected, refused = asyncio.run(scenario())
+
+    assert elected.status == 'completed'
+    assert refused.status == 'failed' and 'Another worker' in refused.error
+    assert workers[1].classifier.reload_if_promoted().version == elected.version
+
+
+def test_other_worker_follows_promoted_model(tmp_path):
+    trainer = URLClassifier(str(tmp_path))
+    follower = URLClassifier(str(tmp_path))
+    assert follower.reload_if_promoted() is None
+
+    trainer.activate(trainer.fit(MALICIOUS, VALID))
+    reloaded = follower.reload_if_promoted()
+    assert reloaded is not None and reloaded.version == trainer.bundle.version
+    assert follower.reload_if_promoted() is None
+    # The trainer does not reload its own promotion
+    assert trainer.reload_if_promoted() is None
+
+    first = trainer.bundle
+    trainer.activate(trainer.fit(MALICIOUS, VALID))
+    assert follower.reload_if_promoted().version == trainer.bundle.version
+    assert follower.previous_bundle.version == first.version
+
+    trainer.rollback()
+    assert follower.reload_if_promoted().version == first.version
+
+
+def test_pruning_keeps_models_other_processes_have_loaded(monkeypatch, tmp_path):
+    monkeypatch.setattr(ml_model, 'MODEL_KEEP_VERSIONS', 1)
+    model_dir = str(tmp_path)
+    classifier = URLClassifier(model_dir)
+    classifier.activate(classifier.fit(MALICIOUS, VALID))
+    oldest = os.path.basename(classifier.bundle.path)
+
+    # Another live process (our parent) still serves the oldest model; a dead one listed it too
+    in_use = os.path.join(model_dir, MODELS_IN_USE_DIR)
+    with open(os.path.join(in_use, str(os.getppid())), 'w') as f:
+        f.write(oldest)
+    exited = subprocess.Popen([sys.executable, '-c', 'pass'])
+    exited.wait()
+    with open(os.path.join(in_use, str(exited.pid)), 'w') as f:
+        f.write(oldest)
+
+    classifier.activate(classifier.fit(MALICIOUS, VALID))
+    classifier.activate(classifier.fit(MALICIOUS, VALID))
+
+    assert oldest in artifacts(model_dir)
+    assert os.path.exists(os.path.join(model_dir, oldest.replace('.joblib', ESTIMATOR_SUFFIX)))
+    assert not os.path.exists(os.path.join(in_use, str(exited.pid)))
+
+    # Once nobody has it loaded, it is pruned with its sidecars
+    os.remove(os.path.join(in_use, str(os.getppid())))
+    classifier.activate(classifier.fit(MALICIOUS, VALID))
+    assert oldest not in artifacts(model_dir)
+    assert not os.path.exists(os.path.join(model_dir, oldest.replace('.joblib', ESTIMATOR_SUFFIX)))
@@ -0,0 +1,99 @@
+"""Circuit breakers judge feeds by how calls end, not by callers' deadlines"""
+
+import asyncio
+import time
+
+import httpx
+import pytest
+
+import http_clients
+import main
+from enhanced_threat_feed import GoogleSafeBrowsingAPI, LookupBatcher
+from resilience import CircuitBreaker
+
+
+async def settle(breaker, calls, timeout=30.0):
+    """Wait until `calls` outcomes have been recorded"""
+    deadline = time.monotonic() + timeout
+    while breaker.stats()['calls'] < calls and time.monotonic() < deadline:
+        await asyncio.sleep(0.01)
+
+
+def test_callers_giving_up_do_not_open_the_circuit():
+    breaker = CircuitBreaker('feed', failure_threshold=2)
+
+    async def slow_lookup():
+        await asyncio.sleep(0.05)
+        return 'clean'
+
+    async def scenario():
+        for _ in range(5):
+            with pytest.raises(asyncio.TimeoutError):
+                await asyncio.wait_for(breaker.call_async(slow_lookup), timeout=0.01)
+        assert breaker.state == 'closed'
+        await settle(breaker, 5)
+
+    asyncio.run(scenario())
+    stats = breaker.stats()
+    assert stats['state'] == 'closed'
+    assert stats['failures'] == 0 and stats['abandoned'] == 5
+
+
+def test_abandoned_calls_that_fail_still_count():
+    breaker = CircuitBreaker('feed', failure_threshold=2)
+
+    async def failing_lookup():
+        await asyncio.sleep(0.02)
+        raise httpx.ConnectError("connection refused")
+
+    async def scenario():
+        for _ in range(2):
+            with pytest.raises(asyncio.TimeoutError):
+                await asyncio.wait_for(breaker.call_async(failing_lookup), timeout=0.005)
+        await settle(breaker, 2)
+
+    asyncio.run(scenario())
+    assert breaker.stats()['state'] == 'open'
+    assert breaker.stats()['last_error'] == 'ConnectError'
+
+
+@pytest.mark.parametrize('batched', [False, True])
+def test_large_batch_against_healthy_feed_keeps_circuit_closed(monkeypatch, safe_browsing_stub, batched):
+    # Each lookup takes 100 ms; unbatched, 1000 of them queue for request slots past the deadline
+    safe_browsing_stub.delay = 0.1
+    gsb = GoogleSafeBrowsingAPI()
+    gsb.api_key = 'test_key'
+    gsb.base_url = safe_browsing_stub.url
+    gsb.local_db = None
+    gsb.batcher = LookupBatcher(gsb._lookup_batch) if batched else None
+    monkeypatch.setattr(main, 'enhanced_safe_browsing', gsb)
+    monkeypatch.setitem(main.STAGE_TIMEOUTS, 'google_safe_browsing', 1.0)
+    main.verdict_cache.clear()
+    urls = [f"http://batch{int(batched)}-{i}.example/{'malware' if i % 100 == 0 else 'home'}" for i in range(1000)]
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url='http://test', timeout=60) as client:
+            response = await client.post('/predict-urls', json={'urls': urls})
+        if batched:
+            await settle(gsb.breaker, 2)
+        else:
+            await asyncio.sleep(0.5)  # let requests still holding a slot finish
+        await http_clients.aclose()
+        return response.json()['results']
+
+    results = asyncio.run(scenario())
+    main.verdict_cache.clear()
+
+    stats = gsb.breaker.stats()
+    assert stats['state'] == 'closed'
+    assert stats['failures'] == 0
+    if batched:
+        assert len(safe_browsing_stub.requests) == 2
+        flagged = [r['url'] for r in results if r['threat_feed_result']['google_safe_browsing']['is_threat']]
+        assert flagged == [url for url in urls if 'malware' in url]
+    else:
+        # Callers that hit the stage deadline while queued for a request slot send nothing
+        assert 0 < stats['calls'] < len(urls)
+        assert stats['abandoned'] > 0
+        assert len(safe_browsing_stub.requests) == stats['calls']
@@ -0,0 +1,63 @@
+"""Concurrent Safe Browsing lookups share threatMatches:find requests"""
+
+import asyncio
+import time
+
+import pytest
+
+import http_clients
+from enhanced_threat_feed import GoogleSafeBrowsingAPI, LookupBatcher
+
+
+@pytest.fixture
+def gsb(safe_browsing_stub):
+    api = GoogleSafeBrowsingAPI()
+    api.api_key = 'test_key'
+    api.base_url = safe_browsing_stub.url
+    api.local_db = None
+    api.batcher = LookupBatcher(api._lookup_batch, window=0.05, max_size=500)
+    return api
+
+
+def lookup_all(gsb, urls):
+    async def scenario():
+        try:
+            return await asyncio.gather(*(gsb.check_url_async(url) for url in urls))
+        finally:
+            await http_clients.aclose()
+    return asyncio.run(scenario())
+
+
+def test_concurrent_lookups_are_sent_in_batches_of_500(gsb, safe_browsing_stub):
+    urls = [f"http://site{i}.example/{'malware' if i % 10 == 0 else 'page'}" for i in range(1200)]
+
+    # Repeats of still-pending URLs share their entry
+    results = lookup_all(gsb, urls + urls[-50:])
+
+    assert sorted(len(batch) for batch in safe_browsing_stub.requests) == [200, 500, 500]
+    assert sorted(url for batch in safe_browsing_stub.requests for url in batch) == sorted(urls)
+    for url, result in zip(urls + urls[-50:], results):
+        assert result['is_threat'] == ('malware' in url)
+        assert 'error' not in result
+    assert gsb.batcher.stats()['requests'] == 3
+
+
+def test_lone_lookup_waits_only_for_the_window(gsb, safe_browsing_stub):
+    start = time.perf_counter()
+    [result] = lookup_all(gsb, ["http://malware.example/"])
+
+    assert time.perf_counter() - start < 1.0
+    assert result['is_threat'] and result['threat_type'] == 'MALWARE'
+    assert safe_browsing_stub.requests == [["http://malware.example/"]]
+
+
+def test_failed_batch_reaches_every_caller_once(gsb, safe_browsing_stub):
+    safe_browsing_stub.status = 503
+    urls = [f"http://site{i}.example/" for i in range(300)]
+
+    results = lookup_all(gsb, urls)
+
+    assert len(safe_browsing_stub.requests) == 1
+    assert all(result['error'] == 'HTTP 503' for result in results)
+    # The breaker sees one failed request, not 300
+    assert gsb.breaker.stats()['failures'] == 1
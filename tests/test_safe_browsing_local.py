@@ -0,0 +1,104 @@
+"""Local Safe Browsing lists: saves from several workers at once, and the full-hash cache"""
+
+import base64
+import threading
+import time
+
+import numpy as np
+
+from safe_browsing_local import SafeBrowsingLocalDB, ThreatList, url_hashes
+
+
+def make_list(worker, size):
+    threat_list = ThreatList('MALWARE', 'ANY_PLATFORM')
+    threat_list.prefixes = {4: np.sort(np.frombuffer(np.random.bytes(4 * size), dtype='S4'))}
+    threat_list.state = f"worker-{worker}-{size}"
+    return threat_list
+
+
+def test_concurrent_saves_never_mix_lists(tmp_path):
+    directory = str(tmp_path)
+    errors = []
+
+    def sync(worker):
+        # Each save is a different list size, so a mixed-up file shows as a state/size mismatch
+        try:
+            for size in range(100, 160):
+                make_list(worker, size + worker * 1000).save(directory)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=sync, args=(worker,)) for worker in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert not errors
+    loaded = ThreatList('MALWARE', 'ANY_PLATFORM')
+    assert loaded.load(directory)
+    assert loaded.state == f"worker-{loaded.state.split('-')[1]}-{len(loaded)}"
+    assert [name for name in tmp_path.iterdir() if name.name.endswith('.tmp')] == []
+
+
+class FullHashResponse:
+    status_code = 200
+
+    def __init__(self, body):
+        self.body = body
+
+    def json(self):
+        return self.body
+
+
+def listed_db(tmp_path, url, listed, cache_duration, negative_cache_duration):
+    """A local DB whose list holds the URL's prefix, answering fullHashes:find from `listed`"""
+    db = SafeBrowsingLocalDB('test_key', 'http://unused.example/v4', str(tmp_path), ['MALWARE'])
+    full_hash = url_hashes(url)[0]
+    db.lists[('MALWARE', 'ANY_PLATFORM', 'URL')].prefixes = {4: np.array([full_hash[:4]], dtype='S4')}
+    db.requests = []
+
+    def post_full_hashes(prefixes):
+        db.requests.append(prefixes)
+        matches = [
+            {
+                'threatType': 'MALWARE',
+                'platformType': 'ANY_PLATFORM',
+                'threat': {'hash': base64.b64encode(full_hash).decode()},
+                'cacheDuration': cache_duration
+            }
+        ] if listed[0] else []
+        return FullHashResponse({'matches': matches, 'negativeCacheDuration': negative_cache_duration})
+
+    db._post_full_hashes = post_full_hashes
+    return db
+
+
+def test_expired_match_is_asked_again_instead_of_cached_as_safe(tmp_path):
+    url = 'http://listed.example/'
+    listed = [True]
+    db = listed_db(tmp_path, url, listed, cache_duration='0.05s', negative_cache_duration='300s')
+
+    assert db.check_url(url)['is_threat']
+    assert db.check_url(url)['is_threat']
+    assert len(db.requests) == 1
+
+    time.sleep(0.1)
+    assert db.check_url(url)['is_threat']
+    assert len(db.requests) == 2
+
+    # Once the server stops listing it, the answer is cached as safe
+    listed[0] = False
+    time.sleep(0.1)
+    assert not db.check_url(url)['is_threat']
+    assert not db.check_url(url)['is_threat']
+    assert len(db.requests) == 3
+
+
+def test_prefix_without_a_listed_hash_is_cached_as_safe(tmp_path):
+    url = 'http://unlisted.example/'
+    db = listed_db(tmp_path, url, [False], cache_duration='300s', negative_cache_duration='300s')
+
+    assert not db.check_url(url)['is_threat']
+    assert not db.check_url(url)['is_threat']
+    assert len(db.requests) == 1
@@ -0,0 +1,43 @@
+"""The first model is trained even if the database is down at boot"""
+
+import asyncio
+
+import main
+from ml_model import URLClassifier
+from retraining import ModelRetrainer
+
+MALICIOUS = [f"http://login-verify-{i}.tk/account/update.php?id={i}" for i in range(40)]
+VALID = [f"https://www.site{i}.com/about" for i in range(40)]
+
+
+def test_startup_training_retries_until_a_model_is_active(monkeypatch, tmp_path):
+    attempts = []
+
+    async def load_training_data(since=None):
+        attempts.append(since)
+        if len(attempts) == 1:
+            raise ConnectionError("could not connect to server: Connection refused")
+        return MALICIOUS, VALID, None
+
+    classifier = URLClassifier(str(tmp_path))
+    retrainer = ModelRetrainer(classifier, load_training_data)
+    monkeypatch.setattr(main, 'classifier', classifier)
+    monkeypatch.setattr(main, 'retrainer', retrainer)
+    monkeypatch.setattr(main, 'STARTUP_TRAINING_RETRY', 0.05)
+
+    async def scenario():
+        task = asyncio.ensure_future(main.train_initial_model())
+        while not retrainer.jobs or next(iter(retrainer.jobs.values())).status != 'failed':
+            await asyncio.sleep(0.01)
+        # The failure is visible on the readiness probe while the retry is pending
+        status = main.model_status()
+        await asyncio.wait_for(task, timeout=120)
+        return status
+
+    status = asyncio.run(scenario())
+
+    assert status['tier'] == 'fallback'
+    assert 'Connection refused' in status['training_error']
+    assert len(attempts) == 2
+    assert classifier.bundle is not None
+    assert main.model_status()['training_error'] is None
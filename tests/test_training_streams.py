@@ -0,0 +1,66 @@
+"""Training reads URLs as streams instead of whole lists"""
+
+import pickle
+from datetime import datetime
+
+import numpy as np
+
+import database
+from database import TrainingURLs
+from ml_model import URLClassifier
+
+MALICIOUS = [f"http://login-verify-{i}.tk/account/update.php?id={i}" for i in range(45)]
+VALID = [f"https://www.site{i}.com/about" for i in range(35)]
+
+
+class CountingStream:
+    """A one-pass URL iterable that records how far the consumer has read"""
+
+    def __init__(self, urls):
+        self.urls = urls
+        self.read = 0
+
+    def __iter__(self):
+        for url in self.urls:
+            self.read += 1
+            yield url
+
+
+def test_streamed_urls_give_the_same_training_data_as_lists(tmp_path):
+    expected_X, expected_y = URLClassifier(str(tmp_path / 'lists')).prepare_data(MALICIOUS, VALID)
+
+    classifier = URLClassifier(str(tmp_path / 'streams'))
+    extracted = []
+    extract_matrix = classifier.feature_store.extract_matrix
+    classifier.feature_store.extract_matrix = lambda urls: extracted.append(len(urls)) or extract_matrix(urls)
+    malicious, valid = CountingStream(MALICIOUS), CountingStream(VALID)
+    X, y = classifier.prepare_data(malicious, valid, chunk_size=10, complete=True)
+
+    assert np.array_equal(X, expected_X) and np.array_equal(y, expected_y)
+    assert malicious.read == len(MALICIOUS) and valid.read == len(VALID)
+    # Features were extracted one chunk at a time
+    assert max(extracted) == 10
+
+    # The next run reuses the stored rows and drops the removed URLs
+    X, y = classifier.prepare_data(iter(MALICIOUS[:30]), iter(VALID), chunk_size=10, complete=True)
+    assert np.array_equal(X, np.concatenate([expected_X[:30], expected_X[45:]]))
+    keys, _, _ = classifier.feature_store._load('malicious')
+    assert len(keys) == 30
+
+
+def test_training_urls_stream_their_bounded_rows_in_any_process(monkeypatch):
+    since, until = datetime(2026, 1, 1), datetime(2026, 2, 1)
+    handle = pickle.loads(pickle.dumps(TrainingURLs('malicious_urls', since=since, until=until, count=3)))
+    requested = []
+
+    def stream_training_urls(table, since=None, until=None):
+        requested.append((table, since, until))
+        yield ['http://a.example/', 'http://b.example/']
+        yield ['http://c.example/']
+
+    monkeypatch.setattr(database.db, 'stream_training_urls', stream_training_urls)
+
+    assert len(handle) == 3
+    assert list(handle) == ['http://a.example/', 'http://b.example/', 'http://c.example/']
+    assert requested == [('malicious_urls', since, until)]
+    assert list(TrainingURLs('valid_urls')) == [] and len(requested) == 1
@@ -0,0 +1,66 @@
+"""Cached verdicts are only shared by URLs that would get the same verdict"""
+
+import asyncio
+
+import httpx
+import pytest
+
+import http_clients
+import main
+
+
+def predict(*requests, endpoint='/predict-url'):
+    async def scenario():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url='http://test') as client:
+            responses = [(await client.post(endpoint, json=body)).json() for body in requests]
+        await http_clients.aclose()
+        return responses
+
+    return asyncio.run(scenario())
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    main.verdict_cache.clear()
+    yield
+    main.verdict_cache.clear()
+
+
+@pytest.mark.parametrize('first, second', [
+    ('http://x.com/#free-download', 'http://x.com/'),
+    ('http://x.com/', 'http://x.com/#free-download'),
+    ('HTTP://X.COM', 'http://x.com/#Free-Download'),
+])
+def test_urls_sharing_a_cache_key_get_the_verdict_either_would_get_alone(first, second):
+    assert main.verdict_cache_key(first, strict_mode=True) == main.verdict_cache_key(second, strict_mode=True)
+    alone = predict({'url': second, 'strict_mode': True})[0]
+    main.verdict_cache.clear()
+    hits = main.verdict_cache.stats()['hits']
+
+    _, cached = predict({'url': first, 'strict_mode': True}, {'url': second, 'strict_mode': True})
+
+    assert main.verdict_cache.stats()['hits'] == hits + 1
+    assert cached['url'] == second
+    assert (cached['prediction'], cached['reason']) == (alone['prediction'], alone['reason'])
+
+
+def test_urls_with_different_verdicts_do_not_share_a_cached_result():
+    hits = main.verdict_cache.stats()['hits']
+    flagged, plain = predict(
+        {'url': 'http://x.com/free-download', 'strict_mode': True},
+        {'url': 'http://x.com/', 'strict_mode': True},
+    )
+
+    assert flagged['prediction'] == 'malicious'
+    assert plain['prediction'] == 'safe'
+    assert main.verdict_cache.stats()['hits'] == hits
+
+
+def test_batch_analyzes_each_normalized_url_once_and_answers_in_request_order():
+    urls = ['http://x.com/#free-download', 'http://X.com/', 'http://x.com/free-download', 'http://x.com/']
+    results = predict({'urls': urls, 'strict_mode': True}, endpoint='/predict-urls')[0]['results']
+
+    assert [r['url'] for r in results] == urls
+    assert [r['prediction'] for r in results] == ['safe', 'safe', 'malicious', 'safe']
+    assert len(main.verdict_cache) == 2
@@ -0,0 +1,149 @@
+"""VirusTotal quota: token bucket pacing and the background scan queue"""
+
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import rate_limit
+from enhanced_threat_feed import VirusTotalAPI, VirusTotalScanQueue
+from rate_limit import TokenBucket
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(rate_limit, 'time', SimpleNamespace(monotonic=clock))
+    return clock
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def virustotal(virustotal_stub):
+    api = VirusTotalAPI()
+    api.api_key = 'test_key'
+    api.base_url = virustotal_stub.url
+    queues = []
+
+    def scan_queue(rate_per_minute=6000, capacity=1, **kwargs):
+        kwargs.setdefault('poll_initial', 0.05)
+        api.scans = VirusTotalScanQueue(api, TokenBucket(rate_per_minute, capacity), **kwargs)
+        queues.append(api.scans)
+        return api.scans
+
+    yield api, scan_queue
+    for queue in queues:
+        queue.stop()
+
+
+def scans(stub):
+    return [url for kind, url in stub.requests if kind == 'scan']
+
+
+def test_bucket_allows_a_burst_of_capacity_then_refills_at_its_rate(clock):
+    bucket = TokenBucket(60, capacity=3)
+
+    assert [bucket.acquire() for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert bucket.acquire() == pytest.approx(1.0)
+
+    clock.now += 0.5
+    assert bucket.acquire() == pytest.approx(0.5)
+    clock.now += 0.5
+    assert bucket.acquire() == 0.0
+
+    # An idle bucket never holds more than its capacity
+    clock.now += 3600
+    assert [bucket.acquire() for _ in range(4)][-1] == pytest.approx(1.0)
+    assert bucket.stats()['used_last_minute'] == 3
+    assert bucket.stats()['granted'] == 7
+
+
+def test_paused_bucket_starts_empty_when_the_pause_ends(clock):
+    bucket = TokenBucket(60, capacity=3)
+    bucket.pause(10)
+
+    assert bucket.acquire() == pytest.approx(10)
+    clock.now += 10
+    assert bucket.acquire() == pytest.approx(1.0)
+    clock.now += 1
+    assert bucket.acquire() == 0.0
+    assert bucket.stats()['throttled'] == 1
+
+
+def test_interactive_scans_go_ahead_of_queued_background_work(virustotal, virustotal_stub):
+    api, scan_queue = virustotal
+    queue = scan_queue()
+    queue.bucket.pause(0.3)  # hold every job back until all are queued
+
+    queue.submit('http://batch.example/', 'batch')
+    queue.submit('http://normal.example/', 'normal')
+    queue.submit('http://interactive.example/', 'interactive')
+
+    wait_for(lambda: len(scans(virustotal_stub)) == 3)
+    assert scans(virustotal_stub) == [
+        'http://interactive.example/', 'http://normal.example/', 'http://batch.example/'
+    ]
+
+
+def test_repeat_submissions_join_the_job_in_flight(virustotal, virustotal_stub):
+    api, scan_queue = virustotal
+    results = []
+    queue = scan_queue(on_result=lambda url, result: results.append((url, result['is_threat'])))
+    queue.bucket.pause(0.3)
+
+    job = queue.submit('http://malware.example/', 'batch')
+    queue.submit('http://other.example/', 'normal')
+    assert queue.submit('http://malware.example/', 'interactive') is job
+    assert job.priority == 'interactive'
+    assert queue.stats()['coalesced'] == 1
+
+    wait_for(lambda: queue.stats()['completed'] == 2)
+    assert scans(virustotal_stub) == ['http://malware.example/', 'http://other.example/']
+    assert sorted(results) == [('http://malware.example/', True), ('http://other.example/', False)]
+    assert api.check_url('http://malware.example/')['positives'] == 5
+
+
+def test_batch_scans_are_turned_away_while_the_backlog_is_too_long(virustotal):
+    api, scan_queue = virustotal
+    # Two calls a job at six a minute: each queued job is 20 seconds of quota
+    queue = scan_queue(rate_per_minute=6, max_backlog_wait=30, max_pending=3)
+    queue.bucket.pause(60)
+
+    assert queue.submit('http://first.example/', 'batch') is not None
+    assert queue.submit('http://second.example/', 'batch') is not None
+    assert queue.submit('http://third.example/', 'batch') is None
+    assert queue.submit('http://third.example/', 'interactive') is not None
+    # Nothing is accepted past max_pending
+    assert queue.submit('http://fourth.example/', 'interactive') is None
+
+    stats = queue.stats()
+    assert stats['rejected'] == 2 and stats['pending'] == 3
+    assert api.check_url('http://fifth.example/', 'interactive')['status'] == 'skipped'
+
+
+def test_quota_answers_pause_the_bucket_without_using_up_attempts(virustotal, virustotal_stub):
+    api, scan_queue = virustotal
+    queue = scan_queue(poll_attempts=2, throttle_pause=0.2)
+    virustotal_stub.status = 204
+
+    job = queue.submit('http://throttled.example/', 'interactive')
+    wait_for(lambda: queue.bucket.stats()['throttled'] >= 1)
+    assert job.attempts == 0 and queue.stats()['pending'] == 1
+
+    virustotal_stub.status = 200
+    wait_for(lambda: queue.stats()['completed'] == 1)
+    assert api.breaker.stats()['state'] == 'closed'
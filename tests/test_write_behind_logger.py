@@ -0,0 +1,85 @@
+"""WriteBehindLogger survives a failing row-by-row fallback"""
+
+import time
+from contextlib import contextmanager
+
+import psycopg2
+import pytest
+
+import database
+from database import WriteBehindLogger
+
+
+class FlakyDatabase:
+    """Hands out connections until told to fail, like a database that just went away"""
+
+    def __init__(self):
+        self.down = False
+        self.rows = []
+
+    @contextmanager
+    def get_connection(self):
+        if self.down:
+            raise psycopg2.OperationalError("connection refused")
+        yield FakeConnection(self)
+
+
+class FakeConnection:
+    def __init__(self, database):
+        self.database = database
+
+    def cursor(self):
+        return self
+
+    def execute(self, sql, row):
+        self.database.rows.append(row)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+@pytest.fixture
+def rejected_batches(monkeypatch):
+    """Every multi-row insert is rejected, so each batch falls back to row-by-row writes"""
+    def reject(*args, **kwargs):
+        raise psycopg2.DataError("value too long for type character varying(255)")
+    monkeypatch.setattr(database, 'execute_values', reject)
+
+
+def test_failed_fallback_counts_rows_and_keeps_writer_alive(rejected_batches):
+    db = FlakyDatabase()
+    writer = WriteBehindLogger(db, batch_size=10, flush_interval=0.05)
+
+    # The batch insert is rejected and the row-by-row retry cannot connect
+    original_write_rows = writer._write_rows
+
+    def fail_over(grouped):
+        db.down = True
+        return original_write_rows(grouped)
+    writer._write_rows = fail_over
+
+    assert writer.submit('admin_logs', ('Model retrained', 'v1'))
+    assert writer.submit('blocked_urls_log', ('http://bad.example/', 'phishing', None))
+    assert wait_for(lambda: writer.stats()['flushes'] >= 1)
+    stats = writer.stats()
+    assert stats['failed'] == 2
+    assert stats['written'] == 0
+    assert writer._thread.is_alive()
+
+    # Once the database is back, later rows are still written
+    writer._write_rows = original_write_rows
+    db.down = False
+    assert writer.submit('admin_logs', ('Model rolled back', 'v0'))
+    assert wait_for(lambda: writer.stats()['written'] == 1)
+    assert db.rows == [('Model rolled back', 'v0')]
+    writer.close()